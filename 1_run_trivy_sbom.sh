@@ -16,5 +16,12 @@ mkdir -p "$OUTPUT_DIR/trivy-sbom"
 
 cd "$OUTPUT_DIR/trivy-sbom"
 trivy k8s --format cyclonedx --output kbom.json || true
-trivy sbom kbom.json --format json > sbom.json || true
+# TRIVY_SERVER_URL (set by the dashboard) makes this a thin client of its warm trivy server.
+# trivy k8s has no client mode, so the KBOM step above always runs standalone.
+if [ -n "${TRIVY_SERVER_URL:-}" ]; then
+    trivy sbom kbom.json --format json --server "$TRIVY_SERVER_URL" > sbom.json \
+        || trivy sbom kbom.json --format json > sbom.json || true
+else
+    trivy sbom kbom.json --format json > sbom.json || true
+fi
 echo "Trivy SBOM reports saved to: $OUTPUT_DIR/trivy-sbom/"
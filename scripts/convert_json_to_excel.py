@@ -1,82 +1,340 @@
+import argparse
+import io
+import os
+import sys
+import zipfile
+
+import numpy as np
 import pandas as pd
-import json
-from datetime import datetime
-
-# Read the JSON file
-with open('kyverno.json', 'r') as file:
-    json_data = json.load(file)
-
-# Extract the results from the items
-all_results = []
-for item in json_data.get('items', []):
-    metadata = item.get('metadata', {})
-    
-    if 'results' in item:
-        for result in item['results']:
-            # Get resource details
-            resources = result.get('resources', [{}])[0] if result.get('resources') else {}
-            
-            # Flatten the result dictionary
-            flat_result = {
-                # Metadata fields
-                'report_name': metadata.get('name', ''),
-                'report_namespace': metadata.get('namespace', ''),
-                'report_creation_time': metadata.get('creationTimestamp', ''),
-                'report_generation': metadata.get('generation', ''),
-                'report_uid': metadata.get('uid', ''),
-                'report_resource_version': metadata.get('resourceVersion', ''),
-                
-                # Owner reference fields
-                'owner_kind': metadata.get('ownerReferences', [{}])[0].get('kind', '') if metadata.get('ownerReferences') else '',
-                'owner_name': metadata.get('ownerReferences', [{}])[0].get('name', '') if metadata.get('ownerReferences') else '',
-                'owner_uid': metadata.get('ownerReferences', [{}])[0].get('uid', '') if metadata.get('ownerReferences') else '',
-                
-                # Result fields
-                'policy': result.get('policy', ''),
-                'rule': result.get('rule', ''),
-                'status': result.get('result', ''),
-                'message': result.get('message', ''),
-                'category': result.get('category', ''),
-                'severity': result.get('severity', ''),
-                'scoring': result.get('scoring', {}),
-                
-                # Resource fields
-                'resource_api_version': resources.get('apiVersion', ''),
-                'resource_kind': resources.get('kind', ''),
-                'resource_name': resources.get('name', ''),
-                'resource_namespace': resources.get('namespace', ''),
-                'resource_uid': resources.get('uid', ''),
-                'resource_labels': str(resources.get('labels', {})),
-                'resource_annotations': str(resources.get('annotations', {})),
-                
-                # Additional fields
-                'properties': str(result.get('properties', {})),
-                'timestamp': result.get('timestamp', '')
-            }
-            all_results.append(flat_result)
-
-# Convert to DataFrame
-df = pd.DataFrame(all_results)
-
-# Reorder columns for better readability
-column_order = [
-    'report_namespace', 'report_name', 'resource_namespace', 'resource_name', 
-    'resource_kind', 'policy', 'rule', 'status', 'severity', 'category', 
+
+from kyverno_yaml_to_json_dedup import iter_items
+
+# Output columns, in the order the sheet has always had them
+COLUMNS = [
+    'report_namespace', 'report_name', 'resource_namespace', 'resource_name',
+    'resource_kind', 'policy', 'rule', 'status', 'severity', 'category',
     'message', 'timestamp', 'resource_api_version', 'resource_uid',
     'resource_labels', 'resource_annotations', 'report_creation_time',
     'report_generation', 'report_uid', 'report_resource_version',
     'owner_kind', 'owner_name', 'owner_uid', 'properties', 'scoring'
 ]
 
-# Reorder columns (only include columns that exist in the DataFrame)
-df = df[[col for col in column_order if col in df.columns]]
+# Output column -> (frame it comes from, key in that frame)
+FIELDS = {
+    'report_name': ('metadata', 'name'),
+    'report_namespace': ('metadata', 'namespace'),
+    'report_creation_time': ('metadata', 'creationTimestamp'),
+    'report_generation': ('metadata', 'generation'),
+    'report_uid': ('metadata', 'uid'),
+    'report_resource_version': ('metadata', 'resourceVersion'),
+    'owner_kind': ('owner', 'kind'),
+    'owner_name': ('owner', 'name'),
+    'owner_uid': ('owner', 'uid'),
+    'policy': ('result', 'policy'),
+    'rule': ('result', 'rule'),
+    'status': ('result', 'result'),
+    'message': ('result', 'message'),
+    'category': ('result', 'category'),
+    'severity': ('result', 'severity'),
+    'scoring': ('result', 'scoring'),
+    'properties': ('result', 'properties'),
+    'timestamp': ('result', 'timestamp'),
+    'resource_api_version': ('resource', 'apiVersion'),
+    'resource_kind': ('resource', 'kind'),
+    'resource_name': ('resource', 'name'),
+    'resource_namespace': ('resource', 'namespace'),
+    'resource_uid': ('resource', 'uid'),
+    'resource_labels': ('resource', 'labels'),
+    'resource_annotations': ('resource', 'annotations'),
+}
+# Mappings written as their Python repr, "{}" when absent, as the sheet always showed them
+MAPPING_COLUMNS = {'resource_labels', 'resource_annotations', 'properties', 'scoring'}
+
+FORMATS = ('xlsx', 'csv', 'parquet')
+EXCEL_MAX_ROWS = 1048576
+MAX_WIDTH = 50
+
+
+def open_report(path):
+    # kyverno_scan.sh leaves kyverno.json zipped
+    if path.endswith('.zip'):
+        archive = zipfile.ZipFile(path)
+        names = [n for n in archive.namelist() if n.endswith('.json')]
+        if not names:
+            raise ValueError(f"No JSON file found in {path}")
+        return io.TextIOWrapper(archive.open(names[0]), encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def _normalize(records):
+    # What json_normalize(records, max_level=0) gives, nested mappings (labels, scoring, ...) kept
+    # as single values, without the deep copy json_normalize makes of every record
+    return pd.DataFrame.from_records([r if isinstance(r, dict) else {} for r in records])
+
+
+def _first(frame, key):
+    # First entry of a list column (ownerReferences, resources), None where there is none
+    if key not in frame:
+        return [None] * len(frame)
+    return [v[0] if isinstance(v, list) and v else None for v in frame[key].tolist()]
+
+
+def flatten(items):
+    """One row per result of a batch of report items, as a frame of strings in COLUMNS order."""
+    reports = pd.DataFrame({'results': [item.get('results') or [] for item in items]})
+    metadata = _normalize([item.get('metadata') for item in items])
+    results = reports.explode('results').dropna(subset=['results'])
+    frames = {'metadata': metadata.take(results.index.to_numpy()).reset_index(drop=True)}
+    frames['result'] = _normalize(results['results'].tolist())
+    frames['owner'] = _normalize(_first(frames['metadata'], 'ownerReferences'))
+    frames['resource'] = _normalize(_first(frames['result'], 'resources'))
+
+    rows = len(frames['result'])
+    columns = {}
+    for column in COLUMNS:
+        frame, key = FIELDS[column]
+        values = frames[frame][key] if key in frames[frame] else pd.Series([None] * rows, dtype=object)
+        if column in MAPPING_COLUMNS:
+            values = values.map(str, na_action='ignore').fillna('{}')
+        else:
+            if values.dtype.kind == 'f' and (values.dropna() % 1 == 0).all():
+                # Integers (generation) read as floats once some rows lack them
+                values = values.astype('Int64')
+            values = values.astype(object).fillna('').astype(str)
+        columns[column] = values.to_numpy(dtype=object)
+    return pd.DataFrame(columns, columns=COLUMNS)
+
+
+def iter_batches(items, batch_rows):
+    # Bounded by results rather than items: one report item can hold any number of them
+    batch, rows = [], 0
+    for item in items:
+        batch.append(item)
+        rows += len(item.get('results') or [])
+        if rows >= batch_rows:
+            yield batch
+            batch, rows = [], 0
+    if batch:
+        yield batch
+
+
+def iter_frames(path, batch_rows):
+    with open_report(path) as source:
+        for batch in iter_batches(iter_items(source), batch_rows):
+            frame = flatten(batch)
+            if len(frame):
+                yield frame
+
+
+def column_widths(frame, sample_rows):
+    # Widths come from a sample; measuring every cell of a million-row sheet costs more than writing it
+    sample = frame.head(sample_rows)
+    widths = {}
+    for column in COLUMNS:
+        longest = sample[column].str.len().max() if len(sample) else 0
+        widths[column] = min(max(int(longest or 0), len(column)) + 2, MAX_WIDTH)
+    return widths
+
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_STYLES = (
+    f'{_XML}<styleSheet {_NS}><fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles></styleSheet>'
+)
+# Characters XML 1.0 cannot carry; openpyxl refused them, here they are dropped
+_ILLEGAL_XML_RE = r'[\x00-\x08\x0b\x0c\x0e-\x1f]'
+EXCEL_MAX_CELL = 32767
+
+
+def _xml_text(values):
+    """Escaped cell text of a column, and where it is not empty."""
+    # Policies, messages and namespaces repeat on most rows, so each distinct value is escaped once
+    codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+    escaped = (pd.Series(uniques, dtype=object).str.slice(0, EXCEL_MAX_CELL)
+               .str.replace(_ILLEGAL_XML_RE, '', regex=True)
+               .str.replace('&', '&amp;', regex=False)
+               .str.replace('<', '&lt;', regex=False)
+               .str.replace('>', '&gt;', regex=False))
+    present = np.array([value != '' for value in uniques], dtype=bool)
+    return escaped.to_numpy(dtype=object)[codes], present[codes]
+
+
+def column_letter(idx):
+    # 1 -> A, 26 -> Z, 27 -> AA
+    letters = ''
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+class XlsxWriter:
+    """Streams rows into the worksheet XML of an xlsx package.
+
+    Cells are inline strings built a column at a time with vectorized string
+    operations, so a row never becomes per-cell objects the way it does in
+    openpyxl, and only the current batch is held in memory.
+    """
+
+    def __init__(self, path, sample_rows):
+        self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1)
+        self.sample_rows = sample_rows
+        self.letters = [column_letter(idx) for idx in range(1, len(COLUMNS) + 1)]
+        self.sheet = None
+        self.sheets = []
+        self.widths = None
+
+    def _new_sheet(self):
+        self._end_sheet()
+        title = 'Policy Report' if not self.sheets else f'Policy Report ({len(self.sheets) + 1})'
+        self.sheets.append(title)
+        self.sheet = self.zip.open(f'xl/worksheets/sheet{len(self.sheets)}.xml', 'w', force_zip64=True)
+        cols = ''.join(f'<col min="{idx}" max="{idx}" width="{self.widths[column]}" customWidth="1"/>'
+                       for idx, column in enumerate(COLUMNS, start=1))
+        self.sheet.write(f'{_XML}<worksheet {_NS}><cols>{cols}</cols><sheetData>'.encode())
+        self.rows = 0
+        self._write_rows(pd.DataFrame([COLUMNS], columns=COLUMNS))
+
+    def _end_sheet(self):
+        if self.sheet is not None:
+            self.sheet.write(b'</sheetData></worksheet>')
+            self.sheet.close()
+
+    def _write_rows(self, frame):
+        numbers = np.arange(self.rows + 1, self.rows + len(frame) + 1).astype(str).astype(object)
+        xml = '<row r="' + numbers + '">'
+        for letter, column in zip(self.letters, COLUMNS):
+            text, present = _xml_text(frame[column])
+            cell = '<c r="' + letter + numbers + '" t="inlineStr"><is><t xml:space="preserve">' + text + '</t></is></c>'
+            # Empty cells are left out
+            xml = xml + np.where(present, cell, '')
+        self.sheet.write(('\n'.join((xml + '</row>').tolist()) + '\n').encode())
+        self.rows += len(frame)
+
+    def write(self, frame):
+        if self.widths is None:
+            self.widths = column_widths(frame, self.sample_rows)
+        start = 0
+        while start < len(frame):
+            if self.sheet is None or self.rows >= EXCEL_MAX_ROWS:
+                # Results past Excel's row limit continue on another sheet
+                self._new_sheet()
+            part = frame.iloc[start:start + EXCEL_MAX_ROWS - self.rows]
+            self._write_rows(part)
+            start += len(part)
+
+    def close(self):
+        if self.sheet is None:
+            self.widths = {column: len(column) + 2 for column in COLUMNS}
+            self._new_sheet()
+        self._end_sheet()
+        count = len(self.sheets)
+        sheets = ''.join(f'<sheet name="{title}" sheetId="{n}" r:id="rId{n}"/>'
+                         for n, title in enumerate(self.sheets, start=1))
+        rels = ''.join(f'<Relationship Id="rId{n}" Type="{_REL}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                       for n in range(1, count + 1))
+        overrides = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for n in range(1, count + 1))
+        self.zip.writestr('[Content_Types].xml', (
+            f'{_XML}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{overrides}</Types>'))
+        self.zip.writestr('_rels/.rels', (
+            f'{_XML}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{_REL}/officeDocument" Target="xl/workbook.xml"/></Relationships>'))
+        self.zip.writestr('xl/workbook.xml', (
+            f'{_XML}<workbook {_NS} xmlns:r="{_REL}"><sheets>{sheets}</sheets></workbook>'))
+        self.zip.writestr('xl/_rels/workbook.xml.rels', (
+            f'{_XML}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}'
+            f'<Relationship Id="rId{count + 1}" Type="{_REL}/styles" Target="styles.xml"/></Relationships>'))
+        self.zip.writestr('xl/styles.xml', _STYLES)
+        self.zip.close()
+
+
+class CsvWriter:
+    def __init__(self, path, sample_rows):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.header = True
+
+    def write(self, frame):
+        frame.to_csv(self.file, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        if self.header:
+            pd.DataFrame(columns=COLUMNS).to_csv(self.file, index=False)
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path, sample_rows):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs the pyarrow package")
+        self.pa = pyarrow
+        self.schema = pyarrow.schema([(column, pyarrow.string()) for column in COLUMNS])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, frame):
+        self.writer.write_table(self.pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'xlsx': XlsxWriter, 'csv': CsvWriter, 'parquet': ParquetWriter}
+
+
+def convert(path, output, fmt, batch_rows=50000, sample_rows=1000):
+    """Writes the results of a kyverno report to output; returns the number of rows."""
+    writer = WRITERS[fmt](output, sample_rows)
+    rows = 0
+    try:
+        for frame in iter_frames(path, batch_rows):
+            writer.write(frame)
+            rows += len(frame)
+    finally:
+        writer.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exports the results of a kyverno report as Excel, CSV or Parquet.")
+    parser.add_argument("input", nargs="?", default="kyverno.json", help="kyverno.json, or the kyverno.zip holding it")
+    parser.add_argument("-o", "--output", help="Defaults to kyverno_report.<format>")
+    parser.add_argument("--format", choices=FORMATS, help="Taken from the output extension, xlsx otherwise")
+    parser.add_argument("--batch-rows", type=int, default=int(os.getenv("KYVERNO_EXPORT_BATCH", "50000")),
+                        help="Results flattened and written at a time")
+    parser.add_argument("--width-sample", type=int, default=1000, help="Rows the column widths are estimated from")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        ext = os.path.splitext(args.output or "")[1].lstrip(".").lower()
+        fmt = ext if ext in FORMATS else "xlsx"
+    output = args.output or f"kyverno_report.{fmt}"
+    try:
+        rows = convert(args.input, output, fmt, max(1, args.batch_rows), max(1, args.width_sample))
+    except (OSError, ValueError) as e:
+        print(f"Error exporting {args.input}: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Conversion completed! {rows} results written to '{output}'")
 
-# Save to Excel with auto-adjusted column widths
-with pd.ExcelWriter('kyverno_report.xlsx', engine='openpyxl') as writer:
-    df.to_excel(writer, index=False, sheet_name='Policy Report')
-    worksheet = writer.sheets['Policy Report']
-    for idx, col in enumerate(df.columns):
-        max_length = max(df[col].astype(str).apply(len).max(), len(col)) + 2
-        worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)  # limit to 50 characters width
 
-print("Conversion completed! Excel file has been created as 'kyverno_report.xlsx'")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
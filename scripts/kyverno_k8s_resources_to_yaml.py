@@ -1,12 +1,201 @@
-import sys
+import argparse
+import hashlib
 import json
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
 import yaml
 
-try:
-    data = json.load(sys.stdin)
-    for item in data.get('items', []):
-        print('---')
-        print(yaml.dump(item, default_flow_style=False))
-except Exception as e:
-    print(f"Error processing JSON: {e}", file=sys.stderr)
-    sys.exit(1)
+# libyaml emitter when available, the pure Python one otherwise
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# Bookkeeping that no policy matches on, and the bulk of every pod object
+LAST_APPLIED = "kubectl.kubernetes.io/last-applied-configuration"
+
+def list_pages(chunk_size):
+    """Yields the pod list one API page at a time, following continue tokens."""
+    token = ""
+    while True:
+        query = {"limit": chunk_size}
+        if token:
+            query["continue"] = token
+        path = "/api/v1/pods?" + urllib.parse.urlencode(query)
+        proc = subprocess.run(["kubectl", "get", "--raw", path], stdout=subprocess.PIPE)
+        if proc.returncode != 0:
+            raise RuntimeError(f"kubectl get --raw {path} exited with status {proc.returncode}")
+        page = json.loads(proc.stdout)
+        yield page.get("items") or []
+        token = (page.get("metadata") or {}).get("continue")
+        if not token:
+            break
+
+def read_pages(path, chunk_size):
+    """Yields the pods of a saved pod list (the dashboard's inventory snapshot) in chunks."""
+    with open(path) as f:
+        items = json.load(f).get("items") or []
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+def content_hash(obj):
+    # Same hashing as security-dashboard/backend/services/fingerprints.py
+    data = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+def policy_hash(policy_dir):
+    # Any policy change invalidates every recorded result
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(os.listdir(policy_dir)):
+        if name.endswith(".yaml"):
+            h.update(name.encode())
+            with open(os.path.join(policy_dir, name), "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def pod_key(pod):
+    metadata = pod.get("metadata") or {}
+    return metadata.get("uid") or f"{metadata.get('namespace')}/{metadata.get('name')}"
+
+def pod_fingerprint(pod):
+    # resourceVersion moves with every status update; policies only see the stripped object
+    metadata = {k: v for k, v in (pod.get("metadata") or {}).items() if k != "resourceVersion"}
+    return content_hash({**pod, "metadata": metadata})
+
+class Fingerprints:
+    """The fingerprint store file of the kyverno scan (see services/fingerprints.py)."""
+
+    def __init__(self, path, salt):
+        self.path = path
+        self.salt = salt
+        self.previous = {}
+        self.current = {}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return
+        if doc.get("salt", "") == self.salt:
+            self.previous = doc.get("objects") or {}
+
+    def unchanged(self, key, fingerprint):
+        self.current[key] = fingerprint
+        return self.previous.get(key) == fingerprint
+
+    def write_next(self):
+        # Only moved over the store by kyverno_scan.sh once the merged report is written
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.next", "w") as f:
+            json.dump({"salt": self.salt, "updated_at": time.time(), "objects": self.current}, f)
+
+def strip(pod):
+    # Raw list items carry no kind, kyverno needs it to match policies
+    pod.setdefault("apiVersion", "v1")
+    pod.setdefault("kind", "Pod")
+    pod.pop("status", None)
+    metadata = pod.get("metadata") or {}
+    metadata.pop("managedFields", None)
+    annotations = metadata.get("annotations")
+    if annotations:
+        annotations.pop(LAST_APPLIED, None)
+    return pod
+
+class ShardWriter:
+    """Spreads pods over N YAML streams, keeping each namespace in one shard.
+
+    The API returns pods ordered by namespace, so giving each new namespace
+    to the currently smallest shard keeps the shards roughly even. The pod
+    keys of each shard are listed in resources-<n>.keys, so kyverno_scan.sh
+    can forget the fingerprints of a shard that failed.
+    """
+
+    def __init__(self, output_dir, shards):
+        self.output_dir = output_dir
+        self.shards = max(1, shards)
+        self.dumpers = {}
+        self.files = {}
+        self.sizes = [0] * self.shards
+        self.assigned = {}
+        self.keys = {}
+
+    def _dumper(self, shard):
+        if shard not in self.dumpers:
+            f = self.files[shard] = open(os.path.join(self.output_dir, f"resources-{shard}.yaml"), "w")
+            dumper = self.dumpers[shard] = Dumper(f, default_flow_style=False, explicit_start=True)
+            dumper.open()
+        return self.dumpers[shard]
+
+    def write(self, pod, key):
+        namespace = (pod.get("metadata") or {}).get("namespace")
+        shard = self.assigned.get(namespace)
+        if shard is None:
+            shard = self.assigned[namespace] = self.sizes.index(min(self.sizes))
+        self.sizes[shard] += 1
+        self.keys.setdefault(shard, []).append(key)
+        dumper = self._dumper(shard)
+        dumper.represent(pod)
+
+    def close(self):
+        for shard, dumper in self.dumpers.items():
+            dumper.close()
+            dumper.dispose()
+            self.files[shard].close()
+            with open(os.path.join(self.output_dir, f"resources-{shard}.keys"), "w") as f:
+                json.dump(self.keys.get(shard, []), f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Collects cluster pods as kyverno resource files.")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--shards", type=int, default=int(os.getenv("KYVERNO_SHARDS", "1")))
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("KYVERNO_CHUNK_SIZE", "500")))
+    parser.add_argument("--pods-file", help="Pod list to read instead of listing the cluster (INVENTORY_DIR/pods.json)")
+    parser.add_argument("--fingerprints", help="Fingerprint store to record pod versions in")
+    parser.add_argument("--policy-dir", help="Policies the fingerprints are salted with")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only write pods that changed since the fingerprints were recorded")
+    parser.add_argument("--keep-file", help="Where to list the unchanged pods whose previous results stay")
+    args = parser.parse_args()
+
+    store = None
+    if args.fingerprints:
+        store = Fingerprints(args.fingerprints, policy_hash(args.policy_dir) if args.policy_dir else "")
+        if args.incremental:
+            store.load()
+
+    writer = ShardWriter(args.output_dir, args.shards)
+    count = 0
+    kept = []
+    pages = read_pages(args.pods_file, args.chunk_size) if args.pods_file else list_pages(args.chunk_size)
+    try:
+        for items in pages:
+            for pod in items:
+                pod = strip(pod)
+                count += 1
+                key = pod_key(pod)
+                if store is not None and store.unchanged(key, pod_fingerprint(pod)):
+                    kept.append(key)
+                    continue
+                writer.write(pod, key)
+    except Exception as e:
+        print(f"Error collecting resources: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        writer.close()
+
+    if store is not None:
+        store.write_next()
+    if args.keep_file:
+        with open(args.keep_file, "w") as f:
+            json.dump(kept, f)
+
+    if args.incremental:
+        print(f"Found {count} pods, {count - len(kept)} changed since the last scan "
+              f"in {len(writer.assigned)} namespaces, split over {len(writer.dumpers)} resource file(s).")
+    else:
+        print(f"Found {count} pods to scan in {len(writer.assigned)} namespaces, "
+              f"split over {len(writer.dumpers)} resource file(s).")
+
+if __name__ == '__main__':
+    main()
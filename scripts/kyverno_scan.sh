@@ -3,18 +3,44 @@
 # Script to run Kyverno scan and generate deduplicated JSON report
 
 set -e
+# Globs over the shard files expand to nothing when the cluster has no pods
+shopt -s nullglob
 
 OUTPUT_DIR="${OUTPUT_DIR:-../new}"
 SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
 KYVERNO_POLICY_DIR="${SCRIPT_DIR}/kyvernopolicy"
 
-mkdir -p "$OUTPUT_DIR/kyverno-report"
+mkdir -p "$OUTPUT_DIR/kyverno-report" "$OUTPUT_DIR/fingerprints"
+# Same store the dashboard keeps for its other scans (services/fingerprints.py)
+FINGERPRINTS="$( cd "$OUTPUT_DIR/fingerprints" && pwd )/kyverno.json"
 cd "$OUTPUT_DIR/kyverno-report"
 
-echo "Generating all-resources.yaml..."
-kubectl get pods -A -o json | python3 "$SCRIPT_DIR/kyverno_k8s_resources_to_yaml.py" > all-resources.yaml
-POD_COUNT=$(kubectl get pods -A --no-headers 2>/dev/null | wc -l)
-echo "Found $POD_COUNT pods to scan."
+# SCAN_INCREMENTAL=1 only evaluates pods changed since the last scan and keeps
+# the previous results of the others; it needs the last report and fingerprints
+INCREMENTAL_ARGS=()
+CONVERT_ARGS=()
+rm -f previous.json unchanged.json
+if [ "${SCAN_INCREMENTAL:-0}" = "1" ] && [ -f kyverno.zip ] && [ -f "$FINGERPRINTS" ]; then
+    echo "Incremental scan: only pods changed since the last scan are evaluated"
+    unzip -p kyverno.zip kyverno.json > previous.json
+    INCREMENTAL_ARGS=(--incremental --keep-file unchanged.json)
+    CONVERT_ARGS=(--previous previous.json --keep unchanged.json)
+fi
+
+# The dashboard shares one inventory snapshot between the stages of a run;
+# its pod list saves this stage from listing the cluster again
+SOURCE_ARGS=()
+if [ -n "${INVENTORY_DIR:-}" ] && [ -f "$INVENTORY_DIR/pods.json" ]; then
+    echo "Using the pods of the cluster inventory snapshot"
+    SOURCE_ARGS=(--pods-file "$INVENTORY_DIR/pods.json")
+fi
+
+# Pages through the pod list and writes the resources kyverno needs, one file
+# per shard (KYVERNO_SHARDS, namespaces are never split across shards)
+echo "Collecting cluster resources..."
+rm -f resources-*.yaml resources-*.keys policy-report-*.yaml
+python3 "$SCRIPT_DIR/kyverno_k8s_resources_to_yaml.py" --output-dir . --shards "${KYVERNO_SHARDS:-1}" \
+    --fingerprints "$FINGERPRINTS" --policy-dir "$KYVERNO_POLICY_DIR" "${SOURCE_ARGS[@]}" "${INCREMENTAL_ARGS[@]}"
 
 # Extract and list policy names
 python3 -c "
@@ -35,22 +61,59 @@ for f in files:
 echo "Running Kyverno scan (this may take a moment)..."
 # Run kyverno apply
 # Note: We capture stdout to the file, but let stderr go to console for progress/warnings
-kyverno apply "$KYVERNO_POLICY_DIR" --resource ./all-resources.yaml --policy-report > policy-report.yaml 2>&1 || true
+PIDS=()
+SHARDS=()
+for RESOURCES in resources-*.yaml; do
+    SHARD="${RESOURCES#resources-}"
+    kyverno apply "$KYVERNO_POLICY_DIR" --resource "./$RESOURCES" --policy-report > "policy-report-$SHARD" 2>&1 &
+    PIDS+=($!)
+    SHARDS+=("${SHARD%.yaml}")
+done
+# kyverno apply exits 1 whenever a policy fails, which is its normal result on a
+# cluster with violations. A shard only counts as broken when it exits with
+# anything else or writes no policy report; its output is then left out of the
+# conversion and its pods out of the fingerprints, so the next scan evaluates them.
+FAILED_KEYS=()
+for i in "${!PIDS[@]}"; do
+    REPORT="policy-report-${SHARDS[$i]}.yaml"
+    STATUS=0
+    wait "${PIDS[$i]}" || STATUS=$?
+    if [ "$STATUS" -gt 1 ] || ! grep -qE '^kind: (Cluster)?PolicyReport' "$REPORT"; then
+        echo "Warning: kyverno failed on resource shard ${SHARDS[$i]} (exit $STATUS):"
+        tail -n 20 "$REPORT"
+        rm -f "$REPORT"
+        FAILED_KEYS+=("resources-${SHARDS[$i]}.keys")
+    fi
+done
+if [ ${#FAILED_KEYS[@]} -gt 0 ]; then
+    python3 -c "
+import json, sys
+path = sys.argv[1]
+with open(path) as f:
+    doc = json.load(f)
+for keys in sys.argv[2:]:
+    with open(keys) as f:
+        for key in json.load(f):
+            doc['objects'].pop(key, None)
+with open(path, 'w') as f:
+    json.dump(doc, f)
+" "$FINGERPRINTS.next" "${FAILED_KEYS[@]}"
+fi
 
 # Legacy workaround removed: Kyverno 1.16+ outputs clean YAML, no need to strip headers.
 # tail -n +6 policy-report.yaml > policy-report.clean.yaml
 # mv policy-report.clean.yaml policy-report.yaml
 
-echo "Validating YAML..."
-python3 -c "import yaml; yaml.safe_load(open('policy-report.yaml'))" && echo "Valid YAML"
-
+# The converter parses the report incrementally and fails on invalid YAML,
+# so there is no separate validation pass over the file.
 echo "Converting to JSON and deduplicating..."
-cat policy-report.yaml | python3 "$SCRIPT_DIR/kyverno_yaml_to_json_dedup.py" > kyverno.json
+python3 "$SCRIPT_DIR/kyverno_yaml_to_json_dedup.py" "${CONVERT_ARGS[@]}" policy-report-*.yaml < /dev/null > kyverno.json
 
 echo "Zipping Kyverno report..."
 zip -q kyverno.zip kyverno.json
 rm kyverno.json
-rm all-resources.yaml
-rm policy-report.yaml
+# The fingerprints only describe the new report once it is in place
+mv "$FINGERPRINTS.next" "$FINGERPRINTS"
+rm -f resources-*.yaml resources-*.keys policy-report-*.yaml previous.json unchanged.json
 
 echo "Kyverno report saved to: $OUTPUT_DIR/kyverno-report/kyverno.zip"
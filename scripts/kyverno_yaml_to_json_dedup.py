@@ -1,7 +1,84 @@
+import argparse
 import sys
 import yaml
 import json
 import uuid
+import hashlib
+from array import array
+from itertools import chain
+from yaml.events import (
+    AliasEvent, DocumentStartEvent, MappingEndEvent, MappingStartEvent,
+    ScalarEvent, SequenceEndEvent, SequenceStartEvent, StreamEndEvent,
+)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+# libyaml parser when available, the pure Python one otherwise
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+class Frozen:
+    """A mapping stored as a shared key tuple plus a value tuple, with strings interned.
+
+    Results repeat the same keys and the same long messages for every pod, so
+    this keeps memory proportional to unique content rather than total results.
+    """
+    __slots__ = ("keys", "values")
+
+    def __init__(self, keys, values):
+        self.keys = keys
+        self.values = values
+
+_shapes = {}
+
+def freeze(obj):
+    if isinstance(obj, dict):
+        keys = tuple(sys.intern(k) if isinstance(k, str) else k for k in obj)
+        keys = _shapes.setdefault(keys, keys)
+        return Frozen(keys, tuple(freeze(v) for v in obj.values()))
+    if isinstance(obj, list):
+        return [freeze(v) for v in obj]
+    if isinstance(obj, str):
+        return sys.intern(obj)
+    return obj
+
+def thaw(obj):
+    if isinstance(obj, Frozen):
+        return {k: thaw(v) for k, v in zip(obj.keys, obj.values)}
+    if isinstance(obj, list):
+        return [thaw(v) for v in obj]
+    return obj
+
+def digest(value):
+    # Fixed-size stand-in for a tuple of (possibly long) strings
+    return hashlib.blake2b(json.dumps(value, default=repr).encode(), digest_size=16).digest()
+
+SUMMARY_KEYS = ("pass", "fail", "warn", "error", "skip")
+
+class ResourceReport:
+    __slots__ = ("scope", "results", "summary")
+
+    def __init__(self, scope):
+        self.scope = freeze(scope)
+        # Indices into the shared table of unique result bodies
+        self.results = array("I")
+        self.summary = array("L", [0] * len(SUMMARY_KEYS))
+
+    def to_item(self, entries):
+        scope = thaw(self.scope)
+        return {
+            "apiVersion": "wgpolicyk8s.io/v1alpha2",
+            "kind": "PolicyReport",
+            "metadata": {
+                "name": f"polr-{uuid.uuid4()}",
+                "namespace": scope.get('namespace'),
+                "labels": {
+                    "app.kubernetes.io/managed-by": "kyverno"
+                },
+                "uid": str(uuid.uuid4())
+            },
+            "scope": scope,
+            "results": [thaw(entries[i]) for i in self.results],
+            "summary": dict(zip(SUMMARY_KEYS, self.summary))
+        }
 
 def get_resource_key(resource):
     return (
@@ -12,110 +89,233 @@ def get_resource_key(resource):
         resource.get('uid')
     )
 
-try:
-    # Load YAML from stdin
-    data = yaml.safe_load(sys.stdin)
-    
-    policy_reports = {}
-    seen_results = set()
+def _tag(loader, kind, event, value=None):
+    if event.tag and event.tag != '!':
+        return event.tag
+    return loader.resolve(kind, value, event.implicit)
 
-    if data and 'results' in data:
-        for result in data['results']:
-            # Filter out autogen rules and skipped results
-            rule_name = result.get('rule', '')
-            status = result.get('result')
-            
-            if rule_name.startswith('autogen-') or status == 'skip':
-                continue
+def compose_node(loader, anchors):
+    # Builds one node from parser events, so a single list item can be
+    # constructed without composing the whole document first
+    event = loader.get_event()
+    if isinstance(event, AliasEvent):
+        return anchors[event.anchor]
+    if isinstance(event, ScalarEvent):
+        node = ScalarNode(_tag(loader, ScalarNode, event, event.value), event.value,
+                          event.start_mark, event.end_mark, style=event.style)
+    elif isinstance(event, SequenceStartEvent):
+        node = SequenceNode(_tag(loader, SequenceNode, event), [],
+                            event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(SequenceEndEvent):
+            node.value.append(compose_node(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+    elif isinstance(event, MappingStartEvent):
+        node = MappingNode(_tag(loader, MappingNode, event), [],
+                           event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(MappingEndEvent):
+            key = compose_node(loader, anchors)
+            node.value.append((key, compose_node(loader, anchors)))
+        node.end_mark = loader.get_event().end_mark
+    else:
+        raise yaml.YAMLError(f"Unexpected YAML event: {event}")
+    if event.anchor:
+        anchors[event.anchor] = node
+    return node
 
-            resources = result.get('resources', [])
-            if not resources:
+def iter_results(stream):
+    """Yields the entries of the top-level 'results' list one at a time."""
+    loader = Loader(stream)
+    try:
+        while not loader.check_event(StreamEndEvent):
+            event = loader.get_event()
+            if not isinstance(event, DocumentStartEvent):
                 continue
-            
-            # Assuming one resource per result for this transformation
-            # Kyverno apply usually outputs one item in 'resources' list per result entry
-            resource = resources[0]
-            res_key = get_resource_key(resource)
-            
-            # Deduplication check
-            # We include the resource key in the dedup key to ensure we don't dedup across different resources
-            # if the same rule applied to multiple resources (though here we are grouping by resource anyway)
-            dedup_key = (
-                result.get('policy'),
-                result.get('rule'),
-                result.get('message'),
-                result.get('result'),
-                res_key
-            )
-            
-            if dedup_key in seen_results:
+            anchors = {}
+            if not loader.check_event(MappingStartEvent):
+                compose_node(loader, anchors)
                 continue
-            seen_results.add(dedup_key)
-            
-            # Create PolicyReport if not exists
-            if res_key not in policy_reports:
-                policy_reports[res_key] = {
-                    "apiVersion": "wgpolicyk8s.io/v1alpha2",
-                    "kind": "PolicyReport",
-                    "metadata": {
-                        "name": f"polr-{uuid.uuid4()}",
-                        "namespace": resource.get('namespace'),
-                        "labels": {
-                            "app.kubernetes.io/managed-by": "kyverno"
-                        },
-                        "uid": str(uuid.uuid4())
-                    },
-                    "scope": resource,
-                    "results": [],
-                    "summary": {"pass": 0, "fail": 0, "warn": 0, "error": 0, "skip": 0}
-                }
-            
-            # Clean up result object (remove 'resources' as it's now in scope)
-            clean_result = result.copy()
-            clean_result.pop('resources', None)
-            
-            # Add result
-            policy_reports[res_key]['results'].append(clean_result)
-            
-            # Update summary
-            status = result.get('result')
-            if status in policy_reports[res_key]['summary']:
-                policy_reports[res_key]['summary'][status] += 1
-
-    # Convert to List
-    # Convert to List
-    report_items = list(policy_reports.values())
-    output = {
-        "apiVersion": "v1",
-        "items": report_items
-    }
-
-    # Calculate and print summary statistics to stderr
-    total_resources = len(report_items)
-    total_pass = sum(item['summary'].get('pass', 0) for item in report_items)
-    total_fail = sum(item['summary'].get('fail', 0) for item in report_items)
-    total_warn = sum(item['summary'].get('warn', 0) for item in report_items)
-    total_error = sum(item['summary'].get('error', 0) for item in report_items)
-    total_skip = sum(item['summary'].get('skip', 0) for item in report_items)
-    
+            loader.get_event()
+            while not loader.check_event(MappingEndEvent):
+                key = loader.construct_document(compose_node(loader, anchors))
+                if key == 'results' and loader.check_event(SequenceStartEvent):
+                    loader.get_event()
+                    while not loader.check_event(SequenceEndEvent):
+                        yield loader.construct_document(compose_node(loader, anchors))
+                    loader.get_event()
+                else:
+                    compose_node(loader, anchors)
+            loader.get_event()
+    finally:
+        loader.dispose()
+
+def convert(results):
+    """Groups deduplicated results by resource.
+
+    Returns the per-resource reports in first-seen order and the table of
+    unique result bodies they index into.
+    """
+    policy_reports = {}
+    seen_results = set()
+    entry_index = {}
+    entries = []
+
+    for result in results:
+        # Filter out autogen rules and skipped results
+        rule_name = result.get('rule', '')
+        status = result.get('result')
+
+        if rule_name.startswith('autogen-') or status == 'skip':
+            continue
+
+        resources = result.get('resources', [])
+        if not resources:
+            continue
+
+        # Assuming one resource per result for this transformation
+        # Kyverno apply usually outputs one item in 'resources' list per result entry
+        resource = resources[0]
+        res_key = tuple(sys.intern(v) if isinstance(v, str) else v for v in get_resource_key(resource))
+
+        # Deduplication check
+        # We include the resource key in the dedup key to ensure we don't dedup across different resources
+        dedup_key = digest([
+            result.get('policy'),
+            result.get('rule'),
+            result.get('message'),
+            result.get('result'),
+            res_key
+        ])
+
+        if dedup_key in seen_results:
+            continue
+        seen_results.add(dedup_key)
+
+        # Create PolicyReport if not exists
+        report = policy_reports.get(res_key)
+        if report is None:
+            report = policy_reports[res_key] = ResourceReport(resource)
+
+        # Drop 'resources' as it's now in scope
+        result.pop('resources', None)
+        body_key = digest(result)
+        index = entry_index.get(body_key)
+        if index is None:
+            index = entry_index[body_key] = len(entries)
+            entries.append(freeze(result))
+        report.results.append(index)
+
+        if status in SUMMARY_KEYS:
+            report.summary[SUMMARY_KEYS.index(status)] += 1
+
+    return list(policy_reports.values()), entries
+
+def write_json(reports, entries, out, kept=()):
+    # Same bytes as json.dumps({"apiVersion": "v1", "items": items}, indent=2),
+    # written one item at a time
+    out.write('{\n  "apiVersion": "v1",\n  "items": [')
+    first = True
+    for item in chain((report.to_item(entries) for report in reports), kept):
+        out.write('\n' if first else ',\n')
+        first = False
+        out.write('\n'.join('    ' + line for line in json.dumps(item, indent=2).split('\n')))
+    out.write('\n  ]\n}\n' if not first else ']\n}\n')
+
+def iter_items(source, chunk_size=1 << 20):
+    """Yields the items of a kyverno.json text stream without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ''
+    while True:
+        start = buf.find('"items"')
+        if start >= 0 and buf.find('[', start) >= 0:
+            break
+        more = source.read(chunk_size)
+        if not more:
+            return
+        buf += more
+    pos = buf.index('[', start) + 1
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buf) and buf[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof:
+                raise
+            more = source.read(chunk_size)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield item
+        pos = end
+
+def resource_keys(scope):
+    # The collector keys pods by uid, falling back to namespace/name
+    return {scope.get('uid'), f"{scope.get('namespace')}/{scope.get('name')}"} - {None}
+
+def kept_items(previous, keep):
+    """Items of the previous report for the resources that did not change since."""
+    if not previous or not keep:
+        return []
+    with open(previous) as source:
+        return [item for item in iter_items(source) if resource_keys(item.get('scope') or {}) & keep]
+
+def print_summary(reports, kept=()):
+    totals = dict.fromkeys(SUMMARY_KEYS, 0)
+    for report in reports:
+        for status, count in zip(SUMMARY_KEYS, report.summary):
+            totals[status] += count
+    for item in kept:
+        for status in SUMMARY_KEYS:
+            totals[status] += (item.get('summary') or {}).get(status, 0)
+
     # Simple separator line
     sep = "-" * 60
-    
+
     print(sep, file=sys.stderr)
     print("                Kyverno Scan Summary", file=sys.stderr)
     print(sep, file=sys.stderr)
-    print(f"  Total Resources Scanned: {total_resources}", file=sys.stderr)
+    print(f"  Total Resources Scanned: {len(reports) + len(kept)}", file=sys.stderr)
+    if kept:
+        print(f"  Unchanged (previous results kept): {len(kept)}", file=sys.stderr)
     print(sep, file=sys.stderr)
-    print(f"  PASS:  {total_pass}", file=sys.stderr)
-    print(f"  FAIL:  {total_fail}", file=sys.stderr)
-    print(f"  WARN:  {total_warn}", file=sys.stderr)
-    print(f"  ERROR: {total_error}", file=sys.stderr)
-    print(f"  SKIP:  {total_skip}", file=sys.stderr)
+    print(f"  PASS:  {totals['pass']}", file=sys.stderr)
+    print(f"  FAIL:  {totals['fail']}", file=sys.stderr)
+    print(f"  WARN:  {totals['warn']}", file=sys.stderr)
+    print(f"  ERROR: {totals['error']}", file=sys.stderr)
+    print(f"  SKIP:  {totals['skip']}", file=sys.stderr)
     print(sep, file=sys.stderr)
     print("", file=sys.stderr)
 
-    print(json.dumps(output, indent=2))
+def iter_files(paths):
+    # Sharded runs produce one report per shard; their results are simply chained
+    for path in paths:
+        with open(path, 'rb') as source:
+            yield from iter_results(source)
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts kyverno policy reports to deduplicated JSON.")
+    parser.add_argument("files", nargs="*", help="Policy reports to read, stdin when none are given")
+    parser.add_argument("--previous", help="kyverno.json of the last scan, for an incremental run")
+    parser.add_argument("--keep", help="JSON list of the unchanged resources whose previous items are kept")
+    args = parser.parse_args()
+
+    results = iter_files(args.files) if args.files else iter_results(sys.stdin.buffer)
+    try:
+        keep = set()
+        if args.keep:
+            with open(args.keep) as f:
+                keep = set(json.load(f))
+        reports, entries = convert(results)
+        kept = kept_items(args.previous, keep)
+        print_summary(reports, kept)
+        write_json(reports, entries, sys.stdout, kept)
+    except Exception as e:
+        print(f"Error processing YAML: {e}", file=sys.stderr)
+        sys.exit(1)
 
-except Exception as e:
-    print(f"Error processing YAML: {e}", file=sys.stderr)
-    sys.exit(1)
+if __name__ == '__main__':
+    main()
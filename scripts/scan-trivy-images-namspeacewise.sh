@@ -24,6 +24,10 @@ if ! command -v kubectl >/dev/null 2>&1; then
   echo "Error: kubectl is not installed or not in PATH" >&2
   exit 1
 fi
+if ! command -v jq >/dev/null 2>&1; then
+  echo "Error: jq is not installed or not in PATH" >&2
+  exit 1
+fi
 if ! command -v trivy >/dev/null 2>&1; then
   echo "Error: trivy is not installed or not in PATH" >&2
   echo "Install: https://aquasecurity.github.io/trivy/v0.50/getting-started/installation/" >&2
@@ -94,6 +98,19 @@ sanitize() {
   echo "$1" | sed -e 's#/#_#g' -e 's#:#_#g' -e 's#@#_#g' -e 's#[^A-Za-z0-9._-]#_#g'
 }
 
+# Runs one trivy image scan in the background, printing a dot a second until it exits
+run_trivy() {
+  local err_log="$1"; shift
+  trivy image $TRIVY_FLAGS "$@" >"$err_log" 2>&1 &
+  local pid=$!
+
+  while kill -0 $pid 2>/dev/null; do
+    echo -n "."
+    sleep 1
+  done
+  wait $pid
+}
+
 # Scan all images in a single namespace and save reports to per-namespace folder
 scan_namespace() {
   local ns="$1"
@@ -103,12 +120,7 @@ scan_namespace() {
   echo -e "${BOLD}[ Namespace: ${ns} — Now Start Scanning ]${RESET}"
   echo
 
-  mapfile -t images < <(
-    kubectl get pods -n "$ns" --field-selector=status.phase=Running \
-      -o jsonpath='{range .items[*]}{range .spec.containers[*]}{.image}{"\n"}{end}{range .spec.initContainers[*]}{.image}{"\n"}{end}{range .spec.ephemeralContainers[*]}{.image}{"\n"}{end}{end}' \
-    | awk 'NF' \
-    | sort -u
-  )
+  mapfile -t images < <(awk -F '\t' -v ns="$ns" '$1 == ns && $2 != "" { print $2 }' "$POD_IMAGES" | sort -u)
 
   if [ ${#images[@]} -eq 0 ]; then
     return 0
@@ -124,15 +136,18 @@ scan_namespace() {
     
     # Capture stderr to a temp file to show on failure
     local err_log=$(mktemp)
-    trivy image $TRIVY_FLAGS -o "$out_file" "$image" >"$err_log" 2>&1 &
-    local pid=$!
-    
-    while kill -0 $pid 2>/dev/null; do
-      echo -n "."
-      sleep 1
-    done
-    wait $pid
-    local ret=$?
+    local ret=0
+    if [ -n "${TRIVY_SERVER_URL:-}" ]; then
+      # Thin client of the dashboard's trivy server, which keeps the DB and layer cache warm;
+      # an image the client could not scan is tried once more standalone
+      run_trivy "$err_log" --server "$TRIVY_SERVER_URL" -o "$out_file" "$image" || ret=$?
+      if [ $ret -ne 0 ]; then
+        ret=0
+        run_trivy "$err_log" -o "$out_file" "$image" || ret=$?
+      fi
+    else
+      run_trivy "$err_log" -o "$out_file" "$image" || ret=$?
+    fi
     
     # echo "" removed to preventing blank line in UI
     if [ $ret -eq 0 ]; then
@@ -146,9 +161,31 @@ scan_namespace() {
   done
 }
 
+# Images of every running pod as "<namespace>\t<image>" lines, from one pod
+# listing rather than one per namespace. The dashboard's inventory snapshot
+# (INVENTORY_DIR) already holds the pods and namespaces, so they are read from there.
+POD_IMAGES=$(mktemp)
+trap 'rm -f "$POD_IMAGES"' EXIT
+IMAGES_FILTER='.items[]
+  | select(.status.phase == "Running")
+  | .metadata.namespace as $ns
+  | (.spec.containers[]?, .spec.initContainers[]?, .spec.ephemeralContainers[]?)
+  | "\($ns)\t\(.image // "")"'
+if [ -n "${INVENTORY_DIR:-}" ] && [ -f "$INVENTORY_DIR/pods.json" ]; then
+  jq -r "$IMAGES_FILTER" "$INVENTORY_DIR/pods.json" > "$POD_IMAGES"
+elif [[ "${NAMESPACE^^}" == "ALL" ]]; then
+  kubectl get pods -A --field-selector=status.phase=Running -o json | jq -r "$IMAGES_FILTER" > "$POD_IMAGES"
+else
+  kubectl get pods -n "$NAMESPACE" --field-selector=status.phase=Running -o json | jq -r "$IMAGES_FILTER" > "$POD_IMAGES"
+fi
+
 # Entry
 if [[ "${NAMESPACE^^}" == "ALL" ]]; then
-  mapfile -t namespaces < <(kubectl get ns -o jsonpath='{range .items[*]}{.metadata.name}{"\n"}{end}' | awk 'NF' | sort)
+  if [ -n "${INVENTORY_DIR:-}" ] && [ -f "$INVENTORY_DIR/namespaces.json" ]; then
+    mapfile -t namespaces < <(jq -r '.items[].metadata.name' "$INVENTORY_DIR/namespaces.json" | awk 'NF' | sort)
+  else
+    mapfile -t namespaces < <(kubectl get ns -o jsonpath='{range .items[*]}{.metadata.name}{"\n"}{end}' | awk 'NF' | sort)
+  fi
   if [ ${#namespaces[@]} -eq 0 ]; then
     echo "No namespaces found."
     exit 1
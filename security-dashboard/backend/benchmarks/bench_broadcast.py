@@ -0,0 +1,82 @@
+"""Scanner-side broadcast throughput with many slow WebSocket viewers.
+
+Run from security-dashboard/backend:
+    python -m benchmarks.bench_broadcast --clients 200 --chunks 2000 --delay-ms 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from services.broadcast import ConnectionManager
+
+
+class SlowSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+
+    async def send_text(self, message: str):
+        await asyncio.sleep(self.delay)
+        self.received += len(message)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class SequentialManager:
+    """The previous broadcast: await every socket in turn inside the read loop."""
+
+    def __init__(self):
+        self.active_connections = {}
+
+    def subscribe(self, websocket, scan_id):
+        self.active_connections.setdefault(scan_id, []).append(websocket)
+
+    async def broadcast(self, message, scan_id):
+        for connection in self.active_connections.get(scan_id, []):
+            await connection.send_text(message)
+
+
+async def run(manager, clients: int, chunks: int, chunk_size: int, delay: float, read_interval: float) -> dict:
+    sockets = [SlowSocket(delay) for _ in range(clients)]
+    for ws in sockets:
+        manager.subscribe(ws, "bench")
+    chunk = "x" * (chunk_size - 1) + "\n"
+
+    started = time.perf_counter()
+    for _ in range(chunks):
+        # Stand-in for process.stdout.read() returning the next chunk
+        await asyncio.sleep(read_interval)
+        await manager.broadcast(chunk, "bench")
+    producer_seconds = time.perf_counter() - started
+    await asyncio.sleep(delay * 4 + 0.2)
+
+    produced = chunks * chunk_size
+    return {
+        "producer_seconds": round(producer_seconds, 3),
+        "producer_mb_per_s": round(produced / producer_seconds / 1e6, 4),
+        "min_delivered_ratio": round(min(ws.received for ws in sockets) / produced, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--delay-ms", type=float, default=20, help="Per-send latency of each viewer")
+    parser.add_argument("--read-interval-ms", type=float, default=0.5)
+    parser.add_argument("--baseline-chunks", type=int, default=10, help="Chunks for the sequential baseline, it is slow")
+    args = parser.parse_args()
+    delay, interval = args.delay_ms / 1000, args.read_interval_ms / 1000
+
+    results = {
+        "fanout": asyncio.run(run(ConnectionManager(), args.clients, args.chunks, args.chunk_size, delay, interval)),
+        "sequential": asyncio.run(run(SequentialManager(), args.clients, args.baseline_chunks, args.chunk_size, delay, interval)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Wall time and peak RSS of the Kyverno policy-report converter on a synthetic report.
+
+Run from security-dashboard/backend:
+    python -m benchmarks.bench_kyverno_convert --results 100000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "scripts"))
+CONVERTER = os.path.join(SCRIPTS_DIR, "kyverno_yaml_to_json_dedup.py")
+
+POLICIES = [
+    ("disallow-latest-tag", "require-image-tag", "fail", "validation error: An image tag is required. rule require-image-tag failed at path /spec/containers/0/image/"),
+    ("require-pod-requests-limits", "validate-resources", "fail", "validation error: CPU and memory resource requests and memory limits are required for containers. rule validate-resources failed at path /spec/containers/0/resources/limits/"),
+    ("require-ro-rootfs", "validate-readOnlyRootFilesystem", "pass", "validation rule 'validate-readOnlyRootFilesystem' passed."),
+    ("disallow-privileged-containers", "privileged-containers", "pass", "validation rule 'privileged-containers' passed."),
+    ("require-probes", "autogen-validate-probes", "fail", "validation error: Liveness, readiness, or startup probes are required for all containers."),
+    ("restrict-seccomp", "check-seccomp", "skip", "rule skipped due to precondition"),
+]
+
+
+def write_report(path: str, results: int, pods: int):
+    with open(path, "w") as f:
+        f.write("apiVersion: wgpolicyk8s.io/v1alpha2\nkind: ClusterPolicyReport\nmetadata:\n  name: merged\nresults:\n")
+        for i in range(results):
+            pod = i % pods
+            policy, rule, result, message = POLICIES[i // pods % len(POLICIES)]
+            f.write(
+                f"- category: Best Practices\n  message: \"{message}\"\n  policy: {policy}\n"
+                f"  resources:\n  - apiVersion: v1\n    kind: Pod\n    name: app-{pod}\n"
+                f"    namespace: ns-{pod % 300}\n    uid: 00000000-0000-0000-0000-{pod:012d}\n"
+                f"  result: {result}\n  rule: {rule}\n  scored: true\n  severity: medium\n"
+                f"  source: kyverno\n  timestamp:\n    nanos: 0\n    seconds: 1700000000\n"
+            )
+        f.write("summary:\n  error: 0\n  fail: 0\n  pass: 0\n  skip: 0\n  warn: 0\n")
+
+
+def legacy_convert(path: str):
+    """The converter as it was: whole-document safe_load, then one json.dumps."""
+    import uuid
+    import yaml
+
+    with open(path) as f:
+        data = yaml.safe_load(f)
+    policy_reports = {}
+    seen_results = set()
+    for result in data.get("results", []):
+        if result.get("rule", "").startswith("autogen-") or result.get("result") == "skip":
+            continue
+        resources = result.get("resources", [])
+        if not resources:
+            continue
+        resource = resources[0]
+        res_key = (resource.get("apiVersion"), resource.get("kind"), resource.get("namespace"),
+                   resource.get("name"), resource.get("uid"))
+        dedup_key = (result.get("policy"), result.get("rule"), result.get("message"), result.get("result"), res_key)
+        if dedup_key in seen_results:
+            continue
+        seen_results.add(dedup_key)
+        if res_key not in policy_reports:
+            policy_reports[res_key] = {
+                "apiVersion": "wgpolicyk8s.io/v1alpha2", "kind": "PolicyReport",
+                "metadata": {"name": f"polr-{uuid.uuid4()}", "namespace": resource.get("namespace"),
+                             "labels": {"app.kubernetes.io/managed-by": "kyverno"}, "uid": str(uuid.uuid4())},
+                "scope": resource, "results": [],
+                "summary": {"pass": 0, "fail": 0, "warn": 0, "error": 0, "skip": 0},
+            }
+        clean_result = result.copy()
+        clean_result.pop("resources", None)
+        policy_reports[res_key]["results"].append(clean_result)
+        if result.get("result") in policy_reports[res_key]["summary"]:
+            policy_reports[res_key]["summary"][result.get("result")] += 1
+    print(json.dumps({"apiVersion": "v1", "items": list(policy_reports.values())}, indent=2))
+
+
+def measure(command: list, stdin_path: str) -> dict:
+    with open(stdin_path, "rb") as stdin, open(os.devnull, "wb") as devnull:
+        started = time.perf_counter()
+        proc = subprocess.Popen(command, stdin=stdin, stdout=devnull, stderr=devnull)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - started
+    # ru_maxrss is in KiB on Linux
+    return {"exit_status": status, "wall_seconds": round(elapsed, 2), "peak_rss_mb": round(usage.ru_maxrss / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=100000)
+    parser.add_argument("--pods", type=int, default=20000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--run-legacy", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_legacy:
+        legacy_convert(args.run_legacy)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = os.path.join(tmp, "policy-report.yaml")
+        write_report(report, args.results, args.pods)
+        out = {"results": args.results, "input_mb": round(os.path.getsize(report) / 1e6, 1)}
+        out["streaming"] = measure([sys.executable, CONVERTER, report], os.devnull)
+        if not args.skip_legacy:
+            out["legacy"] = measure([sys.executable, "-m", "benchmarks.bench_kyverno_convert", "--run-legacy", report], os.devnull)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
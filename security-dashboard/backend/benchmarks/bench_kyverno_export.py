@@ -0,0 +1,127 @@
+"""Wall time, peak RSS and output size of the Kyverno report export on a synthetic kyverno.json.
+
+Run from security-dashboard/backend:
+    python -m benchmarks.bench_kyverno_export --results 1000000 --skip-legacy
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "scripts"))
+EXPORTER = os.path.join(SCRIPTS_DIR, "convert_json_to_excel.py")
+
+RESULTS = [
+    ("disallow-latest-tag", "require-image-tag", "fail", "validation error: An image tag is required. rule require-image-tag failed at path /spec/containers/0/image/"),
+    ("require-pod-requests-limits", "validate-resources", "fail", "validation error: CPU and memory resource requests and memory limits are required for containers."),
+    ("require-ro-rootfs", "validate-readOnlyRootFilesystem", "pass", "validation rule 'validate-readOnlyRootFilesystem' passed."),
+    ("disallow-privileged-containers", "privileged-containers", "pass", "validation rule 'privileged-containers' passed."),
+]
+
+
+def write_report(path: str, results: int, per_pod: int):
+    # Same layout as kyverno_yaml_to_json_dedup.py writes: one item per pod, its results inside
+    with open(path, "w") as f:
+        f.write('{\n  "apiVersion": "v1",\n  "items": [')
+        pods = (results + per_pod - 1) // per_pod
+        for pod in range(pods):
+            scope = {"apiVersion": "v1", "kind": "Pod", "name": f"app-{pod}", "namespace": f"ns-{pod % 300}",
+                     "uid": f"00000000-0000-0000-0000-{pod:012d}"}
+            item = {
+                "apiVersion": "wgpolicyk8s.io/v1alpha2", "kind": "PolicyReport",
+                "metadata": {"name": f"polr-{pod}", "namespace": scope["namespace"],
+                             "labels": {"app.kubernetes.io/managed-by": "kyverno"}, "uid": f"uid-{pod}"},
+                "scope": scope,
+                "results": [
+                    {"category": "Best Practices", "message": message, "policy": policy, "result": result,
+                     "rule": rule, "scored": True, "severity": "medium", "source": "kyverno",
+                     "timestamp": {"nanos": 0, "seconds": 1700000000}}
+                    for policy, rule, result, message in
+                    (RESULTS[(pod + i) % len(RESULTS)] for i in range(min(per_pod, results - pod * per_pod)))
+                ],
+            }
+            f.write("\n" if pod == 0 else ",\n")
+            f.write(json.dumps(item, indent=2))
+        f.write("\n  ]\n}\n")
+
+
+def legacy_export(path: str, output: str):
+    """The exporter as it was: a dict per result, then pandas to_excel through openpyxl in normal mode."""
+    import pandas as pd
+
+    with open(path) as file:
+        json_data = json.load(file)
+    all_results = []
+    for item in json_data.get("items", []):
+        metadata = item.get("metadata", {})
+        for result in item.get("results") or []:
+            resources = result.get("resources", [{}])[0] if result.get("resources") else {}
+            all_results.append({
+                "report_name": metadata.get("name", ""),
+                "report_namespace": metadata.get("namespace", ""),
+                "owner_kind": metadata.get("ownerReferences", [{}])[0].get("kind", "") if metadata.get("ownerReferences") else "",
+                "policy": result.get("policy", ""),
+                "rule": result.get("rule", ""),
+                "status": result.get("result", ""),
+                "message": result.get("message", ""),
+                "severity": result.get("severity", ""),
+                "resource_name": resources.get("name", ""),
+                "resource_labels": str(resources.get("labels", {})),
+                "timestamp": str(result.get("timestamp", "")),
+            })
+    df = pd.DataFrame(all_results)
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="Policy Report")
+        worksheet = writer.sheets["Policy Report"]
+        for idx, col in enumerate(df.columns):
+            max_length = max(df[col].astype(str).apply(len).max(), len(col)) + 2
+            worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+
+
+def measure(command: list, output: str) -> dict:
+    with open(os.devnull, "wb") as devnull:
+        started = time.perf_counter()
+        proc = subprocess.Popen(command, stdout=devnull, stderr=subprocess.PIPE)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - started
+    result = {"exit_status": status, "wall_seconds": round(elapsed, 2), "peak_rss_mb": round(usage.ru_maxrss / 1024, 1)}
+    if os.path.exists(output):
+        result["output_mb"] = round(os.path.getsize(output) / 1e6, 1)
+        os.remove(output)
+    else:
+        result["error"] = proc.stderr.read().decode(errors="replace").strip()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=100000)
+    parser.add_argument("--per-pod", type=int, default=20)
+    parser.add_argument("--formats", default="xlsx,csv,parquet")
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--run-legacy", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_legacy:
+        legacy_export(*args.run_legacy)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = os.path.join(tmp, "kyverno.json")
+        write_report(report, args.results, args.per_pod)
+        out = {"results": args.results, "input_mb": round(os.path.getsize(report) / 1e6, 1)}
+        for fmt in args.formats.split(","):
+            output = os.path.join(tmp, f"export.{fmt}")
+            out[fmt] = measure([sys.executable, EXPORTER, report, "-o", output], output)
+        if not args.skip_legacy:
+            output = os.path.join(tmp, "legacy.xlsx")
+            out["legacy_xlsx"] = measure(
+                [sys.executable, "-m", "benchmarks.bench_kyverno_export", "--run-legacy", report, output], output)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
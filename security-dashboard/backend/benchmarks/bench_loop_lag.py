@@ -0,0 +1,113 @@
+"""Event-loop lag while large reports are read and saved concurrently.
+
+Compares the report work done inline in the coroutine (as the handlers used
+to) with what the handlers do now through services.executors: stream the
+body of a compact report, project ?fields= in a worker process that writes
+a file to send, and save a report on an I/O thread.
+
+Run from security-dashboard/backend:
+    python -m benchmarks.bench_loop_lag --report-mb 50 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from services import executors, report_store
+
+
+def make_report(size_mb: int) -> dict:
+    # Shaped like a scan report: a few stages whose output dominates the size
+    line = "[kyverno] policy require-pod-requests-limits failed for default/app-0 in namespace default\n"
+    output = line * (size_mb * 1024 * 1024 // len(line) // 4)
+    return {
+        "id": "bench",
+        "request": {"scan_type": "all", "parameters": {}},
+        "timing": {"mode": "parallel", "wall_seconds": 1.0},
+        "results": [{"scan_type": f"stage-{i}", "status": "completed", "output": output} for i in range(4)],
+    }
+
+
+async def inline_load(path: str):
+    with open(path, "r") as f:
+        return json.dumps(json.load(f))
+
+
+async def inline_save(path: str, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+async def stream_body(path: str) -> int:
+    chunks = await executors.run_io(report_store.iter_json, path)
+    sent = 0
+    async for chunk in executors.iterate_io(chunks):
+        sent += len(chunk)
+    return sent
+
+
+async def project_fields(path: str, out_path: str, size_hint: int) -> int:
+    # Written by the worker, then sent from the file as the handler's FileResponse does
+    paths = [["id"], ["results", "output"]]
+    await executors.run_cpu(report_store.load_fields, path, paths, out_path, size_hint=size_hint)
+    with open(out_path, "rb") as f:
+        chunks = iter(lambda: f.read(64 * 1024), b"")
+        sent = 0
+        async for chunk in executors.iterate_io(chunks):
+            sent += len(chunk)
+    return sent
+
+
+async def measure(name: str, make_jobs, rounds: int) -> dict:
+    monitor = executors.LoopLagMonitor(interval_ms=5)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*make_jobs())
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.05)
+    monitor.stop()
+    snap = monitor.snapshot()
+    return {"mode": name, "wall_seconds": round(elapsed, 2), "p50_ms": snap["p50_ms"],
+            "p99_ms": snap["p99_ms"], "max_ms": snap["max_ms"]}
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        report = make_report(args.report_mb)
+        legacy = os.path.join(tmp, "report.json")
+        compact = os.path.join(tmp, "report.rpt")
+        report_store.save(legacy, report)
+        report_store.save(compact, report)
+        size_hint = report_store.decoded_size(compact)
+        out = {"report_mb": round(os.path.getsize(legacy) / 1e6, 1), "concurrency": args.concurrency, "runs": []}
+
+        def inline_jobs():
+            jobs = [inline_load(legacy) for _ in range(args.concurrency)]
+            return jobs + [inline_save(os.path.join(tmp, "copy.json"), report)]
+
+        def executor_jobs():
+            jobs = [stream_body(compact) for _ in range(args.concurrency - args.concurrency // 2)]
+            jobs += [project_fields(compact, os.path.join(tmp, f"fields-{i}.json"), size_hint)
+                     for i in range(args.concurrency // 2)]
+            return jobs + [executors.run_io(report_store.save, os.path.join(tmp, "copy.rpt"), report)]
+
+        out["runs"].append(await measure("inline", inline_jobs, args.rounds))
+        out["runs"].append(await measure("executors", executor_jobs, args.rounds))
+        executors.shutdown()
+    print(json.dumps(out, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--report-mb", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Size and load time of scan reports in the old JSON format and the compact one.
+
+Run from security-dashboard/backend:
+    python -m benchmarks.bench_report_store --report-mb 100
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from services import report_store
+
+STAGES = ["kube-bench", "kyverno", "trivy-cluster", "trivy-image", "trivy-sbom", "nmap"]
+
+
+def log_line(rng: random.Random, stage: str) -> str:
+    ns = f"ns-{rng.randrange(300)}"
+    pod = f"app-{rng.randrange(5000)}"
+    if stage == "kyverno":
+        return f"policy require-pod-requests-limits -> resource {ns}/Pod/{pod} failed: validation error at /spec/containers/{rng.randrange(4)}/resources/limits/\n"
+    if stage.startswith("trivy"):
+        return f"{ns}/{pod}: CVE-20{rng.randrange(15, 25)}-{rng.randrange(100000)} {rng.choice(['LOW', 'MEDIUM', 'HIGH', 'CRITICAL'])} libssl3 3.0.{rng.randrange(20)} fixed in 3.0.{rng.randrange(20, 30)}\n"
+    if stage == "nmap":
+        return f"10.96.{rng.randrange(256)}.{rng.randrange(256)}:443 | TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256 (ecdh_x25519) - A\n"
+    return f"[{rng.choice(['PASS', 'FAIL', 'WARN'])}] {rng.randrange(1, 6)}.{rng.randrange(1, 9)}.{rng.randrange(1, 30)} Ensure that the --kubelet-https argument is set to true (Automated)\n"
+
+
+def make_report(size_mb: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    per_stage = size_mb * 1024 * 1024 // len(STAGES)
+    results = []
+    for stage in STAGES:
+        lines, size = [], 0
+        while size < per_stage:
+            line = log_line(rng, stage)
+            lines.append(line)
+            size += len(line)
+        results.append({"scan_type": stage, "status": "completed", "output": "".join(lines), "wall_seconds": 12.5})
+    return {
+        "id": "bench",
+        "request": {"scan_type": "all", "parameters": {}},
+        "timestamp": "2026-01-01T00:00:00",
+        "timing": {"mode": "parallel", "wall_seconds": 60.0, "stages": {s: 12.5 for s in STAGES}},
+        "results": results,
+    }
+
+
+def timed(func, *args, **kwargs) -> float:
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return round(time.perf_counter() - started, 3)
+
+
+def legacy_load(path: str):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--report-mb", type=int, default=100)
+    args = parser.parse_args()
+
+    report = make_report(args.report_mb)
+    codecs = ["gzip"] + (["zstd"] if report_store.zstandard else [])
+    out = {
+        "report_mb": args.report_mb,
+        "json_codec": "orjson" if report_store.orjson else "json",
+        "formats": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.json")
+        out["formats"].append({
+            "format": "json",
+            "write_seconds": timed(report_store.save, path, report),
+            "bytes": os.path.getsize(path),
+            "load_seconds": timed(legacy_load, path),
+            "metadata_seconds": timed(legacy_load, path),
+        })
+        for codec in codecs:
+            path = os.path.join(tmp, f"bench-{codec}.rpt")
+            out["formats"].append({
+                "format": f"compact/{codec}",
+                "write_seconds": timed(report_store.save, path, report, codec),
+                "bytes": os.path.getsize(path),
+                "load_seconds": timed(report_store.load, path),
+                "metadata_seconds": timed(report_store.load, path, results=False),
+                "one_stage_output_seconds": timed(report_store.load_output, path, "nmap"),
+                "output_page_seconds": timed(report_store.load_output, path, "nmap",
+                                             len(report["results"][-1]["output"]) // 2, 65536),
+            })
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
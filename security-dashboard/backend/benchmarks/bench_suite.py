@@ -0,0 +1,547 @@
+"""End-to-end scan, API and converter benchmarks against fake cluster tools, recorded as a JSON baseline.
+
+benchmarks/fake_tools stands in for kubectl, trivy, kyverno, nmap and
+kube-bench with a synthetic cluster (FAKE_* settings, see synthetic.py), so
+no cluster or scanner is needed. At each scale the dashboard runs in a
+scratch APP_HOME and is driven over HTTP and WebSockets:
+
+- scan: an "all" scan followed by many WebSocket viewers, cold then warm
+- reports: GET /api/reports/ pages and report bodies, over seeded reports
+- files: GET /api/files/list over the scan's artifacts
+- converters: the kyverno resource, dedup and export scripts, offline
+
+Scale 1 is a small cluster (5 namespaces, 40 pods, 15 services, 12 images).
+Tool latencies are realistic at --time-scale 1; the default compresses them.
+
+Run from security-dashboard/backend:
+    python -m benchmarks.bench_suite --scales 10,100 --output baseline.json
+    python -m benchmarks.bench_suite --scales 10,100 --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import websockets
+
+from services import report_store
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+REPO_DIR = os.path.abspath(os.path.join(BACKEND_DIR, "..", ".."))
+FAKE_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_tools")
+SCRIPTS_DIR = os.path.join(REPO_DIR, "scripts")
+# What the numbered scripts expect to find in APP_HOME
+APP_FILES = ["scripts", "1_run_trivy_sbom.sh", "2_run_trivy_image.sh", "3_run_nmap.sh", "4_run_kube_bench.sh",
+             "5_run_trivy_cluster.sh", "6_run_kyverno.sh", "security-policy-report.html", "logo-mobile.webp"]
+STAGES = ["kube-bench", "kyverno", "trivy-image", "trivy-sbom", "trivy-cluster", "nmap"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(values: List[float], unit: str = "ms", factor: float = 1000) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * factor, 2)
+
+    return {"count": len(ordered), f"p50_{unit}": at(0.50), f"p95_{unit}": at(0.95),
+            f"p99_{unit}": at(0.99), f"max_{unit}": round(ordered[-1] * factor, 2)}
+
+
+def tool_calls(path: str) -> Dict[str, int]:
+    # One line per fake tool invocation: "<time> <tool> <args>"
+    calls: Dict[str, int] = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split(" ", 3)
+                if len(parts) >= 2:
+                    label = " ".join(parts[1:3]) if parts[1] in ("kubectl", "trivy") and len(parts) > 2 else parts[1]
+                    calls[label.strip()] = calls.get(label.strip(), 0) + 1
+    except OSError:
+        pass
+    return dict(sorted(calls.items()))
+
+
+# --- Sandbox ---------------------------------------------------------------
+
+def make_app_home(root: str) -> str:
+    """A scratch APP_HOME linking the repo's scripts, so scans write under root rather than the repo."""
+    app = os.path.join(root, "app")
+    os.makedirs(os.path.join(app, "new"))
+    for name in APP_FILES:
+        source = os.path.join(REPO_DIR, name)
+        if os.path.exists(source):
+            os.symlink(source, os.path.join(app, name))
+    return app
+
+
+def fake_env(scale: float, time_scale: float, call_log: Optional[str] = None) -> Dict[str, str]:
+    env = {
+        **os.environ,
+        "PATH": f"{FAKE_TOOLS}{os.pathsep}{os.environ.get('PATH', '')}",
+        "FAKE_SCALE": str(scale),
+        "FAKE_TIME_SCALE": str(time_scale),
+    }
+    if call_log:
+        env["FAKE_CALL_LOG"] = call_log
+    return env
+
+
+def seed_reports(app: str, count: int, started: datetime):
+    """Writes count finished "all" reports, a day apart, for the report endpoints to page through."""
+    reports_dir = os.path.join(app, "security-dashboard", "backend", "reports")
+    os.makedirs(reports_dir, exist_ok=True)
+    lines = {
+        "kube-bench": "[FAIL] 1.2.{n} Ensure that the API server setting is configured (Automated)\n",
+        "kyverno": "policy require-pod-requests-limits -> resource team-0001/Pod/app-{n:05d} failed\n",
+        "trivy-image": "   Scanning registry.example.com/team-01/app-{n:05d}:1.0.0\n     ✔ scanning completed\n",
+        "trivy-sbom": "Scanning kbom.json component k8s.io/component-{n}\n",
+        "trivy-cluster": "{n} / 400 [========================>               ] 60%\n",
+        "nmap": "svc-{n:05d}.team-0001.svc.cluster.local:443 | |       TLS_AKE_WITH_AES_128_GCM_SHA256 (ecdh_x25519) - A\n",
+    }
+    for i in range(count):
+        timestamp = (started - timedelta(days=count - i)).isoformat()
+        results = [{"scan_type": stage, "status": "completed", "started_at": timestamp, "timestamp": timestamp,
+                    "incremental": False, "timing": None,
+                    "output": "".join(lines[stage].format(n=n) for n in range(200))} for stage in STAGES]
+        report_store.save(report_store.report_file(reports_dir, f"seed-{i:06d}"), {
+            "id": f"seed-{i:06d}",
+            "request": {"scan_type": "all", "scan_id": f"seed-{i:06d}", "target": None, "parameters": {}},
+            "timestamp": timestamp,
+            "timing": {"mode": "parallel", "wall_seconds": 60.0, "stages": {s: 10.0 for s in STAGES}},
+            "spans": [],
+            "results": results,
+        })
+
+
+class Server:
+    """The dashboard under uvicorn, with APP_HOME as its working directory."""
+
+    def __init__(self, app: str, env: Dict[str, str]):
+        self.app = app
+        self.env = env
+        self.port = free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self, timeout: float = 120) -> float:
+        started = time.perf_counter()
+        self.log = open(os.path.join(self.app, "server.log"), "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=self.app, env=self.env, stdout=self.log, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+        while time.perf_counter() - started < timeout:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with {self.process.returncode}, see {self.log.name}")
+            try:
+                get_json(f"{self.base}/api/health")
+                return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f"Server did not start within {timeout}s, see {self.log.name}")
+
+    def wait_trivy_server(self, timeout: float) -> Optional[float]:
+        started = time.perf_counter()
+        while time.perf_counter() - started < timeout:
+            status = get_json(f"{self.base}/api/health").get("trivy_server") or {}
+            if status.get("mode") == "off":
+                return None
+            if status.get("ready"):
+                return time.perf_counter() - started
+            time.sleep(0.2)
+        return None
+
+    def peak_rss_mb(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.process.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+        self.log.close()
+
+
+def get_json(url: str, timeout: float = 30):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def post_json(url: str, body: dict):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+# --- Scenarios -------------------------------------------------------------
+
+def load(base: str, paths: List[str], requests: int, concurrency: int) -> dict:
+    """GETs the paths round-robin from concurrency threads; latency per request, throughput overall."""
+
+    def fetch(i: int):
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base + paths[i % len(paths)], timeout=120) as response:
+                size = len(response.read())
+            return time.perf_counter() - started, size, None
+        except OSError as e:
+            return time.perf_counter() - started, 0, str(e)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        outcomes = list(pool.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - started
+    errors = [e for _, _, e in outcomes if e]
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "throughput_per_s": round(requests / elapsed, 1),
+        "response_mb": round(sum(size for _, size, _ in outcomes) / 1e6, 2),
+        "latency": percentiles([seconds for seconds, _, e in outcomes if not e]),
+        **({"first_error": errors[0]} if errors else {}),
+    }
+
+
+async def _viewer(url: str, opened: float, stats: dict, done: asyncio.Event):
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=30) as ws:
+            stats["connect"] = time.perf_counter() - opened
+            stats["connected"].set()
+            async for message in ws:
+                now = time.perf_counter()
+                stats.setdefault("first", now)
+                stats["bytes"] += len(message)
+                if "__EOF__" in message:
+                    stats["eof"] = now
+                    break
+    except Exception as e:
+        stats["error"] = str(e)
+        stats["connected"].set()
+    finally:
+        done.set()
+
+
+async def scan(server: Server, viewers: int, parameters: dict, timeout: float) -> dict:
+    """Starts an "all" scan with viewers attached and follows it to the end of its stream."""
+    scan_id = f"bench-{uuid.uuid4()}"
+    url = f"ws://127.0.0.1:{server.port}/api/scans/ws/{scan_id}"
+    stats = [{"bytes": 0, "connected": asyncio.Event()} for _ in range(viewers)]
+    finished = [asyncio.Event() for _ in range(viewers)]
+    opened = time.perf_counter()
+    tasks = [asyncio.ensure_future(_viewer(url, opened, s, d)) for s, d in zip(stats, finished)]
+    await asyncio.gather(*(s["connected"].wait() for s in stats))
+
+    loop = asyncio.get_event_loop()
+    started = time.perf_counter()
+    await loop.run_in_executor(None, post_json, f"{server.base}/api/scans/start",
+                               {"scan_type": "all", "scan_id": scan_id, "parameters": parameters})
+    try:
+        await asyncio.wait_for(asyncio.gather(*(d.wait() for d in finished)), timeout)
+    except asyncio.TimeoutError:
+        for task in tasks:
+            task.cancel()
+    job = await loop.run_in_executor(None, get_json, f"{server.base}/api/scans/{scan_id}")
+    while job.get("status") in ("pending", "running") and time.perf_counter() - started < timeout:
+        await asyncio.sleep(0.5)
+        job = await loop.run_in_executor(None, get_json, f"{server.base}/api/scans/{scan_id}")
+    ended = time.perf_counter()
+    report = await loop.run_in_executor(None, get_json, f"{server.base}/api/reports/{scan_id}")
+
+    timing = report.get("timing") or {}
+    eofs = [s["eof"] for s in stats if "eof" in s]
+    delivered = sum(s["bytes"] for s in stats)
+    return {
+        "status": job.get("status"),
+        "wall_seconds": round(ended - started, 2),
+        "report_wall_seconds": timing.get("wall_seconds"),
+        "stage_seconds": timing.get("stages"),
+        "inventory": timing.get("inventory"),
+        "per_image": timing.get("per_image"),
+        # Subprocess count, wall and CPU seconds, peak RSS per stage
+        "resources": {stage: {**r, "peak_rss_mb": round(r.pop("peak_rss_bytes", 0) / 2 ** 20, 1)}
+                      for stage, r in (timing.get("resources") or {}).items()},
+        "viewers": {
+            "count": viewers,
+            "completed": len(eofs),
+            "errors": sum(1 for s in stats if "error" in s),
+            "connect": percentiles([s["connect"] for s in stats if "connect" in s]),
+            "first_output": percentiles([s["first"] - started for s in stats if "first" in s], "s", 1),
+            # How far the slowest viewers trail the first one to see the end of the stream
+            "eof_spread": percentiles([t - min(eofs) for t in eofs]),
+            "log_mb_per_viewer": round(max((s["bytes"] for s in stats), default=0) / 1e6, 3),
+            "delivered_mb_per_s": round(delivered / 1e6 / max(ended - started, 1e-9), 3),
+        },
+    }
+
+
+def measure(command: List[str], stdout_path: Optional[str] = None, env: Optional[dict] = None,
+            cwd: Optional[str] = None) -> dict:
+    out = open(stdout_path, "wb") if stdout_path else open(os.devnull, "wb")
+    with out:
+        started = time.perf_counter()
+        proc = subprocess.Popen(command, stdout=out, stderr=subprocess.PIPE, env=env, cwd=cwd)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - started
+    result = {"wall_seconds": round(elapsed, 2), "peak_rss_mb": round(usage.ru_maxrss / 1024, 1)}
+    if status != 0:
+        result["error"] = proc.stderr.read().decode(errors="replace").strip()[-2000:]
+    proc.stderr.close()
+    return result
+
+
+def converters(root: str, scale: float) -> dict:
+    """The kyverno pipeline of kyverno_scan.sh step by step, plus the Excel and CSV exports."""
+    work = os.path.join(root, "converters")
+    os.makedirs(work)
+    # Answers at once: only the repo's scripts are timed
+    env = fake_env(scale, 0)
+    pods = os.path.join(work, "pods.json")
+    subprocess.run([os.path.join(FAKE_TOOLS, "kubectl"), "get", "pods", "-A", "-o", "json"],
+                   stdout=open(pods, "wb"), env=env, check=True)
+    policy_dir = os.path.join(SCRIPTS_DIR, "kyvernopolicy")
+    with open(pods) as f:
+        out = {"pods": len(json.load(f)["items"])}
+
+    out["collect_resources"] = measure(
+        [sys.executable, os.path.join(SCRIPTS_DIR, "kyverno_k8s_resources_to_yaml.py"), "--output-dir", work,
+         "--shards", "1", "--pods-file", pods, "--fingerprints", os.path.join(work, "fingerprints.json"),
+         "--policy-dir", policy_dir], env=env)
+    report = os.path.join(work, "policy-report-0.yaml")
+    # Like the real one, the fake kyverno exits 1 when the report holds failed results
+    proc = subprocess.run([os.path.join(FAKE_TOOLS, "kyverno"), "apply", policy_dir, "--resource",
+                           os.path.join(work, "resources-0.yaml"), "--policy-report"],
+                          stdout=open(report, "wb"), env=env)
+    if proc.returncode > 1:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    out["policy_report_mb"] = round(os.path.getsize(report) / 1e6, 1)
+
+    kyverno_json = os.path.join(work, "kyverno.json")
+    out["dedup"] = measure([sys.executable, os.path.join(SCRIPTS_DIR, "kyverno_yaml_to_json_dedup.py"), report],
+                           stdout_path=kyverno_json, env=env)
+    out["kyverno_json_mb"] = round(os.path.getsize(kyverno_json) / 1e6, 1)
+    for fmt in ("xlsx", "csv"):
+        output = os.path.join(work, f"export.{fmt}")
+        out[f"export_{fmt}"] = measure([sys.executable, os.path.join(SCRIPTS_DIR, "convert_json_to_excel.py"),
+                                        kyverno_json, "-o", output], env=env)
+        if os.path.exists(output):
+            out[f"export_{fmt}"]["output_mb"] = round(os.path.getsize(output) / 1e6, 1)
+    return out
+
+
+def run_scale(scale: float, args) -> dict:
+    root = tempfile.mkdtemp(prefix=f"bench-suite-{scale:g}-")
+    server = None
+    try:
+        app = make_app_home(root)
+        call_log = os.path.join(root, "calls.log")
+        env = fake_env(scale, args.time_scale, call_log)
+        env.update({
+            "APP_HOME": app,
+            "NEW_DIR": os.path.join(app, "new"),
+            "KUBE_BENCH_DIR": FAKE_TOOLS,
+            "TRIVY_SERVER_MODE": args.trivy_server,
+            "TRIVY_SERVER_LISTEN": f"127.0.0.1:{free_port()}",
+            "STATIC_DIR": os.path.join(root, "static"),
+            # Every scan lists the cluster itself, so discovery is part of its timing
+            "INVENTORY_MAX_AGE_SECONDS": "0",
+        })
+        out: Dict[str, dict] = {}
+        reports = int(args.reports_per_scale * scale)
+        started = time.perf_counter()
+        seed_reports(app, reports, datetime.now())
+        out["setup"] = {"seeded_reports": reports, "seed_seconds": round(time.perf_counter() - started, 2)}
+
+        server = Server(app, env)
+        # Includes indexing the seeded reports
+        out["setup"]["startup_seconds"] = round(server.start(), 2)
+        ready = server.wait_trivy_server(args.scan_timeout)
+        out["setup"]["trivy_server_ready_seconds"] = round(ready, 2) if ready is not None else None
+
+        if "scan" in args.scenarios:
+            out["scan"] = {}
+            for run in range(args.scan_runs):
+                name = "cold" if run == 0 else f"warm{run if args.scan_runs > 2 else ''}"
+                open(call_log, "w").close()
+                parameters = {"incremental": True} if args.incremental and run else {}
+                print(f"[scale {scale:g}] scan {name}...", file=sys.stderr)
+                result = asyncio.run(scan(server, args.viewers, parameters, args.scan_timeout))
+                result["tool_calls"] = tool_calls(call_log)
+                out["scan"][name] = result
+
+        if "reports" in args.scenarios:
+            print(f"[scale {scale:g}] reports...", file=sys.stderr)
+            ids = [f"seed-{i:06d}" for i in range(0, reports, max(1, reports // 50))] or ["missing"]
+            pages = [f"/api/reports/?limit=100&offset={offset}" for offset in range(0, max(reports, 1), 100)]
+            out["reports"] = {
+                "list": load(server.base, pages, args.requests, args.concurrency),
+                "get": load(server.base, [f"/api/reports/{i}" for i in ids], args.requests, args.concurrency),
+            }
+
+        if "files" in args.scenarios:
+            print(f"[scale {scale:g}] files...", file=sys.stderr)
+            total = len(get_json(f"{server.base}/api/files/list?subpath=trivy-reports"))
+            out["files"] = {
+                "trivy_reports": total,
+                "all": load(server.base, ["/api/files/list?subpath=trivy-reports"], args.requests, args.concurrency),
+                "paged": load(server.base, [f"/api/files/list?subpath=trivy-reports&limit=100&offset={o}&detail=true"
+                                            for o in range(0, max(total, 1), 100)][:10], args.requests, args.concurrency),
+                "namespace": load(server.base, [f"/api/files/list?subpath=trivy-reports&namespace=team-{n:04d}"
+                                                for n in range(5)], args.requests, args.concurrency),
+            }
+
+        health = get_json(f"{server.base}/api/health")
+        out["server"] = {"peak_rss_mb": server.peak_rss_mb(), "loop_lag": health.get("loop_lag")}
+        server.stop()
+        server = None
+
+        if "converters" in args.scenarios:
+            print(f"[scale {scale:g}] converters...", file=sys.stderr)
+            out["converters"] = converters(root, scale)
+        return out
+    finally:
+        if server is not None:
+            server.stop()
+        if args.keep:
+            print(f"Kept the scale {scale:g} sandbox in {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+# --- Baselines -------------------------------------------------------------
+
+def flatten(doc, prefix: str = "") -> Dict[str, float]:
+    values = {}
+    if isinstance(doc, dict):
+        for key, value in doc.items():
+            values.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(doc, (int, float)) and not isinstance(doc, bool):
+        values[prefix] = doc
+    return values
+
+
+def direction(key: str) -> int:
+    """1 when higher is better, -1 when lower is better, 0 for counts and sizes that only describe the run."""
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf.endswith("_per_s"):
+        return 1
+    if leaf.endswith(("_seconds", "_ms", "_s")) or leaf == "peak_rss_mb":
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold: float) -> List[str]:
+    """Prints the metrics that moved by more than threshold; returns the regressions."""
+    before, after = flatten(old.get("scales") or {}), flatten(new.get("scales") or {})
+    regressions = []
+    rows = []
+    for key in sorted(before.keys() & after.keys()):
+        sign = direction(key)
+        a, b = before[key], after[key]
+        if not sign or not a:
+            continue
+        change = (b - a) / abs(a)
+        if abs(change) < threshold:
+            continue
+        worse = change * sign < 0
+        if worse:
+            regressions.append(key)
+        rows.append(f"{'REGRESSION' if worse else 'improved':<10}  {key:<70} {a:>12g} -> {b:<12g} {change:+.1%}")
+    print(f"Compared with {old.get('meta', {}).get('git_commit') or 'the baseline'}: "
+          f"{len(rows)} metrics moved more than {threshold:.0%}, {len(regressions)} regressions")
+    for row in rows:
+        print(row)
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="10", help="Comma separated multiples of the scale 1 cluster, e.g. 10,100,1000")
+    parser.add_argument("--scenarios", default="scan,reports,files,converters")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Multiplies the fake tools' latencies")
+    parser.add_argument("--viewers", type=int, default=50, help="WebSocket viewers following each scan")
+    parser.add_argument("--scan-runs", type=int, default=2, help="The first is cold, later ones reuse caches")
+    parser.add_argument("--incremental", action="store_true", help="Warm scans run with parameters.incremental")
+    parser.add_argument("--scan-timeout", type=float, default=1800)
+    parser.add_argument("--trivy-server", choices=("managed", "off"), default="managed")
+    parser.add_argument("--reports-per-scale", type=float, default=5, help="Reports seeded per unit of scale")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per API load")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="Write the results as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline to diff the results against; exits 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change that counts")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch APP_HOME of each scale")
+    args = parser.parse_args()
+    args.scenarios = set(args.scenarios.split(","))
+
+    results = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "keep")},
+        },
+        "scales": {},
+    }
+    results["meta"]["settings"]["scenarios"] = sorted(args.scenarios)
+    for scale in (float(s) for s in args.scales.split(",")):
+        results["scales"][f"{scale:g}"] = run_scale(scale, args)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(json.load(f), results, args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""Synthetic cluster and scanner output shared by the fake tools in this directory.
+
+Everything is derived from the FAKE_* environment, so every tool of a run
+sees the same cluster and repeated runs produce the same reports.
+"""
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List
+
+# Multiplies every count below; FAKE_NAMESPACES etc. set one count outright
+SCALE = float(os.getenv("FAKE_SCALE", "1"))
+
+
+def _count(name: str, base: int) -> int:
+    return max(1, int(os.getenv(name) or round(base * SCALE)))
+
+
+NAMESPACES = _count("FAKE_NAMESPACES", 5)
+PODS = _count("FAKE_PODS", 40)
+SERVICES = _count("FAKE_SERVICES", 15)
+IMAGES = _count("FAKE_IMAGES", 12)
+VULNS_PER_IMAGE = int(os.getenv("FAKE_VULNS_PER_IMAGE", "40"))
+# Share of services that answer with TLS ciphers
+TLS_RATIO = float(os.getenv("FAKE_TLS_RATIO", "0.6"))
+# Share of kyverno results that fail
+FAIL_RATIO = float(os.getenv("FAKE_FAIL_RATIO", "0.3"))
+# Multiplies every latency; 0 answers at once
+TIME_SCALE = float(os.getenv("FAKE_TIME_SCALE", "1"))
+# One line per tool invocation, for counting calls
+CALL_LOG = os.getenv("FAKE_CALL_LOG")
+
+# Seconds at FAKE_TIME_SCALE=1, roughly what the real tools take against a small cluster
+LATENCY = {
+    "kubectl_request": 0.08,
+    "kubectl_item": 0.00005,
+    # DB download, by `trivy server` at start and by --download-db-only
+    "trivy_db": 8.0,
+    "trivy_image": 3.0,
+    "trivy_image_client": 0.6,
+    "trivy_k8s": 2.0,
+    "trivy_k8s_resource": 0.02,
+    "trivy_sbom": 1.5,
+    "kyverno": 1.5,
+    "kyverno_resource": 0.01,
+    "nmap": 2.5,
+    "kube_bench": 4.0,
+}
+
+
+def _parse_latency(value: str) -> Dict[str, float]:
+    # Format: "trivy_image=5,nmap=1"
+    latency = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        key, seconds = item.split("=", 1)
+        try:
+            latency[key.strip()] = float(seconds)
+        except ValueError:
+            print(f"Ignoring invalid FAKE_LATENCY entry: {item}", file=sys.stderr)
+    return latency
+
+
+LATENCY.update(_parse_latency(os.getenv("FAKE_LATENCY", "")))
+
+CREATED = "2024-01-15T08:00:00Z"
+
+
+def latency(key: str, n: float = 1) -> float:
+    return LATENCY[key] * n * TIME_SCALE
+
+
+def log_call(tool: str, argv: List[str]):
+    if CALL_LOG:
+        # A single short append, so concurrent tools do not interleave
+        with open(CALL_LOG, "a") as f:
+            f.write(f"{time.time():.3f} {tool} {' '.join(argv)}\n")
+
+
+def pace(lines: Iterable[str], seconds: float, stream=None):
+    """Writes the lines spread evenly over seconds, the way a tool reports progress."""
+    stream = stream or sys.stdout
+    lines = list(lines)
+    if not lines:
+        time.sleep(seconds)
+        return
+    interval = seconds / len(lines)
+    for line in lines:
+        stream.write(line)
+        stream.flush()
+        if interval > 0:
+            time.sleep(interval)
+
+
+def option(args: List[str], *names: str, default=None):
+    """Value of the first of names in args, as "--name value" or "--name=value"."""
+    for i, arg in enumerate(args):
+        for name in names:
+            if arg == name and i + 1 < len(args):
+                return args[i + 1]
+            if arg.startswith(f"{name}="):
+                return arg[len(name) + 1:]
+    return default
+
+
+def _rng(*key) -> random.Random:
+    return random.Random(":".join(str(k) for k in key))
+
+
+def _uid(*key) -> str:
+    return str(uuid.UUID(bytes=hashlib.blake2b(":".join(str(k) for k in key).encode(), digest_size=16).digest()))
+
+
+# --- Cluster ---------------------------------------------------------------
+
+def namespace_name(n: int) -> str:
+    return f"team-{n:04d}"
+
+
+def image_ref(j: int) -> str:
+    return f"registry.example.com/team-{j % 50:02d}/app-{j:05d}:1.{j % 7}.{j % 3}"
+
+
+def image_digest(j: int) -> str:
+    return "sha256:" + hashlib.blake2b(image_ref(j).encode(), digest_size=32).hexdigest()
+
+
+def _namespace(n: int) -> dict:
+    name = namespace_name(n)
+    return {
+        "metadata": {"name": name, "uid": _uid("ns", n), "resourceVersion": str(1000 + n),
+                     "creationTimestamp": CREATED, "labels": {"kubernetes.io/metadata.name": name}},
+        "spec": {"finalizers": ["kubernetes"]},
+        "status": {"phase": "Active"},
+    }
+
+
+def _owner(i: int) -> str:
+    return f"app-{i // 3:05d}"
+
+
+def _pod(i: int) -> dict:
+    # The API lists pods ordered by namespace, the kyverno shard writer relies on it
+    ns = namespace_name(i * NAMESPACES // PODS)
+    rng = _rng("pod", i)
+    images = [i * 7 % IMAGES] + ([(i * 7 + 1) % IMAGES] if i % 4 == 0 else [])
+    containers = []
+    for c, j in enumerate(images):
+        container = {
+            "name": f"c{c}",
+            "image": image_ref(j),
+            "imagePullPolicy": "IfNotPresent",
+            "ports": [{"containerPort": 8080 + c, "protocol": "TCP"}],
+            "env": [{"name": f"SETTING_{k}", "value": f"value-{rng.randrange(1000)}"} for k in range(4)],
+        }
+        if rng.random() < 0.6:
+            container["resources"] = {"requests": {"cpu": "100m", "memory": "128Mi"},
+                                      "limits": {"memory": "256Mi"}}
+        if rng.random() < 0.4:
+            container["securityContext"] = {"readOnlyRootFilesystem": True, "runAsNonRoot": True,
+                                            "capabilities": {"drop": ["ALL"]}}
+        containers.append(container)
+    running = i % 17 != 16
+    labels = {"app": _owner(i), "tier": ("web", "api", "worker")[i % 3]}
+    spec = {"nodeName": f"node-{i % 20:02d}", "serviceAccountName": "default", "containers": containers}
+    return {
+        "metadata": {
+            "name": f"{_owner(i)}-{i:06d}", "namespace": ns, "uid": _uid("pod", i),
+            "resourceVersion": str(50000 + i), "creationTimestamp": CREATED, "labels": labels,
+            # The bulk real pod objects carry and the inventory strips
+            "annotations": {"kubectl.kubernetes.io/last-applied-configuration": json.dumps(
+                {"apiVersion": "v1", "kind": "Pod", "metadata": {"labels": labels}, "spec": spec})},
+            "managedFields": [{"manager": "kube-controller-manager", "operation": "Update",
+                               "apiVersion": "v1", "time": CREATED, "fieldsType": "FieldsV1",
+                               "fieldsV1": {"f:metadata": {"f:labels": {f"f:{k}": {} for k in labels}}}}],
+            "ownerReferences": [{"apiVersion": "apps/v1", "kind": "ReplicaSet", "name": _owner(i),
+                                 "uid": _uid("rs", i // 3), "controller": True}],
+        },
+        "spec": spec,
+        "status": {
+            "phase": "Running" if running else "Pending",
+            "podIP": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            "containerStatuses": [
+                {"name": c["name"], "image": c["image"], "ready": running, "restartCount": 0,
+                 "imageID": f"{c['image'].rsplit(':', 1)[0]}@{image_digest(j)}" if running else ""}
+                for c, j in zip(containers, images)
+            ],
+        },
+    }
+
+
+def _service(s: int) -> dict:
+    ns = namespace_name(s * NAMESPACES // SERVICES)
+    ports = [{"name": "https", "port": 443, "targetPort": 8443}] if s % 3 == 0 else []
+    ports.append({"name": "http", "port": 80 + s % 2 * 8000, "targetPort": 8080})
+    return {
+        "metadata": {"name": f"svc-{s:05d}", "namespace": ns, "uid": _uid("svc", s),
+                     "resourceVersion": str(90000 + s), "creationTimestamp": CREATED},
+        "spec": {"type": "ClusterIP", "clusterIP": f"172.20.{s // 256 % 256}.{s % 256}",
+                 "ports": ports, "selector": {"app": f"app-{s:05d}"}},
+        "status": {"loadBalancer": {}},
+    }
+
+
+KINDS = {
+    "namespaces": (NAMESPACES, _namespace),
+    "pods": (PODS, _pod),
+    "services": (SERVICES, _service),
+}
+
+
+def objects(kind: str, start: int = 0, limit: int = 0) -> Iterator[dict]:
+    count, make = KINDS[kind]
+    end = min(count, start + limit) if limit else count
+    return (make(i) for i in range(start, end))
+
+
+def count(kind: str) -> int:
+    return KINDS[kind][0]
+
+
+# --- Trivy -----------------------------------------------------------------
+
+SEVERITIES = ["LOW"] * 4 + ["MEDIUM"] * 3 + ["HIGH"] * 2 + ["CRITICAL"]
+PACKAGES = ["openssl", "libc6", "zlib1g", "curl", "libxml2", "busybox", "openssh-client", "python3.11",
+            "libssl3", "tar", "gzip", "perl-base", "libsqlite3-0", "ncurses-base", "libexpat1", "bash"]
+# Images share vulnerabilities, as base images make them in a real cluster
+CVE_POOL = 2000
+
+
+def _vulnerability(k: int) -> dict:
+    rng = _rng("cve", k)
+    pkg = PACKAGES[k % len(PACKAGES)]
+    cve = f"CVE-{2019 + k % 6}-{10000 + k}"
+    fixed = rng.random() < 0.7
+    return {
+        "VulnerabilityID": cve,
+        "PkgID": f"{pkg}@{k % 9}.{k % 5}.{k % 11}",
+        "PkgName": pkg,
+        "InstalledVersion": f"{k % 9}.{k % 5}.{k % 11}",
+        "FixedVersion": f"{k % 9}.{k % 5}.{k % 11 + 1}" if fixed else "",
+        "Status": "fixed" if fixed else "affected",
+        "Severity": rng.choice(SEVERITIES),
+        "PrimaryURL": f"https://avd.aquasec.com/nvd/{cve.lower()}",
+        "Title": f"{pkg}: {rng.choice(['buffer overflow', 'use after free', 'denial of service', 'out-of-bounds read', 'integer overflow'])} in {rng.choice(['parser', 'decoder', 'handshake', 'archive handling'])}",
+        "Description": f"A flaw was found in {pkg}. " + "An attacker could exploit this to cause harm. " * 3,
+        "References": [f"https://nvd.nist.gov/vuln/detail/{cve}", f"https://security-tracker.debian.org/tracker/{cve}"],
+    }
+
+
+def image_report(ref: str) -> dict:
+    rng = _rng("image", ref)
+    picks = sorted(rng.sample(range(CVE_POOL), min(VULNS_PER_IMAGE, CVE_POOL)))
+    return {
+        "SchemaVersion": 2,
+        "CreatedAt": CREATED,
+        "ArtifactName": ref,
+        "ArtifactType": "container_image",
+        "Metadata": {"OS": {"Family": "debian", "Name": "12.5"}, "ImageID": "sha256:" + "0" * 64,
+                     "RepoTags": [] if "@" in ref else [ref], "RepoDigests": [ref] if "@" in ref else []},
+        "Results": [{"Target": f"{ref} (debian 12.5)", "Class": "os-pkgs", "Type": "debian",
+                     "Vulnerabilities": [_vulnerability(k) for k in picks]}],
+    }
+
+
+MISCONFIGS = [
+    ("KSV001", "Process can elevate its own privileges", "MEDIUM"),
+    ("KSV003", "Default capabilities not dropped", "LOW"),
+    ("KSV011", "CPU not limited", "LOW"),
+    ("KSV012", "Runs as root user", "MEDIUM"),
+    ("KSV014", "Root file system is not read-only", "HIGH"),
+    ("KSV020", "Runs with UID <= 10000", "LOW"),
+    ("KSV104", "Seccomp policies disabled", "MEDIUM"),
+]
+
+
+def cluster_report(pods: List[dict]) -> dict:
+    resources = []
+    for pod in pods:
+        meta = pod["metadata"]
+        rng = _rng("misconfig", meta["name"])
+        found = [m for m in MISCONFIGS if rng.random() < 0.5]
+        resources.append({
+            "Namespace": meta["namespace"], "Kind": "Pod", "Name": meta["name"],
+            "Results": [{"Target": f"Pod/{meta['name']}", "Class": "config", "Type": "kubernetes",
+                         "Misconfigurations": [
+                             {"ID": ident, "Title": title, "Severity": severity, "Status": "FAIL",
+                              "Message": f"Container 'c0' of Pod '{meta['name']}' should set the matching securityContext field",
+                              "PrimaryURL": f"https://avd.aquasec.com/misconfig/{ident.lower()}",
+                              "References": [f"https://avd.aquasec.com/misconfig/{ident.lower()}"]}
+                             for ident, title, severity in found]}],
+        })
+    return {"ClusterName": "bench", "Resources": resources}
+
+
+def kbom(images: List[str]) -> dict:
+    return {
+        "bomFormat": "CycloneDX", "specVersion": "1.5", "version": 1,
+        "metadata": {"timestamp": CREATED, "component": {"type": "platform", "name": "bench", "bom-ref": "cluster"}},
+        "components": [{"type": "container", "name": ref, "bom-ref": f"image-{n}", "version": ref.rsplit(":", 1)[-1]}
+                       for n, ref in enumerate(images)],
+    }
+
+
+def sbom_report(components: int) -> dict:
+    # Kubernetes components of the KBOM and their vulnerabilities
+    packages = [{"ID": f"k8s.io/component-{k}@v1.29.{k % 5}", "Name": f"k8s.io/component-{k}",
+                 "Version": f"v1.29.{k % 5}", "Identifier": {"PURL": f"pkg:k8s/component-{k}@v1.29.{k % 5}"}}
+                for k in range(max(10, components // 20))]
+    vulnerabilities = []
+    for n, pkg in enumerate(packages):
+        for k in range(n % 3):
+            vuln = _vulnerability(n * 3 + k)
+            vulnerabilities.append({**vuln, "PkgID": pkg["ID"], "PkgName": pkg["Name"],
+                                    "InstalledVersion": pkg["Version"]})
+    return {"SchemaVersion": 2, "ArtifactName": "kbom.json", "ArtifactType": "cyclonedx",
+            "Results": [{"Target": "kbom.json", "Class": "lang-pkgs", "Type": "k8s",
+                         "Packages": packages, "Vulnerabilities": vulnerabilities}]}
+
+
+# --- nmap ------------------------------------------------------------------
+
+CIPHERS = [
+    ("TLS_AKE_WITH_AES_128_GCM_SHA256", "ecdh_x25519", "A"),
+    ("TLS_AKE_WITH_AES_256_GCM_SHA384", "ecdh_x25519", "A"),
+    ("TLS_AKE_WITH_CHACHA20_POLY1305_SHA256", "ecdh_x25519", "A"),
+    ("TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256", "secp256r1", "A"),
+    ("TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384", "secp256r1", "A"),
+    ("TLS_ECDHE_RSA_WITH_AES_128_CBC_SHA", "secp256r1", "A"),
+    ("TLS_RSA_WITH_AES_128_CBC_SHA", "rsa 2048", "A"),
+    ("TLS_RSA_WITH_3DES_EDE_CBC_SHA", "rsa 2048", "C"),
+]
+
+
+def ciphers(fqdn: str) -> List[tuple]:
+    rng = _rng("tls", fqdn)
+    if rng.random() >= TLS_RATIO:
+        return []
+    return CIPHERS[:3 + rng.randrange(len(CIPHERS) - 2)]
+
+
+# --- kube-bench ------------------------------------------------------------
+
+BENCH_CONTROLS = [
+    ("1", "master", "Control Plane Security Configuration", [("1.1", "Control Plane Node Configuration Files", 21),
+                                                             ("1.2", "API Server", 30), ("1.3", "Controller Manager", 7),
+                                                             ("1.4", "Scheduler", 2)]),
+    ("2", "etcd", "Etcd Node Configuration", [("2", "Etcd Node Configuration", 7)]),
+    ("3", "controlplane", "Control Plane Configuration", [("3.1", "Authentication and Authorization", 3),
+                                                          ("3.2", "Logging", 2)]),
+    ("4", "node", "Worker Node Security Configuration", [("4.1", "Worker Node Configuration Files", 10),
+                                                         ("4.2", "Kubelet", 13)]),
+    ("5", "policies", "Kubernetes Policies", [("5.1", "RBAC and Service Accounts", 13),
+                                              ("5.2", "Pod Security Standards", 13),
+                                              ("5.7", "General Policies", 4)]),
+]
+
+
+def bench_controls() -> dict:
+    controls = []
+    totals = dict.fromkeys(("total_pass", "total_fail", "total_warn", "total_info"), 0)
+    for ident, node_type, text, sections in BENCH_CONTROLS:
+        tests = []
+        for section, desc, checks in sections:
+            results = []
+            for n in range(1, checks + 1):
+                number = f"{section}.{n}"
+                rng = _rng("cis", number)
+                status = rng.choice(["PASS", "PASS", "PASS", "FAIL", "WARN"])
+                totals[f"total_{status.lower()}"] += 1
+                results.append({
+                    "test_number": number,
+                    "test_desc": f"Ensure that the {desc.lower()} setting {n} is configured ({rng.choice(['Automated', 'Manual'])})",
+                    "audit": f"/bin/ps -ef | grep kube | grep -v grep # {number}",
+                    "remediation": f"Edit the configuration file on the {node_type} node and set the parameter for check {number}.",
+                    "status": status, "scored": status != "WARN", "actual_value": "", "expected_result": "",
+                })
+            tests.append({"section": section, "desc": desc, "results": results,
+                          "pass": sum(r["status"] == "PASS" for r in results),
+                          "fail": sum(r["status"] == "FAIL" for r in results),
+                          "warn": sum(r["status"] == "WARN" for r in results), "info": 0})
+        controls.append({"id": ident, "version": "cis-1.8", "detected_version": "1.29", "text": text,
+                         "node_type": node_type, "tests": tests})
+    return {"Controls": controls, "Totals": totals}
+
+
+# --- Kyverno ---------------------------------------------------------------
+
+def policy_result(policy: str, rule: str, pod_name: str) -> tuple:
+    failed = _rng("kyverno", policy, rule, pod_name).random() < FAIL_RATIO
+    if failed:
+        return "fail", f"validation error: {policy} requires the pod to satisfy rule {rule}. rule {rule} failed at path /spec/containers/0/"
+    return "pass", f"validation rule '{rule}' passed."
@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import scans, reports, files
-from services import terminal
+from routers import scans, reports, files, findings, trends, inventory, metrics
+from services import terminal, report_index, ingest, executors, jobs, trivy_server
 
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
@@ -9,6 +9,25 @@ import os
 
 app = FastAPI(title="Security Scanning Dashboard")
 
+@app.on_event("startup")
+async def startup():
+    executors.loop_lag.start()
+    # First start indexes the reports already on disk
+    await executors.run_io(report_index.init)
+    # Keeps the findings store in step with NEW_DIR, including files written by the shell scripts
+    ingest.start_watcher()
+    # Warm vulnerability DB and cache for the trivy stages; scans run standalone until it is up
+    trivy_server.server.start()
+    # Picks up scans that were queued or running when the previous process stopped
+    await jobs.manager.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    ingest.stop_watcher()
+    await jobs.manager.stop()
+    await trivy_server.server.stop()
+    executors.shutdown()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allow all for development
@@ -20,8 +39,17 @@ app.add_middleware(
 app.include_router(scans.router, prefix="/api/scans", tags=["scans"])
 app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
 app.include_router(files.router, prefix="/api/files", tags=["files"])
+app.include_router(findings.router, prefix="/api/findings", tags=["findings"])
+app.include_router(trends.router, prefix="/api/trends", tags=["trends"])
+app.include_router(inventory.router, prefix="/api/inventory", tags=["inventory"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 app.include_router(terminal.router, prefix="/api/terminal", tags=["terminal"])
 
+@app.get("/api/health")
+async def health():
+    # Event loop lag: how long a ready task waited because something blocked the loop
+    return {"status": "ok", "loop_lag": executors.loop_lag.snapshot(), "trivy_server": trivy_server.server.status()}
+
 # Mount static files (React build)
 # Check if static directory exists (it will in Docker, might not locally)
 STATIC_DIR = os.getenv("STATIC_DIR", "/app/static")
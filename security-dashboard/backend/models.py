@@ -17,6 +17,7 @@ class ScanStatus(str, Enum):
     RUNNING = "running"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 class ScanRequest(BaseModel):
     scan_type: ScanType
@@ -1,32 +1,37 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List
-import os
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Optional
+from dataclasses import asdict
+from services.dir_index import index
 
 router = APIRouter()
 
-# Base directory for new reports, matching main.py logic
-NEW_DIR = os.getenv("NEW_DIR", "/app/new")
-
 @router.get("/list")
-async def list_files(subpath: str = Query(..., description="Subdirectory to list, e.g. 'trivy-reports'")):
-    target_dir = os.path.join(NEW_DIR, subpath)
-    
+async def list_files(
+    response: Response,
+    subpath: str = Query(..., description="Subdirectory to list, e.g. 'trivy-reports'"),
+    prefix: Optional[str] = Query(None, description="Only paths starting with this, e.g. 'default/nginx'"),
+    namespace: Optional[str] = Query(None, description="Only files under this namespace directory"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="Page size; all files when omitted"),
+    detail: bool = Query(False, description="Return path, namespace, size and mtime instead of bare paths"),
+):
     # Security check: Ensure we don't traverse out of NEW_DIR
-    if not os.path.abspath(target_dir).startswith(os.path.abspath(NEW_DIR)):
+    key = index.normalize(subpath)
+    if key is None:
          raise HTTPException(status_code=403, detail="Access denied")
 
-    if not os.path.exists(target_dir):
-        return []
-        
-    try:
-        files = []
-        for root, _, filenames in os.walk(target_dir):
-            for f in filenames:
-                if f.endswith(".json"):
-                    # Create relative path from target_dir
-                    full_path = os.path.join(root, f)
-                    rel_path = os.path.relpath(full_path, target_dir)
-                    files.append(rel_path)
-        return sorted(files)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Served from the in-memory index; the directory is only walked when the index is rebuilt
+    files = await index.list(key)
+    if namespace:
+        files = [f for f in files if f.namespace == namespace]
+    if prefix:
+        files = [f for f in files if f.path.startswith(prefix)]
+
+    response.headers["X-Total-Count"] = str(len(files))
+    if limit is not None:
+        if offset + limit < len(files):
+            response.headers["X-Next-Offset"] = str(offset + limit)
+        files = files[offset:offset + limit]
+    elif offset:
+        files = files[offset:]
+    return [asdict(f) for f in files] if detail else [f.path for f in files]
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import FileResponse
+from typing import List, Optional
+from services import executors, exports, findings
+
+router = APIRouter()
+
+def _split(value: Optional[str]) -> Optional[List[str]]:
+    return [v.strip().upper() for v in value.split(",") if v.strip()] if value else None
+
+@router.get("/{source}")
+async def list_findings(
+    source: str,
+    response: Response,
+    namespace: Optional[str] = None,
+    section: Optional[str] = Query(None, description="CIS section, e.g. Control Plane Node Configuration Files; same as namespace"),
+    file: Optional[str] = Query(None, description="Image report path under trivy-reports, e.g. default/nginx_1.25.json"),
+    status: Optional[str] = Query(None, description="Comma separated, e.g. FAIL,WARN"),
+    severity: Optional[str] = Query(None, description="Comma separated, e.g. CRITICAL,HIGH"),
+    sort: str = Query("seq", description=f"One of {', '.join(sorted(findings.SORT_COLUMNS))}"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(100, ge=0, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    if source not in findings.SOURCES:
+        raise HTTPException(status_code=404, detail=f"Unknown findings source: {source}")
+    if sort not in findings.SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort}")
+    # Reads only the store kept current by services.ingest
+    page = await executors.run_io(
+        findings.query, source,
+        # CIS checks are scoped by section the way other findings are scoped by namespace
+        namespace=namespace or section, file=file, statuses=_split(status), severities=_split(severity),
+        sort=sort, descending=order == "desc", limit=limit, offset=offset,
+    )
+    if page["next_offset"] is not None:
+        response.headers["X-Next-Offset"] = str(page["next_offset"])
+    return page
+
+@router.get("/kyverno/export")
+async def export_kyverno(format: str = Query("xlsx", description=f"One of {', '.join(exports.EXPORT_FORMATS)}")):
+    if format not in exports.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format: {format}")
+    if not exports.available(format):
+        raise HTTPException(status_code=501, detail=f"{format} export needs the pyarrow package")
+    try:
+        path = await exports.kyverno_export(format)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No kyverno report to export yet")
+    except exports.ExportError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return FileResponse(path, media_type=exports.EXPORT_FORMATS[format], filename=f"kyverno_report.{format}")
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Optional
+from services import inventory
+
+router = APIRouter()
+
+VIEWS = ("namespaces", "pods", "images", "services")
+
+async def _snapshot(refresh: bool) -> inventory.Snapshot:
+    try:
+        return await inventory.cluster.get(0 if refresh else inventory.INVENTORY_MAX_AGE_SECONDS)
+    except inventory.InventoryError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/")
+async def get_inventory(refresh: bool = Query(False, description="List the cluster again even if the snapshot is fresh")):
+    # Counts and age of the snapshot the scans share
+    return (await _snapshot(refresh)).summary()
+
+@router.get("/{view}")
+async def get_inventory_view(
+    view: str,
+    response: Response,
+    namespace: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+    refresh: bool = False,
+):
+    if view not in VIEWS:
+        raise HTTPException(status_code=404, detail=f"Unknown inventory view: {view}")
+    snapshot = await _snapshot(refresh)
+    if view == "namespaces":
+        entries = [ns for ns in snapshot.namespaces() if namespace is None or ns["name"] == namespace]
+    else:
+        entries = getattr(snapshot, view)(namespace)
+    if len(entries) > offset + limit:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    response.headers["X-Total-Count"] = str(len(entries))
+    response.headers["X-Inventory-Taken-At"] = str(snapshot.taken_at)
+    return entries[offset:offset + limit]
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from services import executors, metrics, scanner
+
+router = APIRouter()
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics():
+    # Gauges of other services are read at scrape time
+    lag = executors.loop_lag.snapshot()
+    for stat in ("p50", "p99", "max"):
+        metrics.loop_lag.set(lag[f"{stat}_ms"] / 1000, stat=stat)
+    metrics.websocket_queue.set(scanner.manager.queue_depth())
+    metrics.websocket_subscribers.set(sum(len(s) for s in scanner.manager.active_connections.values()))
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0, le=300),
+    mode: str = Query("sample", description="sample: stacks of every thread in collapsed form; cprofile: the event loop"),
+    interval_ms: float = Query(10, ge=1, le=1000, description="Sampling interval of mode=sample"),
+):
+    # Off unless METRICS_PROFILING=1; it slows the backend down while it runs
+    if not metrics.METRICS_PROFILING:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (METRICS_PROFILING=1 enables it)")
+    if mode not in ("sample", "cprofile"):
+        raise HTTPException(status_code=400, detail=f"Unknown profile mode: {mode}")
+    try:
+        if mode == "cprofile":
+            return await metrics.profile_loop(seconds)
+        return await executors.run_io(metrics.sample_stacks, seconds, interval_ms / 1000)
+    except metrics.ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already being taken")
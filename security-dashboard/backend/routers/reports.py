@@ -1,43 +1,111 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Optional
 import os
-import json
-from models import ScanResult
+import tempfile
+from models import ScanResult, ScanStatus, ScanType
+from services import aggregates, executors, report_index, report_store
 
 router = APIRouter()
 REPORTS_DIR = "security-dashboard/backend/reports"
 
 @router.get("/")
-async def list_reports():
-    if not os.path.exists(REPORTS_DIR):
-        return []
-    
-    reports = []
-    files = sorted(os.listdir(REPORTS_DIR), reverse=True)
-    for filename in files:
-        if filename.endswith(".json"):
-            try:
-                with open(os.path.join(REPORTS_DIR, filename), "r") as f:
-                    data = json.load(f)
-                    # Return summary info
-                    reports.append({
-                        "id": data.get("id"),
-                        "timestamp": data.get("timestamp"),
-                        "scan_type": data.get("request", {}).get("scan_type"),
-                        "status": "completed" # derived
-                    })
-            except Exception:
-                continue
+async def list_reports(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    scan_type: Optional[ScanType] = None,
+    status: Optional[ScanStatus] = None,
+    since: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    until: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+):
+    # Served from the SQLite index maintained by run_scan_task, newest first
+    reports = await executors.run_io(
+        report_index.list_reports,
+        limit=limit + 1,
+        offset=offset,
+        scan_type=scan_type.value if scan_type else None,
+        status=status.value if status else None,
+        since=since,
+        until=until,
+    )
+    if len(reports) > limit:
+        reports = reports[:limit]
+        response.headers["X-Next-Offset"] = str(offset + limit)
     return reports
 
-@router.get("/{report_id}")
-async def get_report(report_id: str):
-    filepath = os.path.join(REPORTS_DIR, f"{report_id}.json")
-    if not os.path.exists(filepath):
+def _report_path(report_id: str) -> str:
+    if os.path.basename(report_id) != report_id:
+        raise HTTPException(status_code=400, detail="Invalid report id")
+    # Compact .rpt reports and the older plain .json ones
+    filepath = report_store.find(REPORTS_DIR, report_id)
+    if filepath is None:
         raise HTTPException(status_code=404, detail="Report not found")
-    
+    return filepath
+
+@router.get("/{report_id}")
+async def get_report(report_id: str, fields: Optional[str] = Query(None, description="Comma separated dotted paths, e.g. id,results.status")):
+    filepath = _report_path(report_id)
+    if not fields and filepath.endswith(report_store.JSON_EXT):
+        # Send the stored bytes as they are; no parse or re-serialization
+        return FileResponse(filepath, media_type="application/json")
+
     try:
-        with open(filepath, "r") as f:
-            return json.load(f)
+        if not fields:
+            # Compact reports are streamed section by section, never decoded into a dict
+            chunks = await executors.run_io(report_store.iter_json, filepath)
+            return StreamingResponse(executors.iterate_io(chunks), media_type="application/json")
+        paths = [[p for p in field.strip().split(".") if p] for field in fields.split(",")]
+        _, logs = report_store.sections_for(paths)
+        if not logs:
+            body = await executors.run_io(report_store.load_fields, filepath, paths)
+            return Response(content=body, media_type="application/json")
+        # With stage logs the projection can be as large as the report, so the worker writes it
+        # to a file that is streamed from, instead of passing it back through the pool
+        size = await executors.run_io(report_store.decoded_size, filepath)
+        fd, tmp_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            await executors.run_cpu(report_store.load_fields, filepath, paths, tmp_path, size_hint=size)
+        except Exception:
+            os.remove(tmp_path)
+            raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return FileResponse(tmp_path, media_type="application/json", background=BackgroundTask(os.remove, tmp_path))
+
+@router.get("/{report_id}/output", response_class=PlainTextResponse)
+async def get_report_output(
+    report_id: str,
+    stage: Optional[str] = Query(None, description="Scan type of the result; defaults to the first one"),
+    offset: int = Query(0, ge=0, description="Byte offset into the UTF-8 output"),
+    limit: int = Query(65536, ge=1, le=4 * 1024 * 1024, description="Bytes per page; pages end on whole characters"),
+):
+    filepath = _report_path(report_id)
+    try:
+        # Compact reports decompress only the log frames of this page; old JSON ones are parsed once and cached
+        page = await executors.run_io(report_store.load_output, filepath, stage, offset, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if page is None:
+        raise HTTPException(status_code=404, detail="Stage not found in report")
+    headers = {"X-Total-Length": str(page.total)}
+    if page.end < page.total:
+        headers["X-Next-Offset"] = str(page.end)
+    return PlainTextResponse(page.data, headers=headers)
+
+@router.get("/{report_id}/diff/{other_id}")
+async def diff_reports(
+    report_id: str,
+    other_id: str,
+    items: bool = Query(False, description="Also list the findings added, removed and changed"),
+    source: Optional[str] = Query(None, description="Limit the diff to one findings source"),
+    limit: int = Query(100, ge=0, le=10000, description="Findings listed per kind when items is set"),
+):
+    # Answered from the aggregates stored with each report; the reports themselves are not read
+    result = await executors.run_io(aggregates.diff, report_id, other_id, items=items, source=source, limit=limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return result
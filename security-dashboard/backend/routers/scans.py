@@ -1,17 +1,55 @@
-from fastapi import APIRouter, WebSocket, BackgroundTasks
+from fastapi import APIRouter, WebSocket, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
 from models import ScanRequest, ScanType
-from services import scanner
+from services import jobs, scanner
 import uuid
 
 router = APIRouter()
 
 @router.post("/start")
-async def start_scan(request: ScanRequest, background_tasks: BackgroundTasks):
+async def start_scan(request: ScanRequest):
     scan_id = request.scan_id or str(uuid.uuid4())
-    # In a real app, you'd save initial state to DB here
-    background_tasks.add_task(scanner.run_scan_task, scan_id, request)
-    return {"scan_id": scan_id, "status": "initiated"}
+    if await jobs.manager.get(scan_id) is not None:
+        raise HTTPException(status_code=409, detail="A scan with this id already exists")
+    # Queued on the job manager; an identical scan already in flight is joined instead
+    job = await jobs.manager.submit(scan_id, request)
+    return {
+        "scan_id": scan_id,
+        "status": "initiated",
+        "job_status": job["status"],
+        "coalesced_into": job["coalesced_into"],
+        "queue_position": job.get("queue_position"),
+    }
+
+@router.get("/{scan_id}")
+async def get_scan(scan_id: str):
+    job = await jobs.manager.get(scan_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return job
+
+@router.delete("/{scan_id}")
+async def cancel_scan(scan_id: str):
+    # Stops a queued scan, or kills the process tree of a running one
+    job = await jobs.manager.cancel(scan_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return job
+
+@router.get("/{scan_id}/log", response_class=PlainTextResponse)
+async def get_scan_log(scan_id: str, response: Response, offset: int = Query(0, ge=0),
+                       limit: int = Query(1024 * 1024, ge=1, le=16 * 1024 * 1024)):
+    # Offsets are byte positions in the scan's live stream, the same ones the WebSocket resumes from
+    buf = scanner.logs.get(scanner.resolve(scan_id))
+    if buf is None:
+        raise HTTPException(status_code=404, detail="No live log for this scan")
+    end = min(offset + limit, buf.end)
+    text = "".join([chunk async for chunk in buf.iter_range(offset, end)])
+    response.headers["X-Next-Offset"] = str(max(end, offset))
+    response.headers["X-Log-Complete"] = str(buf.closed and end >= buf.end).lower()
+    return text
 
 @router.websocket("/ws/{scan_id}")
-async def websocket_endpoint(websocket: WebSocket, scan_id: str):
-    await scanner.handle_websocket(websocket, scan_id)
+async def websocket_endpoint(websocket: WebSocket, scan_id: str, offset: int = 0):
+    # offset: replay the stream from this byte position before going live
+    await scanner.handle_websocket(websocket, scan_id, offset=offset)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from services import aggregates, executors, findings
+
+router = APIRouter()
+
+@router.get("/")
+async def get_trends(
+    source: Optional[str] = Query(None, description=f"One of {', '.join(findings.SOURCES)}; all when omitted"),
+    dimension: str = Query("total", description=f"One of {', '.join(aggregates.DIMENSIONS)}"),
+    keys: Optional[str] = Query(None, description="Comma separated, e.g. CRITICAL,HIGH"),
+    top: int = Query(10, ge=1, le=1000, description="Keys kept for namespace, policy and cve when keys is not set"),
+    since: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    until: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    limit: int = Query(100, ge=1, le=1000, description="Latest reports to include"),
+):
+    if source is not None and source not in findings.SOURCES:
+        raise HTTPException(status_code=404, detail=f"Unknown findings source: {source}")
+    if dimension not in aggregates.DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown dimension: {dimension}")
+    # Counts per report come from the aggregates stored at save time, oldest report first
+    return await executors.run_io(
+        aggregates.trends, source, dimension,
+        keys=[k.strip() for k in keys.split(",") if k.strip()] if keys else None,
+        top=top, since=since, until=until, limit=limit,
+    )
@@ -0,0 +1,138 @@
+import hashlib
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from services import findings, report_index
+
+# "total" has the single key "all"; "status" also counts rows that are not findings
+DIMENSIONS = ("total", "severity", "namespace", "status", "policy", "cve")
+
+_CVE_RE = re.compile(r"^(CVE-\d{4}-\d+|GHSA(-[0-9a-z]{4}){3})$", re.I)
+
+Counts = Dict[str, Dict[str, int]]
+
+
+def finding_key(source: str, row) -> str:
+    # What identifies one finding across runs; severity and status may change under it
+    ident = "\x1f".join((source, row["file"] or "", row["namespace"] or "", row["id"] or "", row["target"] or ""))
+    return hashlib.blake2b(ident.encode(), digest_size=8).hexdigest()
+
+
+def _count(counts: Counts, dimension: str, key: str):
+    keys = counts.setdefault(dimension, {})
+    keys[key] = keys.get(key, 0) + 1
+
+
+def compute_source(source: str) -> Tuple[Counts, Dict[str, list]]:
+    """Counts and the finding set of what the findings store holds for a source right now."""
+    counts: Counts = {"total": {"all": 0}}
+    items: Dict[str, list] = {}
+    for row in findings.iter_rows(source):
+        status = row["status"] or ""
+        _count(counts, "status", status)
+        if status in findings.NON_FINDING_STATUSES:
+            continue
+        counts["total"]["all"] += 1
+        if row["severity"]:
+            _count(counts, "severity", row["severity"])
+        if row["namespace"]:
+            _count(counts, "namespace", row["namespace"])
+        ident = row["id"] or ""
+        if _CVE_RE.match(ident):
+            _count(counts, "cve", ident.upper())
+        elif ident and source != "nmap":
+            # Kyverno policies, trivy misconfiguration ids and CIS checks
+            _count(counts, "policy", ident)
+        items[finding_key(source, row)] = [row["namespace"], row["severity"], status, ident, row["target"], row["file"]]
+    return counts, items
+
+
+def record(report_id: str, sources: Iterable[str]) -> Dict[str, int]:
+    """Computes and stores the aggregates of a report from the current findings; returns the totals."""
+    counts, items = {}, {}
+    for source in sources:
+        counts[source], items[source] = compute_source(source)
+    report_index.add_aggregates(report_id, counts, items)
+    return {source: c["total"]["all"] for source, c in counts.items()}
+
+
+def _delta(old: Dict[str, int], new: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    return {
+        key: {"a": old.get(key, 0), "b": new.get(key, 0), "delta": new.get(key, 0) - old.get(key, 0)}
+        for key in sorted(set(old) | set(new))
+        if old.get(key, 0) != new.get(key, 0)
+    }
+
+
+_ROW_FIELDS = ("namespace", "severity", "status", "id", "target", "file")
+
+
+def _item_diff(a_id: str, b_id: str, source: str, limit: int) -> Optional[Dict[str, Any]]:
+    old, new = report_index.get_finding_set(a_id, source), report_index.get_finding_set(b_id, source)
+    if old is None or new is None:
+        return None
+    added = [k for k in new if k not in old]
+    removed = [k for k in old if k not in new]
+    # Same finding, different severity or status
+    changed = [k for k in new if k in old and new[k][1:3] != old[k][1:3]]
+    return {
+        "added": len(added),
+        "removed": len(removed),
+        "changed": len(changed),
+        "added_items": [dict(zip(_ROW_FIELDS, new[k])) for k in added[:limit]],
+        "removed_items": [dict(zip(_ROW_FIELDS, old[k])) for k in removed[:limit]],
+        "changed_items": [dict(zip(_ROW_FIELDS, new[k]), previous_severity=old[k][1], previous_status=old[k][2])
+                          for k in changed[:limit]],
+    }
+
+
+def diff(a_id: str, b_id: str, items: bool = False, source: Optional[str] = None,
+         limit: int = 100) -> Optional[Dict[str, Any]]:
+    """What changed from report a to report b, per source and dimension. None if either report is unknown."""
+    a, b = report_index.get_summary(a_id), report_index.get_summary(b_id)
+    if a is None or b is None:
+        return None
+    a_counts, b_counts = report_index.get_aggregates(a_id), report_index.get_aggregates(b_id)
+    sources = [s for s in a_counts if s in b_counts and (source is None or s == source)]
+    result = {
+        "a": {"id": a_id, "timestamp": a["timestamp"]},
+        "b": {"id": b_id, "timestamp": b["timestamp"]},
+        # Status counts read from the scan output, also there for reports without aggregates
+        "summary": {
+            scan_type: _delta(a["findings"].get(scan_type, {}), b["findings"].get(scan_type, {}))
+            for scan_type in sorted(set(a["findings"]) | set(b["findings"]))
+        },
+        "sources": {},
+        # Sources only one of the reports scanned
+        "missing": sorted(s for s in set(a_counts) ^ set(b_counts) if source is None or s == source),
+    }
+    for s in sources:
+        entry = {
+            dimension: _delta(a_counts[s].get(dimension, {}), b_counts[s].get(dimension, {}))
+            for dimension in DIMENSIONS if dimension != "total"
+        }
+        old, new = a_counts[s]["total"]["all"], b_counts[s]["total"]["all"]
+        entry["total"] = {"a": old, "b": new, "delta": new - old}
+        if items:
+            entry["items"] = _item_diff(a_id, b_id, s, limit)
+        result["sources"][s] = entry
+    return result
+
+
+def trends(source: Optional[str] = None, dimension: str = "total", keys: Optional[List[str]] = None,
+           top: int = 10, since: Optional[str] = None, until: Optional[str] = None,
+           limit: int = 100) -> Dict[str, Any]:
+    """A dimension's counts over the latest reports.
+
+    Without keys, wide dimensions (namespace, policy, cve) are cut to the
+    `top` keys with the highest counts over the window.
+    """
+    points = report_index.aggregate_series(source, dimension, keys, since, until, limit)
+    if not keys and dimension not in ("total", "severity", "status"):
+        totals: Dict[str, int] = {}
+        for point in points:
+            for key, n in point["counts"].items():
+                totals[key] = totals.get(key, 0) + n
+        kept = set(sorted(totals, key=lambda k: (-totals[k], k))[:top])
+        for point in points:
+            point["counts"] = {k: n for k, n in point["counts"].items() if k in kept}
+    return {"source": source, "dimension": dimension, "points": points}
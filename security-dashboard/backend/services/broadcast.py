@@ -0,0 +1,149 @@
+import asyncio
+import os
+from collections import deque
+from typing import AsyncIterator, Callable, Optional
+from fastapi import WebSocket
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+# Per-subscriber backlog before the slow client policy kicks in
+WS_MAX_PENDING_BYTES = int(os.getenv("WS_MAX_PENDING_BYTES", str(1024 * 1024)))
+# "drop" discards the oldest output for a lagging viewer, "disconnect" evicts it
+WS_SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "drop")
+# Chunks arriving within this window are sent as one frame
+WS_BATCH_WINDOW_MS = int(os.getenv("WS_BATCH_WINDOW_MS", "50"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+
+# Control frames are never merged with log text, the frontend compares them verbatim
+CONTROL_MESSAGES = {"__EOF__"}
+
+
+class Subscriber:
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager", scan_id: str,
+                 replay: Optional[AsyncIterator[str]] = None):
+        self.websocket = websocket
+        self.manager = manager
+        self.scan_id = scan_id
+        self.replay = replay
+        self.pending: deque = deque()
+        self.pending_bytes = 0
+        self.dropped_bytes = 0
+        self.ready = asyncio.Event()
+        self.task = asyncio.create_task(self._writer())
+
+    def enqueue(self, message: str) -> bool:
+        """Queues a message without waiting. Returns False if the subscriber must be evicted."""
+        self.pending.append(message)
+        self.pending_bytes += len(message)
+        while self.pending_bytes > self.manager.max_pending_bytes and len(self.pending) > 1:
+            if self.manager.slow_client_policy == "disconnect":
+                return False
+            # Keep control frames, drop the oldest log text
+            idx = next((i for i, m in enumerate(self.pending) if m not in CONTROL_MESSAGES), None)
+            if idx is None:
+                break
+            dropped = self.pending[idx]
+            del self.pending[idx]
+            self.pending_bytes -= len(dropped)
+            self.dropped_bytes += len(dropped)
+        self.ready.set()
+        return True
+
+    def _take_batch(self) -> list:
+        frames, text = [], []
+        while self.pending:
+            message = self.pending.popleft()
+            self.pending_bytes -= len(message)
+            if message in CONTROL_MESSAGES:
+                if text:
+                    frames.append("".join(text))
+                    text = []
+                frames.append(message)
+            else:
+                text.append(message)
+        if text:
+            frames.append("".join(text))
+        if self.dropped_bytes:
+            frames.insert(0, f"\n[... {self.dropped_bytes} bytes of output skipped, viewer too slow ...]\n")
+            self.dropped_bytes = 0
+        return frames
+
+    async def _writer(self):
+        try:
+            # History goes out before anything broadcast after subscribing
+            if self.replay is not None:
+                async for frame in self.replay:
+                    await asyncio.wait_for(self.websocket.send_text(frame), self.manager.send_timeout)
+                self.replay = None
+            while True:
+                await self.ready.wait()
+                if self.manager.batch_window:
+                    await asyncio.sleep(self.manager.batch_window)
+                self.ready.clear()
+                for frame in self._take_batch():
+                    await asyncio.wait_for(self.websocket.send_text(frame), self.manager.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Evicting WS subscriber of {self.scan_id}: {e!r}")
+            self.evict()
+
+    def evict(self):
+        self.manager.disconnect(self.websocket, self.scan_id)
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            # 1013: try again later
+            await asyncio.wait_for(self.websocket.close(code=1013), self.manager.send_timeout)
+        except Exception:
+            pass
+
+    def close(self):
+        self.task.cancel()
+
+
+class ConnectionManager:
+    def __init__(self, max_pending_bytes: int = WS_MAX_PENDING_BYTES, slow_client_policy: str = WS_SLOW_CLIENT_POLICY,
+                 batch_window_ms: int = WS_BATCH_WINDOW_MS, send_timeout: float = WS_SEND_TIMEOUT):
+        self.active_connections: dict[str, list[Subscriber]] = {}
+        self.max_pending_bytes = max_pending_bytes
+        self.slow_client_policy = slow_client_policy
+        self.batch_window = batch_window_ms / 1000
+        self.send_timeout = send_timeout
+
+    async def connect(self, websocket: WebSocket, scan_id: str,
+                      replay: Optional[Callable[[], AsyncIterator[str]]] = None):
+        await websocket.accept()
+        logger.info(f"WS Connected: {scan_id}")
+        # The replay is taken in the same step as subscribing, so no chunk is missed or repeated
+        self.subscribe(websocket, scan_id, replay() if replay else None)
+
+    def subscribe(self, websocket: WebSocket, scan_id: str, replay: Optional[AsyncIterator[str]] = None) -> Subscriber:
+        subscriber = Subscriber(websocket, self, scan_id, replay)
+        self.active_connections.setdefault(scan_id, []).append(subscriber)
+        return subscriber
+
+    def disconnect(self, websocket: WebSocket, scan_id: str):
+        subscribers = self.active_connections.get(scan_id)
+        if not subscribers:
+            return
+        for subscriber in [s for s in subscribers if s.websocket is websocket]:
+            logger.info(f"WS Disconnected: {scan_id}")
+            subscribers.remove(subscriber)
+            if subscriber.task is not asyncio.current_task():
+                subscriber.close()
+        if not subscribers:
+            del self.active_connections[scan_id]
+
+    async def broadcast(self, message: str, scan_id: str):
+        # Never waits on a socket: the scanner's read loop only pays for the enqueue
+        for subscriber in list(self.active_connections.get(scan_id, [])):
+            if not subscriber.enqueue(message):
+                logger.warning(f"Evicting slow WS subscriber of {scan_id}")
+                subscriber.evict()
+
+    def queue_depth(self, scan_id: str = None) -> int:
+        scans = [scan_id] if scan_id else list(self.active_connections)
+        return sum(s.pending_bytes for sid in scans for s in self.active_connections.get(sid, []))
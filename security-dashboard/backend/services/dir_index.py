@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from services import executors
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+NEW_DIR = os.getenv("NEW_DIR", "/app/new")
+# A listing older than this is served as is while a fresh walk runs in the background
+FILE_INDEX_TTL = float(os.getenv("FILE_INDEX_TTL", "30"))
+# Listings kept in memory; the least recently listed directory is dropped first
+FILE_INDEX_MAX_LISTINGS = int(os.getenv("FILE_INDEX_MAX_LISTINGS", "32"))
+
+
+@dataclass
+class FileEntry:
+    path: str  # relative to the listed directory, "/" separated
+    namespace: str
+    size: int
+    mtime: float
+
+
+@dataclass
+class _Listing:
+    files: List[FileEntry]
+    built_at: float
+    refreshing: Optional[asyncio.Task] = None
+
+
+def _walk(target_dir: str, suffix: str) -> List[FileEntry]:
+    files = []
+    stack = [target_dir]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(suffix):
+                    st = entry.stat()
+                    rel = os.path.relpath(entry.path, target_dir).replace(os.sep, "/")
+                    # trivy-reports/<namespace>/<image>.json
+                    namespace = rel.split("/", 1)[0] if "/" in rel else ""
+                    files.append(FileEntry(rel, namespace, st.st_size, st.st_mtime))
+            except OSError:
+                continue
+    files.sort(key=lambda f: f.path)
+    return files
+
+
+class DirectoryIndex:
+    """In-memory listings of directories under NEW_DIR.
+
+    Listings are rebuilt in a worker thread when a scan finishes (see
+    refresh) and, as a fallback for files changed behind our back, once they
+    are older than the TTL; until the new walk is done the old one is served.
+    At most max_listings directories are kept, keyed by their normalized path.
+    """
+
+    def __init__(self, root: str = NEW_DIR, ttl: float = FILE_INDEX_TTL, suffix: str = ".json",
+                 max_listings: int = FILE_INDEX_MAX_LISTINGS):
+        self.root = root
+        self.ttl = ttl
+        self.suffix = suffix
+        self.max_listings = max_listings
+        self.listings: "OrderedDict[str, _Listing]" = OrderedDict()
+        self._first_walks: Dict[str, asyncio.Task] = {}
+
+    def _dir(self, subpath: str) -> str:
+        return os.path.join(self.root, subpath)
+
+    @staticmethod
+    def normalize(subpath: str) -> Optional[str]:
+        """subpath as a cache key ("" for the root), or None if it points outside the root."""
+        key = os.path.normpath(subpath.strip("/") or ".")
+        if key == ".":
+            return ""
+        if key == ".." or key.startswith("../"):
+            return None
+        return key
+
+    def _store(self, subpath: str, listing: _Listing):
+        self.listings[subpath] = listing
+        self.listings.move_to_end(subpath)
+        while len(self.listings) > self.max_listings:
+            self.listings.popitem(last=False)
+
+    async def _build(self, subpath: str, first: bool = False) -> _Listing:
+        started = time.monotonic()
+        files = await executors.run_io(_walk, self._dir(subpath), self.suffix)
+        # Stamped with the walk's start so an overlapping older walk never replaces a newer one
+        listing = _Listing(files, started)
+        current = self.listings.get(subpath)
+        # A background walk of a listing evicted meanwhile does not bring it back
+        if (current is None and first) or (current is not None and current.built_at <= started):
+            self._store(subpath, listing)
+        logger.info(f"Indexed {len(files)} files under {subpath or '.'} in {time.monotonic() - started:.2f}s")
+        return listing
+
+    def _revalidate(self, subpath: str, listing: _Listing, force: bool = False):
+        # A forced walk starts even if one is running, since that one may predate the change
+        if force or listing.refreshing is None or listing.refreshing.done():
+            listing.refreshing = asyncio.create_task(self._build(subpath))
+
+    async def list(self, subpath: str) -> List[FileEntry]:
+        """Files under subpath; empty for a directory that does not exist (which is not cached)."""
+        key = self.normalize(subpath)
+        if key is None or not await executors.run_io(os.path.isdir, self._dir(key)):
+            if key is not None:
+                self.listings.pop(key, None)
+            return []
+        listing = self.listings.get(key)
+        if listing is None:
+            # Concurrent first requests share one walk
+            task = self._first_walks.get(key)
+            if task is None:
+                task = self._first_walks[key] = asyncio.create_task(self._build(key, first=True))
+                task.add_done_callback(lambda _: self._first_walks.pop(key, None))
+            return (await task).files
+        self.listings.move_to_end(key)
+        if self.ttl and time.monotonic() - listing.built_at > self.ttl:
+            self._revalidate(key, listing)
+        return listing.files
+
+    def refresh(self):
+        """Re-walks every cached listing in the background, e.g. after a scan wrote new files."""
+        for subpath, listing in list(self.listings.items()):
+            self._revalidate(subpath, listing, force=True)
+
+
+index = DirectoryIndex()
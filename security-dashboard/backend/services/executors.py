@@ -0,0 +1,140 @@
+import asyncio
+import functools
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+from services import metrics
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+# Threads for blocking file and SQLite work
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+# Processes for encoding/decoding large JSON documents and reports; 0 keeps it on the I/O threads
+JSON_PROCESS_WORKERS = int(os.getenv("JSON_PROCESS_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Documents below this size are cheaper to handle in a thread than to ship to a process
+LARGE_JSON_BYTES = int(os.getenv("LARGE_JSON_BYTES", str(8 * 1024 * 1024)))
+LOOP_LAG_INTERVAL_MS = int(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+
+_io_pool: Optional[ThreadPoolExecutor] = None
+_json_pool: Optional[ProcessPoolExecutor] = None
+
+
+def io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+    return _io_pool
+
+
+def json_pool() -> Optional[ProcessPoolExecutor]:
+    global _json_pool
+    if _json_pool is None and JSON_PROCESS_WORKERS > 0:
+        _json_pool = ProcessPoolExecutor(max_workers=JSON_PROCESS_WORKERS)
+    return _json_pool
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """Runs blocking file or database work on the I/O thread pool."""
+    loop = asyncio.get_running_loop()
+    with metrics.executor_timer("io", func):
+        return await loop.run_in_executor(io_pool(), functools.partial(func, *args, **kwargs))
+
+
+async def iterate_io(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """Pulls each item of a blocking iterator (e.g. file chunks) on the I/O thread pool."""
+    done = object()
+    try:
+        while True:
+            item = await run_io(next, iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await run_io(close)
+
+
+async def run_cpu(func: Callable, *args, size_hint: int = 0) -> Any:
+    """Runs encode/decode work; with size_hint (approximate bytes) >= LARGE_JSON_BYTES it goes to a worker process.
+
+    func and its arguments must be picklable, i.e. module-level functions.
+    Arguments are pickled and the result unpickled in this process, holding
+    the GIL the event loop needs, so pass paths rather than documents and
+    return bytes (or something as small) rather than decoded objects.
+    """
+    pool = json_pool() if size_hint >= LARGE_JSON_BYTES else None
+    if pool is None:
+        return await run_io(func, *args)
+    try:
+        with metrics.executor_timer("process", func):
+            return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+    except (BrokenProcessPool, pickle.PicklingError) as e:
+        # A killed worker or unpicklable data must not lose the document
+        logger.warning(f"JSON process pool failed ({e!r}), retrying on a thread")
+        return await run_io(func, *args)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a sleeping task.
+
+    Any blocking call inside a coroutine shows up here as lag, since no
+    other task (scan streams, terminals) can run until it returns.
+    """
+
+    def __init__(self, interval_ms: int = LOOP_LAG_INTERVAL_MS, samples: int = 3000):
+        self.interval = interval_ms / 1000
+        self.samples: deque = deque(maxlen=samples)
+        self.max_ms = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.samples.append(lag_ms)
+            self.max_ms = max(self.max_ms, lag_ms)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": len(self.samples),
+            "p50_ms": round(self.percentile(50), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+loop_lag = LoopLagMonitor()
+
+
+def shutdown():
+    global _io_pool, _json_pool
+    loop_lag.stop()
+    if _json_pool is not None:
+        _json_pool.shutdown(wait=False, cancel_futures=True)
+        _json_pool = None
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=False)
+        _io_pool = None
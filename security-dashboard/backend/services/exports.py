@@ -0,0 +1,69 @@
+import asyncio
+import importlib.util
+import os
+import sys
+from typing import Dict
+from services import findings, processes
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "security-dashboard/backend/cache/exports")
+SCRIPTS_DIR = os.getenv("SCRIPTS_DIR", os.path.join(os.getenv("APP_HOME", "/app"), "scripts"))
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+class ExportError(Exception):
+    pass
+
+
+def available(fmt: str) -> bool:
+    # Parquet is only written when pyarrow is installed
+    return fmt != "parquet" or importlib.util.find_spec("pyarrow") is not None
+
+
+def _prune(keep: str, fmt: str):
+    for name in os.listdir(EXPORT_CACHE_DIR):
+        if name.startswith("kyverno-") and name.endswith(f".{fmt}") and name != keep:
+            os.remove(os.path.join(EXPORT_CACHE_DIR, name))
+
+
+async def kyverno_export(fmt: str) -> str:
+    """Path of the current kyverno report exported as fmt, running the exporter if it is not cached.
+
+    The export runs as scripts/convert_json_to_excel.py in its own process, so
+    a million-row frame never sits in the server's memory. Raises
+    FileNotFoundError when there is no kyverno report yet.
+    """
+    source = os.path.join(findings.NEW_DIR, "kyverno-report", "kyverno.zip")
+    st = os.stat(source)
+    name = f"kyverno-{st.st_mtime_ns}-{st.st_size}.{fmt}"
+    path = os.path.join(EXPORT_CACHE_DIR, name)
+    # One export per format at a time; concurrent downloads wait for it and share the file
+    async with _locks.setdefault(fmt, asyncio.Lock()):
+        if os.path.exists(path):
+            return path
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        process = await processes.spawn(
+            sys.executable, os.path.join(SCRIPTS_DIR, "convert_json_to_excel.py"), source,
+            "-o", tmp_path, "--format", fmt,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        output, _ = await process.communicate()
+        if process.returncode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise ExportError(output.decode("utf-8", errors="replace").strip() or f"exporter exited with {process.returncode}")
+        os.replace(tmp_path, path)
+        _prune(name, fmt)
+        logger.info(f"Exported the kyverno report as {fmt} to {path}")
+    return path
@@ -0,0 +1,643 @@
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import zipfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+REPORTS_DIR = "security-dashboard/backend/reports"
+FINDINGS_DB = os.getenv("FINDINGS_DB", os.path.join(REPORTS_DIR, "findings.db"))
+NEW_DIR = os.getenv("NEW_DIR", "/app/new")
+
+SOURCES = ("kyverno", "cluster", "image", "sbom", "nmap", "cis")
+SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW", "UNKNOWN")
+# Sortable columns; "seq" is the order of the rows in the artifact
+SORT_COLUMNS = {"seq", "severity", "status", "namespace", "id", "title", "target"}
+# Rows with these statuses record a check that passed or found nothing to report
+NON_FINDING_STATUSES = ("PASS", "SKIP", "INFO", "SAFE", "NO_TLS")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    source TEXT,
+    path TEXT,
+    mtime REAL,
+    size INTEGER,
+    hash TEXT,
+    rows INTEGER,
+    PRIMARY KEY (source, path)
+);
+CREATE TABLE IF NOT EXISTS findings (
+    source TEXT,
+    file TEXT,
+    seq INTEGER,
+    namespace TEXT,
+    severity TEXT,
+    severity_rank INTEGER,
+    status TEXT,
+    id TEXT,
+    title TEXT,
+    target TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS findings_scope ON findings (source, namespace, file, seq);
+CREATE INDEX IF NOT EXISTS findings_file ON findings (source, file, seq);
+CREATE INDEX IF NOT EXISTS findings_severity ON findings (source, severity_rank, seq);
+CREATE INDEX IF NOT EXISTS findings_status ON findings (source, status, seq);
+CREATE TABLE IF NOT EXISTS counts (
+    source TEXT,
+    file TEXT,
+    namespace TEXT,
+    severity TEXT,
+    status TEXT,
+    n INTEGER
+);
+CREATE INDEX IF NOT EXISTS counts_source ON counts (source, namespace, file);
+"""
+
+_lock = threading.Lock()
+_ready = False
+
+
+@contextmanager
+def _connect():
+    conn = sqlite3.connect(FINDINGS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def init():
+    global _ready
+    if _ready:
+        return
+    os.makedirs(os.path.dirname(FINDINGS_DB) or ".", exist_ok=True)
+    with _lock, _connect() as conn:
+        if _ready:
+            return
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(artifacts)")}
+        if "hash" not in columns:
+            conn.execute("ALTER TABLE artifacts ADD COLUMN hash TEXT")
+        _ready = True
+
+
+# --- Streaming JSON ---
+
+class _JsonStream:
+    """Decodes the values of a large JSON document one at a time.
+
+    Only the value being decoded is held in memory, so a report with a
+    multi-hundred-MB items list is walked item by item.
+    """
+
+    CHUNK = 1 << 20
+
+    def __init__(self, f: io.TextIOBase):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int = CHUNK) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+            return False
+        if self.pos > self.CHUNK:
+            self.buf, self.pos = self.buf[self.pos:], 0
+        self.buf += data
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        size = self.CHUNK
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number cut at the buffer edge decodes fine but short
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+    def items(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            sep = self.peek()
+            self.pos += 1
+            if sep == "]":
+                return
+            if sep != ",":
+                raise ValueError(f"Expected ',' or ']' at offset {self.pos}")
+
+    def members(self, lists: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+        """Yields (key, item) for the items of the named top-level lists and (key, value) for the rest."""
+        lists = set(lists)
+        self.expect("{")
+        if self.peek() == "}":
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            if key in lists and self.peek() == "[":
+                for item in self.items():
+                    yield key, item
+            else:
+                yield key, self.value()
+            sep = self.peek()
+            self.pos += 1
+            if sep == "}":
+                return
+            if sep != ",":
+                raise ValueError(f"Expected ',' or '}}' at offset {self.pos}")
+
+
+@contextmanager
+def _open_json(path: str, member_suffix: str = ".json"):
+    # Zipped reports are read straight from the archive member
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as zf:
+            names = [n for n in zf.namelist() if n.lower().endswith(member_suffix)]
+            names = names or [n for n in zf.namelist() if n.lower().endswith(".json")]
+            if not names:
+                raise ValueError(f"No JSON file found in {os.path.basename(path)}")
+            with zf.open(names[0]) as raw:
+                yield io.TextIOWrapper(raw, encoding="utf-8")
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield f
+
+
+# --- Normalizers ---
+# Each yields (namespace, severity, status, id, title, target, data); data is the
+# row as PolicyReports.jsx renders it.
+
+def _upper(value, default: str = "") -> str:
+    return str(value or default).upper()
+
+
+def _first_ref(v: dict) -> str:
+    refs = v.get("References") or v.get("references") or []
+    return v.get("PrimaryURL") or v.get("primaryURL") or (refs[0] if refs else "")
+
+
+def _kyverno_rows(path: str, rel: str):
+    with _open_json(path, "kyverno.json") as f:
+        stream = _JsonStream(f)
+        if stream.peek() == "[":
+            items = ((None, item) for item in stream.items())
+        else:
+            items = stream.members(["items"])
+        for key, item in items:
+            if key not in (None, "items") or not isinstance(item, dict) or not item.get("results"):
+                continue
+            scope = item.get("scope") or {}
+            scope_ns = scope.get("namespace") or (item.get("metadata") or {}).get("namespace") or ""
+            for res in item["results"]:
+                base = {
+                    "status": _upper(res.get("result")),
+                    "severity": _upper(res.get("severity"), "UNKNOWN"),
+                    "policy": res.get("policy") or "",
+                    "message": res.get("message") or "",
+                    "type": scope.get("kind") or "",
+                    "name": scope.get("name") or "",
+                    "namespace": scope_ns,
+                }
+                rows = [dict(base, type=str(r.get("kind") or base["type"]), name=str(r.get("name") or base["name"]),
+                             namespace=str(r.get("namespace") or scope_ns))
+                        for r in res.get("resources") or []] or [base]
+                for row in rows:
+                    yield row["namespace"], row["severity"], row["status"], row["policy"], row["message"], row["name"], row
+
+
+def _cluster_results(stream: _JsonStream):
+    # Trivy k8s reports come as Results, Findings or Resources depending on version
+    for key, value in stream.members(["Results", "results", "Findings", "findings", "Resources", "resources"]):
+        if key in ("Results", "results"):
+            yield value, {}
+        elif key in ("Findings", "findings", "Resources", "resources") and isinstance(value, dict):
+            ctx = {"Namespace": value.get("Namespace"), "Kind": value.get("Kind"), "Name": value.get("Name")}
+            for r in value.get("Results") or value.get("results") or []:
+                yield r, ctx
+
+
+def _cluster_rows(path: str, rel: str):
+    with _open_json(path, "cluster.json") as f:
+        for r, ctx in _cluster_results(_JsonStream(f)):
+            ns = ctx.get("Namespace") or ""
+            kind_name = f"{ctx['Kind']}/{ctx['Name']}" if ctx.get("Kind") and ctx.get("Name") else (ctx.get("Kind") or ctx.get("Name"))
+            for m in r.get("Misconfigurations") or r.get("misconfigurations") or []:
+                target = r.get("Target") or r.get("target") or " ".join(x for x in (ns, kind_name) if x)
+                row = {
+                    "severity": _upper(m.get("Severity") or m.get("severity"), "UNKNOWN"),
+                    "id": m.get("ID") or m.get("id") or "",
+                    "title": m.get("Title") or m.get("title") or "",
+                    "msg": m.get("Message") or m.get("message") or m.get("Description") or m.get("description") or "",
+                    "status": _upper(m.get("Status") or m.get("status"), "FAIL"),
+                    "target": target or "Kubernetes",
+                    "type": "Misconfig",
+                    "link": _first_ref(m),
+                    "namespace": ns,
+                }
+                yield ns, row["severity"], row["status"], row["id"], row["title"], row["target"], row
+            for v in r.get("Vulnerabilities") or r.get("vulnerabilities") or []:
+                row = {
+                    "severity": _upper(v.get("Severity") or v.get("severity"), "UNKNOWN"),
+                    "id": v.get("VulnerabilityID") or v.get("vulnerabilityID") or "",
+                    "title": v.get("Title") or v.get("title") or "",
+                    "msg": f"Pkg: {v.get('PkgName')} {v.get('InstalledVersion')}",
+                    "status": "FAIL",
+                    "target": r.get("Target") or r.get("target") or "",
+                    "type": "Vuln",
+                    "link": _first_ref(v),
+                    "namespace": ns,
+                }
+                yield ns, row["severity"], row["status"], row["id"], row["title"], row["target"], row
+
+
+def _image_rows(path: str, rel: str):
+    # trivy-reports/<namespace>/<image>.json
+    ns = rel.split("/", 1)[0] if "/" in rel else ""
+    with _open_json(path) as f:
+        doc = json.load(f)
+    artifact = doc.get("ArtifactName") or doc.get("artifactName") or ""
+    for r in doc.get("Results") or doc.get("results") or []:
+        for v in r.get("Vulnerabilities") or r.get("vulnerabilities") or []:
+            row = {
+                "severity": _upper(v.get("Severity") or v.get("severity"), "UNKNOWN"),
+                "id": v.get("VulnerabilityID") or v.get("vulnerabilityID") or v.get("CVE") or "",
+                "pkg": v.get("PkgName") or v.get("pkgName") or "",
+                "installed": v.get("InstalledVersion") or v.get("installedVersion") or "",
+                "fixed": v.get("FixedVersion") or v.get("fixedVersion") or "",
+                "title": v.get("Title") or v.get("title") or "",
+                "target": r.get("Target") or r.get("target") or artifact,
+                "refs": v.get("References") or v.get("references") or [],
+                "namespace": ns,
+                "file": rel,
+            }
+            yield ns, row["severity"], _upper(v.get("Status")), row["id"], row["title"], row["pkg"], row
+
+
+def _sbom_rows(path: str, rel: str):
+    with _open_json(path) as f:
+        for key, res in _JsonStream(f).members(["Results"]):
+            if key != "Results" or not isinstance(res, dict):
+                continue
+            pkgs = {}
+            for p in res.get("Packages") or []:
+                ident = p.get("Identifier") or {}
+                pkgs[p.get("ID") or ident.get("BOMRef") or ident.get("PURL") or p.get("Name")] = p
+            for v in res.get("Vulnerabilities") or []:
+                pkg_id = str(v.get("PkgID") or v.get("PkgName") or "")
+                pkg = pkgs.get(pkg_id) or {}
+                refs = v.get("References") or []
+                row = {
+                    "id": str(v.get("VulnerabilityID") or ""),
+                    "library": str(v.get("PkgName") or pkg.get("Name") or pkg_id),
+                    "installed": str(v.get("InstalledVersion") or pkg.get("Version") or ""),
+                    "fixed": str(v.get("FixedVersion") or ""),
+                    "status": str(v.get("Status") or ""),
+                    "severity": _upper(v.get("Severity")),
+                    "title": str(v.get("Title") or ""),
+                    "ref": refs[0] if refs else (v.get("PrimaryURL") or ""),
+                }
+                yield "", row["severity"] or "UNKNOWN", _upper(row["status"]), row["id"], row["title"], row["library"], row
+
+
+def _nmap_rows(path: str, rel: str):
+    with _open_json(path) as f:
+        doc = json.load(f)
+    for item in doc if isinstance(doc, list) else []:
+        row = {
+            "namespace": str(item.get("namespace") or ""),
+            "fqdn": str(item.get("fqdn") or ""),
+            "port": item.get("port") if item.get("port") is not None else "",
+            "accepted": item.get("accepted_ciphers") if isinstance(item.get("accepted_ciphers"), list) else [],
+            "weak": item.get("weak_ciphers") if isinstance(item.get("weak_ciphers"), list) else [],
+            "safe": item.get("safe_ciphers") if isinstance(item.get("safe_ciphers"), list) else [],
+        }
+        # Services offering any weak cipher are the findings here
+        status = "WEAK" if row["weak"] else ("SAFE" if row["accepted"] else "NO_TLS")
+        yield row["namespace"], "", status, row["fqdn"], "", f"{row['fqdn']}:{row['port']}", row
+
+
+_CIS_CHECK_RE = re.compile(r"^\[(FAIL|WARN|PASS|INFO)\]\s+([0-9]+(?:\.[0-9]+)+)\s+(.*)$")
+_CIS_SECTION_RE = re.compile(r"^\[INFO\]\s+([0-9]+(?:\.[0-9]+)?)\s+(.*)$")
+_CIS_REMEDIATION_RE = re.compile(r"^([0-9]+(?:\.[0-9]+)+)\b(.*)$")
+_CIS_MAJOR_SECTIONS = {"1": "Control Plane", "2": "Etcd", "3": "Control Plane Config", "4": "Worker Node", "5": "Policies"}
+
+
+def _cis_section(check_id: str, sections: Dict[str, str]) -> str:
+    best = ""
+    for prefix in sections:
+        if (check_id == prefix or check_id.startswith(prefix + ".")) and len(prefix) > len(best):
+            best = prefix
+    if best:
+        return sections[best]
+    major = check_id.split(".")[0]
+    return _CIS_MAJOR_SECTIONS.get(major, f"Group {major}")
+
+
+def _cis_rows(path: str, rel: str):
+    # Same reading of kube-bench's text output as the CIS view used to do in the browser
+    with open(path, encoding="utf-8", errors="replace") as f:
+        lines = f.read().splitlines()
+    sections = {}
+    for line in lines:
+        m = _CIS_SECTION_RE.match(line)
+        if m:
+            sections[m.group(1)] = m.group(2).strip()
+
+    remediations: Dict[str, str] = {}
+    in_rem, current = False, None
+    for line in lines:
+        if re.match(r"^==\s*Remediations", line):
+            in_rem, current = True, None
+            continue
+        if in_rem and (re.match(r"^==\s*Summary", line) or re.match(r"^\[(FAIL|WARN|PASS|INFO)\]", line)):
+            in_rem, current = False, None
+            continue
+        if not in_rem:
+            continue
+        m = _CIS_REMEDIATION_RE.match(line)
+        if m:
+            current = m.group(1)
+            remediations[current] = m.group(2).strip()
+        elif current:
+            if line.startswith("=="):
+                in_rem, current = False, None
+                continue
+            text = line.strip()
+            remediations[current] += ("\n" if remediations[current] else "") + text
+
+    for line in lines:
+        m = _CIS_CHECK_RE.match(line)
+        if not m:
+            continue
+        status, check_id, title = m.group(1), m.group(2), m.group(3).strip()
+        title = re.sub(r"\s*\((Manual|Automated)\)\s*$", "", title)
+        row = {"status": status, "id": check_id, "desc": title, "section": _cis_section(check_id, sections),
+               "remediation": remediations.get(check_id, "")}
+        # The section takes the namespace column so the CIS view can filter and count by it
+        yield row["section"], "", status, check_id, title, row["section"], row
+
+
+def _cis_json_rows(path: str, rel: str):
+    with open(path, "rb") as f:
+        doc = json.load(f)
+    controls = (doc.get("Controls") or []) if isinstance(doc, dict) else doc
+    for control in controls if isinstance(controls, list) else []:
+        for test in control.get("tests") or []:
+            section = str(test.get("desc") or "") or _cis_section(str(test.get("section") or ""), {})
+            for result in test.get("results") or []:
+                status = str(result.get("status") or "INFO")
+                check_id = str(result.get("test_number") or "")
+                title = re.sub(r"\s*\((Manual|Automated)\)\s*$", "", str(result.get("test_desc") or ""))
+                row = {"status": status, "id": check_id, "desc": title, "section": section,
+                       "remediation": str(result.get("remediation") or ""),
+                       "section_id": str(test.get("section") or ""), "node_type": str(control.get("node_type") or ""),
+                       "scored": bool(result.get("scored"))}
+                yield section, "", status, check_id, title, section, row
+
+
+def _cis_any_rows(path: str, rel: str):
+    # kube-bench's JSON report when the Python stage wrote one, the text report from the script otherwise
+    return _cis_json_rows(path, rel) if path.endswith(".json") else _cis_rows(path, rel)
+
+
+_NORMALIZERS = {
+    "kyverno": _kyverno_rows,
+    "cluster": _cluster_rows,
+    "image": _image_rows,
+    "sbom": _sbom_rows,
+    "nmap": _nmap_rows,
+    "cis": _cis_any_rows,
+}
+
+# Where each source's artifacts live under NEW_DIR
+_ARTIFACTS = {
+    "kyverno": "kyverno-report/kyverno.zip",
+    "cluster": "trivy-cluster-report/cluster.zip",
+    "image": "trivy-reports",
+    "sbom": "trivy-sbom/sbom.json",
+    "nmap": "nmap/nmap.json",
+    "cis": "kube-bench/kubebench.json",
+}
+# Older artifact indexed when the preferred one is missing
+_FALLBACK_ARTIFACTS = {
+    "cis": "kube-bench/kubebench.txt",
+}
+
+
+def _artifact_root(source: str, new_dir: str) -> str:
+    root = os.path.join(new_dir, _ARTIFACTS[source])
+    fallback = _FALLBACK_ARTIFACTS.get(source)
+    if fallback and not os.path.exists(root):
+        return os.path.join(new_dir, fallback)
+    return root
+
+
+def _artifact_files(source: str, new_dir: str) -> Dict[str, os.stat_result]:
+    """Current artifact files of a source, keyed by path relative to the artifact root."""
+    root = _artifact_root(source, new_dir)
+    files = {}
+    if source == "image":
+        stack = [root]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.endswith(".json"):
+                    files[os.path.relpath(entry.path, root).replace(os.sep, "/")] = entry.stat()
+    else:
+        try:
+            files[""] = os.stat(root)
+        except OSError:
+            pass
+    return files
+
+
+def _severity_rank(severity: str) -> int:
+    return SEVERITIES.index(severity) if severity in SEVERITIES else len(SEVERITIES)
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _build(conn: sqlite3.Connection, source: str, root: str, rel: str, st: os.stat_result, digest: str) -> int:
+    path = os.path.join(root, rel) if rel else root
+    conn.execute("DELETE FROM findings WHERE source = ? AND file = ?", (source, rel))
+    conn.execute("DELETE FROM counts WHERE source = ? AND file = ?", (source, rel))
+    counts: Dict[Tuple[str, str, str], int] = {}
+    batch = []
+    seq = 0
+    for ns, severity, status, ident, title, target, data in _NORMALIZERS[source](path, rel):
+        batch.append((source, rel, seq, ns, severity, _severity_rank(severity), status,
+                      ident, title, target, json.dumps(data, separators=(",", ":"))))
+        key = (ns, severity, status)
+        counts[key] = counts.get(key, 0) + 1
+        seq += 1
+        if len(batch) >= 5000:
+            conn.executemany("INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    conn.executemany("INSERT INTO counts VALUES (?, ?, ?, ?, ?, ?)",
+                     [(source, rel, ns, sev, status, n) for (ns, sev, status), n in counts.items()])
+    conn.execute("INSERT OR REPLACE INTO artifacts (source, path, mtime, size, hash, rows) VALUES (?, ?, ?, ?, ?, ?)",
+                 (source, rel, st.st_mtime, st.st_size, digest, seq))
+    return seq
+
+
+def refresh(source: str, new_dir: str = None) -> int:
+    """Re-indexes the artifacts of a source that changed since they were last indexed.
+
+    A file is only parsed again when its content hash changed; a new mtime
+    alone (a scanner rewriting identical output) just updates the record.
+    Returns the number of artifact files rebuilt.
+    """
+    init()
+    new_dir = new_dir or NEW_DIR
+    root = _artifact_root(source, new_dir)
+    files = _artifact_files(source, new_dir)
+    with _lock, _connect() as conn:
+        known = {r["path"]: r for r in conn.execute(
+            "SELECT path, mtime, size, hash FROM artifacts WHERE source = ?", (source,))}
+        rebuilt = 0
+        for rel, st in files.items():
+            old = known.get(rel)
+            if old is not None and (old["mtime"], old["size"]) == (st.st_mtime, st.st_size):
+                continue
+            path = os.path.join(root, rel) if rel else root
+            try:
+                digest = _file_hash(path)
+                if old is not None and old["hash"] == digest:
+                    conn.execute("UPDATE artifacts SET mtime = ?, size = ? WHERE source = ? AND path = ?",
+                                 (st.st_mtime, st.st_size, source, rel))
+                    conn.commit()
+                    continue
+                rows = _build(conn, source, root, rel, st, digest)
+                # Each artifact is swapped in on its own; readers see the old rows until then
+                conn.commit()
+                rebuilt += 1
+                logger.debug(f"Indexed {rows} {source} findings from {rel or os.path.basename(root)}")
+            except Exception as e:
+                conn.rollback()
+                logger.warning(f"Skipping unreadable {source} artifact {rel or root}: {e}")
+        for rel in set(known) - set(files):
+            conn.execute("DELETE FROM findings WHERE source = ? AND file = ?", (source, rel))
+            conn.execute("DELETE FROM counts WHERE source = ? AND file = ?", (source, rel))
+            conn.execute("DELETE FROM artifacts WHERE source = ? AND path = ?", (source, rel))
+    return rebuilt
+
+
+def _scope(source: str, namespace: Optional[str], file: Optional[str]) -> Tuple[List[str], List[Any]]:
+    clauses, args = ["source = ?"], [source]
+    if namespace:
+        clauses.append("namespace = ?")
+        args.append(namespace)
+    if file is not None:
+        clauses.append("file = ?")
+        args.append(file)
+    return clauses, args
+
+
+def query(source: str, namespace: Optional[str] = None, file: Optional[str] = None,
+          statuses: Optional[List[str]] = None, severities: Optional[List[str]] = None,
+          sort: str = "seq", descending: bool = False, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    """One page of rows plus counts, read only from the store kept by services.ingest.
+
+    The counts cover the namespace/file scope but ignore the status and
+    severity filters, so they can label the filter controls.
+    """
+    init()
+    scope_clauses, scope_args = _scope(source, namespace, file)
+    clauses, args = list(scope_clauses), list(scope_args)
+    if statuses:
+        clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+        args.extend(statuses)
+    if severities:
+        clauses.append(f"severity IN ({','.join('?' * len(severities))})")
+        args.extend(severities)
+    where = " AND ".join(clauses)
+    column = "severity_rank" if sort == "severity" else sort
+    direction = "DESC" if descending else "ASC"
+    order = f"{column} {direction}, file, seq" if column != "seq" else f"file {direction}, seq {direction}"
+
+    with _connect() as conn:
+        by_severity, by_status, by_namespace = {}, {}, {}
+        for r in conn.execute(f"SELECT severity, status, n FROM counts WHERE {' AND '.join(scope_clauses)}",
+                              scope_args):
+            if r["severity"]:
+                by_severity[r["severity"]] = by_severity.get(r["severity"], 0) + r["n"]
+            by_status[r["status"]] = by_status.get(r["status"], 0) + r["n"]
+        for r in conn.execute("SELECT namespace, SUM(n) AS n FROM counts WHERE source = ? GROUP BY namespace", (source,)):
+            if r["namespace"]:
+                by_namespace[r["namespace"]] = r["n"]
+        total = conn.execute(f"SELECT COUNT(*) FROM findings WHERE {where}", args).fetchone()[0]
+        rows = conn.execute(f"SELECT data FROM findings WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                            (*args, limit, offset)).fetchall()
+
+    return {
+        "source": source,
+        "total": total,
+        "offset": offset,
+        "next_offset": offset + limit if offset + limit < total else None,
+        "counts": {"severity": by_severity, "status": by_status, "namespace": by_namespace},
+        "rows": [json.loads(r["data"]) for r in rows],
+    }
+
+
+def iter_rows(source: str) -> Iterator[sqlite3.Row]:
+    """Every stored row of a source, without the rendered data column."""
+    init()
+    with _connect() as conn:
+        yield from conn.execute(
+            "SELECT file, namespace, severity, status, id, target FROM findings WHERE source = ? ORDER BY file, seq",
+            (source,),
+        )
@@ -0,0 +1,45 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict
+
+# Kept next to the artifacts they describe, as NEW_DIR/fingerprints/<scan type>.json.
+# scripts/kyverno_k8s_resources_to_yaml.py reads and writes the same format.
+FINGERPRINT_DIRNAME = "fingerprints"
+
+
+def content_hash(obj: Any) -> str:
+    data = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+class FingerprintStore:
+    """What each stored finding of one scan type was computed from.
+
+    Maps an object key (a pod uid, a report file, a service) to the
+    fingerprint of the object version it was scanned at. The salt covers
+    the scan's own inputs (policies, flags); when it differs every stored
+    fingerprint is void and the next scan is a full one.
+    """
+
+    def __init__(self, new_dir: str, scan_type: str):
+        self.path = os.path.join(new_dir, FINGERPRINT_DIRNAME, f"{scan_type}.json")
+
+    def load(self, salt: str = "") -> Dict[str, str]:
+        try:
+            with open(self.path) as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if doc.get("salt", "") != salt:
+            return {}
+        return doc.get("objects") or {}
+
+    def save(self, objects: Dict[str, str], salt: str = ""):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"salt": salt, "updated_at": time.time(), "objects": objects}, f)
+        os.replace(tmp_path, self.path)
+
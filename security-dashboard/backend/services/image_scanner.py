@@ -0,0 +1,301 @@
+import asyncio
+import json
+import os
+import re
+import shlex
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+from services import executors, fingerprints, inventory, processes, trivy_server
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "security-dashboard/backend/cache/trivy-images")
+IMAGE_SCAN_WORKERS = int(os.getenv("IMAGE_SCAN_WORKERS", "4"))
+# 0 keeps cached results until the digest changes
+IMAGE_CACHE_TTL_HOURS = float(os.getenv("IMAGE_CACHE_TTL_HOURS", "0"))
+
+_DIGEST_RE = re.compile(r"sha256:[0-9a-f]{64}")
+
+Emit = Callable[[str], Awaitable[None]]
+
+
+def sanitize(image: str) -> str:
+    # Same mapping as scripts/scan-trivy-images-namspeacewise.sh so file names stay stable
+    return re.sub(r"[^A-Za-z0-9._-]", "_", image)
+
+
+def _repository(ref: str) -> str:
+    # "registry:5000/team/app:1.2@sha256:..." -> "registry:5000/team/app"
+    name = ref.split("@", 1)[0]
+    colon = name.rfind(":")
+    return name[:colon] if colon > name.rfind("/") else name
+
+
+@dataclass
+class ImageTarget:
+    ref: str
+    digest: Optional[str]
+    placements: Set[Tuple[str, str]] = field(default_factory=set)  # (namespace, image ref)
+
+    @property
+    def scan_ref(self) -> str:
+        """What trivy pulls: the running digest when known, since the tag may have moved since."""
+        return f"{_repository(self.ref)}@{self.digest}" if self.digest else self.ref
+
+    @property
+    def key(self) -> str:
+        """What collect_images keys the target by; one ref can run under several digests."""
+        return self.digest or self.ref
+
+
+def placement_file(ns: str, ref: str) -> str:
+    """Report path of one placement, relative to trivy-reports."""
+    return f"{ns}/{sanitize(ref)}.json"
+
+
+def _digest_of(image_id: str) -> Optional[str]:
+    match = _DIGEST_RE.search(image_id or "")
+    return match.group(0) if match else None
+
+
+def collect_images(pods: dict) -> Dict[str, ImageTarget]:
+    """Groups every container image of running pods by digest.
+
+    Images whose digest is not reported yet are keyed by their reference.
+    """
+    targets: Dict[str, ImageTarget] = {}
+    for pod in pods.get("items", []):
+        if pod.get("status", {}).get("phase") != "Running":
+            continue
+        ns = pod.get("metadata", {}).get("namespace", "default")
+        spec = pod.get("spec", {})
+        status = pod.get("status", {})
+        image_ids = {}
+        for key in ("containerStatuses", "initContainerStatuses", "ephemeralContainerStatuses"):
+            for cs in status.get(key) or []:
+                image_ids[cs.get("name")] = cs.get("imageID", "")
+        for key in ("containers", "initContainers", "ephemeralContainers"):
+            for container in spec.get(key) or []:
+                ref = container.get("image")
+                if not ref:
+                    continue
+                digest = _digest_of(image_ids.get(container.get("name"), ""))
+                target = ImageTarget(ref=ref, digest=digest)
+                target = targets.setdefault(target.key, target)
+                target.placements.add((ns, ref))
+    return targets
+
+
+class ImageScanCache:
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, ttl_hours: float = IMAGE_CACHE_TTL_HOURS):
+        self.directory = directory
+        self.ttl_seconds = ttl_hours * 3600
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest.replace(':', '_')}.json")
+
+    def get(self, digest: Optional[str]) -> Optional[str]:
+        if not digest:
+            return None
+        path = self._path(digest)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        if self.ttl_seconds and time.time() - mtime > self.ttl_seconds:
+            return None
+        return path
+
+    def put(self, digest: Optional[str], report_path: str) -> str:
+        if not digest:
+            return report_path
+        path = self._path(digest)
+        os.replace(report_path, path)
+        return path
+
+
+async def _exec(command: list) -> Tuple[int, bytes]:
+    try:
+        process = await processes.spawn(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+    except FileNotFoundError:
+        return 127, f"Command not found: {command[0]}\n".encode()
+    output, _ = await process.communicate()
+    return process.returncode, output
+
+
+def _fan_out(report_path: str, placements: Iterable[Tuple[str, str]], output_dir: str):
+    for ns, ref in placements:
+        ns_dir = os.path.join(output_dir, ns)
+        os.makedirs(ns_dir, exist_ok=True)
+        shutil.copyfile(report_path, os.path.join(ns_dir, f"{sanitize(ref)}.json"))
+
+
+def _unchanged_targets(targets: Dict[str, ImageTarget], recorded: Dict[str, str], output_dir: str) -> Set[str]:
+    # Every placement's report was written from this digest and is still there
+    return {
+        key for key, t in targets.items()
+        if t.digest and all(
+            recorded.get(placement_file(ns, ref)) == t.digest
+            and os.path.exists(os.path.join(output_dir, placement_file(ns, ref)))
+            for ns, ref in t.placements
+        )
+    }
+
+
+def _remove_placements(output_dir: str, files: Iterable[str]):
+    for rel in files:
+        try:
+            os.remove(os.path.join(output_dir, rel))
+        except OSError:
+            pass
+
+
+async def run_image_scan(output_dir: str, emit: Emit, cache: ImageScanCache = None, workers: int = IMAGE_SCAN_WORKERS,
+                         store: Optional[fingerprints.FingerprintStore] = None, incremental: bool = False,
+                         snapshot: Optional[inventory.Snapshot] = None, timing: Optional[dict] = None) -> int:
+    """Scans every unique running image once and writes trivy-reports/<ns>/<image>.json.
+
+    Pods come from the run's inventory snapshot when there is one. Images
+    are scanned as thin clients of the managed trivy server when it is up,
+    standalone otherwise; timing receives the per-image seconds by mode.
+
+    With incremental set, placements whose report was written from the same
+    digest are left as they are, and reports of images no longer running are
+    removed.
+    """
+    cache = cache or ImageScanCache()
+    os.makedirs(output_dir, exist_ok=True)
+
+    if snapshot is not None:
+        await emit(f"Using the cluster inventory taken {time.time() - snapshot.taken_at:.0f}s ago\n")
+        targets = collect_images(snapshot.as_list("pods"))
+    else:
+        await emit("Collecting pod images across all namespaces...\n")
+        ret, raw = await _exec(["kubectl", "get", "pods", "-A", "-o", "json"])
+        if ret != 0:
+            await emit(f"Error: failed to list pods\n{raw.decode('utf-8', errors='replace')}")
+            return 1
+        targets = collect_images(json.loads(raw))
+
+    placements = sum(len(t.placements) for t in targets.values())
+    namespaces = {ns for t in targets.values() for ns, _ in t.placements}
+    unchanged = set()
+    if incremental and store is not None:
+        recorded = await executors.run_io(store.load)
+        unchanged = await executors.run_io(_unchanged_targets, targets, recorded, output_dir)
+        current = {placement_file(ns, ref) for t in targets.values() for ns, ref in t.placements}
+        await executors.run_io(_remove_placements, output_dir, set(recorded) - current)
+    cached = {key: None if key in unchanged else cache.get(t.digest) for key, t in targets.items()}
+    pending = [t for key, t in targets.items() if key not in unchanged and not cached[key]]
+    await emit(
+        f"Found {placements} image references in {len(namespaces)} namespaces, "
+        f"{len(targets)} unique images ({len(unchanged)} unchanged, "
+        f"{len(targets) - len(unchanged) - len(pending)} cached, {len(pending)} to scan)\n"
+    )
+
+    for key, path in cached.items():
+        if path:
+            await executors.run_io(_fan_out, path, targets[key].placements, output_dir)
+
+    with trivy_server.server.lease() as server_url:
+        if pending:
+            await emit(f"Scanning as clients of the trivy server at {server_url}\n" if server_url
+                       else "Scanning with standalone trivy\n")
+        failed = await _scan_pending(pending, output_dir, emit, cache, workers, server_url, timing)
+    if failed is None:
+        return 1
+    if store is not None:
+        # Only reports written from a known digest can be trusted by the next incremental run
+        await executors.run_io(store.save, {
+            placement_file(ns, ref): t.digest
+            for key, t in targets.items() if t.digest and key not in failed
+            for ns, ref in t.placements
+        })
+    # Like the shell script, a single unscannable image does not fail the stage
+    return 0
+
+
+async def _scan_pending(pending: list, output_dir: str, emit: Emit, cache: ImageScanCache, workers: int,
+                        server_url: Optional[str], timing: Optional[dict]) -> Optional[Set[str]]:
+    """Scans the images and fans their reports out; returns the target keys that failed, None if trivy has no DB."""
+    db = {"ready": False}
+    db_lock = asyncio.Lock()
+
+    async def standalone_db() -> bool:
+        # Fetch the DB once so the parallel workers never race on the download
+        async with db_lock:
+            if not db["ready"]:
+                ret, raw = await _exec(["trivy", "image", "--download-db-only", "--quiet"])
+                if ret != 0:
+                    await emit(f"Error: trivy DB download failed\n{raw.decode('utf-8', errors='replace')}")
+                    return False
+                db["ready"] = True
+        return True
+
+    if pending and not server_url and not await standalone_db():
+        return None
+
+    flags = shlex.split(os.getenv("TRIVY_FLAGS", "--format json --quiet"))
+    semaphore = asyncio.Semaphore(max(1, workers))
+    failed: Set[str] = set()
+    durations: Dict[str, list] = {"server": [], "standalone": []}
+
+    async def run_trivy(target: ImageTarget, tmp_path: str) -> Tuple[int, bytes]:
+        if server_url:
+            # Thin client: the server holds the warm DB and the layer cache
+            started = time.monotonic()
+            ret, raw = await _exec(["trivy", "image", *flags, "--server", server_url, "-o", tmp_path,
+                                    target.scan_ref])
+            if ret == 0:
+                durations["server"].append(time.monotonic() - started)
+                return ret, raw
+            if await executors.run_io(trivy_server.healthy, server_url) or not await standalone_db():
+                # The image itself failed, standalone trivy would fail the same way
+                return ret, raw
+            await emit(f"   ! {target.ref}: trivy server unreachable, scanning standalone\n")
+        started = time.monotonic()
+        # The memory cache backend avoids the lock on the shared fs layer cache
+        ret, raw = await _exec(["trivy", "image", *flags, "--skip-db-update", "--cache-backend", "memory",
+                                "-o", tmp_path, target.scan_ref])
+        if ret == 0:
+            durations["standalone"].append(time.monotonic() - started)
+        return ret, raw
+
+    async def scan(target: ImageTarget):
+        async with semaphore:
+            fd, tmp_path = tempfile.mkstemp(suffix=".json", dir=cache.directory)
+            os.close(fd)
+            started = time.monotonic()
+            ret, raw = await run_trivy(target, tmp_path)
+            elapsed = time.monotonic() - started
+            if ret != 0:
+                failed.add(target.key)
+                os.remove(tmp_path)
+                await emit(f"   ✘ {target.ref} scanning failed\n{raw.decode('utf-8', errors='replace')}")
+                return
+            path = cache.put(target.digest, tmp_path)
+            await executors.run_io(_fan_out, path, target.placements, output_dir)
+            if not target.digest:
+                os.remove(path)
+            await emit(f"   ✔ {target.ref} scanned in {elapsed:.1f}s ({len(target.placements)} namespaces)\n")
+
+    await asyncio.gather(*(scan(t) for t in pending))
+    await emit(f"Image scanning finished: {len(pending) - len(failed)} scanned, {len(failed)} failed\n")
+    if any(durations.values()):
+        report = await executors.run_io(trivy_server.server.timings.record, durations)
+        if "saved_per_image_seconds" in report:
+            await emit(f"Per image: {report['server']['per_image_seconds']:.1f}s as a trivy server client, "
+                       f"{report['standalone_per_image_seconds']:.1f}s standalone "
+                       f"({report['saved_per_image_seconds']:.1f}s saved per image)\n")
+        if timing is not None:
+            timing.update(report)
+    return failed
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+from typing import Iterable, Optional, Set
+from models import ScanType
+from services import executors, findings
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+# Seconds between passes over NEW_DIR for artifacts the shell scripts write; 0 disables
+INGEST_WATCH_INTERVAL = float(os.getenv("INGEST_WATCH_INTERVAL", "10"))
+
+# Findings sources produced by each scanner
+SCAN_SOURCES = {
+    ScanType.KYVERNO: ("kyverno",),
+    ScanType.TRIVY_CLUSTER: ("cluster",),
+    ScanType.TRIVY_IMAGE: ("image",),
+    ScanType.TRIVY_SBOM: ("sbom",),
+    ScanType.NMAP: ("nmap",),
+    ScanType.KUBE_BENCH: ("cis",),
+}
+
+_tasks: Set[asyncio.Task] = set()
+_watcher: Optional[asyncio.Task] = None
+
+
+async def ingest(sources: Iterable[str]) -> int:
+    """Brings the findings store up to date for the given sources; returns the artifacts rebuilt."""
+    rebuilt = 0
+    for source in sources:
+        started = time.monotonic()
+        try:
+            count = await executors.run_io(findings.refresh, source)
+        except Exception as e:
+            logger.error(f"Ingesting {source} findings failed: {e}")
+            continue
+        if count:
+            logger.info(f"Ingested {count} {source} artifact(s) in {time.monotonic() - started:.1f}s")
+        rebuilt += count
+    return rebuilt
+
+
+def on_scan_complete(scan_type: ScanType):
+    """Starts ingesting what a scanner just wrote, without holding up the scan."""
+    sources = SCAN_SOURCES.get(scan_type)
+    if not sources:
+        return
+    task = asyncio.create_task(ingest(sources))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _watch(interval: float):
+    while True:
+        # Unchanged files cost a stat each, so a full pass is cheap
+        await ingest(findings.SOURCES)
+        await asyncio.sleep(interval)
+
+
+def start_watcher(interval: float = INGEST_WATCH_INTERVAL):
+    global _watcher
+    if _watcher is not None:
+        return
+    if interval <= 0:
+        # Still index whatever is on disk once
+        _watcher = asyncio.create_task(ingest(findings.SOURCES))
+    else:
+        _watcher = asyncio.create_task(_watch(interval))
+
+
+def stop_watcher():
+    global _watcher
+    if _watcher is not None:
+        _watcher.cancel()
+        _watcher = None
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional
+from services import executors, processes, report_store
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+# Kept out of NEW_DIR, which is served as static files; pod specs can carry credentials in env values
+INVENTORY_DIR = os.getenv("INVENTORY_DIR", "security-dashboard/backend/cache/inventory")
+# A snapshot younger than this is reused by the next scan run and by the API
+INVENTORY_MAX_AGE_SECONDS = float(os.getenv("INVENTORY_MAX_AGE_SECONDS", "60"))
+INVENTORY_PAGE_SIZE = int(os.getenv("INVENTORY_PAGE_SIZE", "500"))
+
+# One paginated list call per kind covers the whole cluster
+KINDS = {
+    "namespaces": "/api/v1/namespaces",
+    "pods": "/api/v1/pods",
+    "services": "/api/v1/services",
+}
+
+# Bookkeeping that no scanner reads, and the bulk of most objects
+LAST_APPLIED = "kubectl.kubernetes.io/last-applied-configuration"
+
+
+class InventoryError(Exception):
+    pass
+
+
+def _strip(obj: dict) -> dict:
+    metadata = obj.get("metadata") or {}
+    metadata.pop("managedFields", None)
+    annotations = metadata.get("annotations")
+    if annotations:
+        annotations.pop(LAST_APPLIED, None)
+    return obj
+
+
+def _parse_page(raw: bytes) -> dict:
+    page = report_store.loads(raw)
+    page["items"] = [_strip(item) for item in page.get("items") or []]
+    return page
+
+
+def _container_images(pod: dict) -> List[str]:
+    spec = pod.get("spec") or {}
+    return [c["image"] for key in ("containers", "initContainers", "ephemeralContainers")
+            for c in spec.get(key) or [] if c.get("image")]
+
+
+class Snapshot:
+    """Namespaces, pods and services of the cluster as listed at one point in time."""
+
+    def __init__(self, objects: Dict[str, List[dict]], taken_at: float, duration: float, calls: int):
+        self.objects = objects
+        self.taken_at = taken_at
+        self.duration = duration
+        self.calls = calls
+        self.directory: Optional[str] = None
+
+    def as_list(self, kind: str) -> dict:
+        # The shape of `kubectl get <kind> -A -o json`, which the scanners already parse
+        return {"apiVersion": "v1", "kind": "List", "items": self.objects[kind]}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "taken_at": self.taken_at,
+            "age_seconds": round(time.time() - self.taken_at, 1),
+            "duration_seconds": round(self.duration, 3),
+            "list_calls": self.calls,
+            "counts": {**{kind: len(items) for kind, items in self.objects.items()},
+                       "images": len({ref for pod in self.objects["pods"] for ref in _container_images(pod)})},
+        }
+
+    def namespaces(self) -> List[dict]:
+        pods: Dict[str, int] = {}
+        services: Dict[str, int] = {}
+        for pod in self.objects["pods"]:
+            ns = pod["metadata"].get("namespace")
+            pods[ns] = pods.get(ns, 0) + 1
+        for svc in self.objects["services"]:
+            ns = svc["metadata"].get("namespace")
+            services[ns] = services.get(ns, 0) + 1
+        return [
+            {
+                "name": ns["metadata"].get("name"),
+                "phase": (ns.get("status") or {}).get("phase"),
+                "pods": pods.get(ns["metadata"].get("name"), 0),
+                "services": services.get(ns["metadata"].get("name"), 0),
+            }
+            for ns in self.objects["namespaces"]
+        ]
+
+    def pods(self, namespace: Optional[str] = None) -> List[dict]:
+        return [
+            {
+                "namespace": pod["metadata"].get("namespace"),
+                "name": pod["metadata"].get("name"),
+                "phase": (pod.get("status") or {}).get("phase"),
+                "node": (pod.get("spec") or {}).get("nodeName"),
+                "images": _container_images(pod),
+            }
+            for pod in self.objects["pods"]
+            if namespace is None or pod["metadata"].get("namespace") == namespace
+        ]
+
+    def images(self, namespace: Optional[str] = None) -> List[dict]:
+        images: Dict[str, dict] = {}
+        for pod in self.objects["pods"]:
+            ns = pod["metadata"].get("namespace")
+            if namespace is not None and ns != namespace:
+                continue
+            for ref in set(_container_images(pod)):
+                entry = images.setdefault(ref, {"image": ref, "pods": 0, "namespaces": set()})
+                entry["pods"] += 1
+                entry["namespaces"].add(ns)
+        return [{**entry, "namespaces": sorted(entry["namespaces"])}
+                for entry in sorted(images.values(), key=lambda e: e["image"])]
+
+    def services(self, namespace: Optional[str] = None) -> List[dict]:
+        return [
+            {
+                "namespace": svc["metadata"].get("namespace"),
+                "name": svc["metadata"].get("name"),
+                "type": (svc.get("spec") or {}).get("type"),
+                "cluster_ip": (svc.get("spec") or {}).get("clusterIP"),
+                "ports": [p.get("port") for p in (svc.get("spec") or {}).get("ports") or []],
+            }
+            for svc in self.objects["services"]
+            if namespace is None or svc["metadata"].get("namespace") == namespace
+        ]
+
+
+def _write_files(snapshot: Snapshot, directory: str):
+    # <kind>.json in kubectl's List shape, for the shell scripts (INVENTORY_DIR)
+    os.makedirs(directory, exist_ok=True)
+    for kind in KINDS:
+        path = os.path.join(directory, f"{kind}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot.as_list(kind), f)
+        os.replace(f"{path}.tmp", path)
+
+
+class ClusterInventory:
+    """One bulk snapshot of the cluster, shared by every scan stage and the API.
+
+    Concurrent callers wait for the same listing rather than each starting
+    their own, so a parallel scan run costs one paginated list per kind.
+    """
+
+    def __init__(self, directory: str = INVENTORY_DIR, page_size: int = INVENTORY_PAGE_SIZE):
+        self.directory = os.path.abspath(directory)
+        self.page_size = page_size
+        self.snapshot: Optional[Snapshot] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _list(self, path: str) -> tuple:
+        items, calls, token = [], 0, ""
+        while True:
+            query = {"limit": self.page_size}
+            if token:
+                query["continue"] = token
+            url = f"{path}?{urllib.parse.urlencode(query)}"
+            try:
+                process = await processes.spawn(
+                    "kubectl", "get", "--raw", url,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+            except FileNotFoundError:
+                raise InventoryError("kubectl not found")
+            raw, err = await process.communicate()
+            calls += 1
+            if process.returncode != 0:
+                raise InventoryError(f"kubectl get --raw {url} failed: {err.decode('utf-8', errors='replace').strip()}")
+            # On a thread, not the process pool: the items are kept in this process, and
+            # unpickling them here would hold the loop's GIL as long as parsing does
+            page = await executors.run_io(_parse_page, raw)
+            items.extend(page["items"])
+            token = (page.get("metadata") or {}).get("continue")
+            if not token:
+                return items, calls
+
+    async def _take(self) -> Snapshot:
+        started = time.monotonic()
+        taken_at = time.time()
+        listed = await asyncio.gather(*(self._list(path) for path in KINDS.values()))
+        snapshot = Snapshot(
+            {kind: items for kind, (items, _) in zip(KINDS, listed)},
+            taken_at, time.monotonic() - started, sum(calls for _, calls in listed),
+        )
+        try:
+            await executors.run_io(_write_files, snapshot, self.directory)
+            snapshot.directory = self.directory
+        except OSError as e:
+            logger.error(f"Failed to write the inventory files: {e}")
+        counts = snapshot.summary()["counts"]
+        logger.info(f"Cluster inventory: {counts['namespaces']} namespaces, {counts['pods']} pods, "
+                    f"{counts['services']} services in {snapshot.calls} list calls, {snapshot.duration:.1f}s")
+        return snapshot
+
+    def fresh(self, max_age: float) -> Optional[Snapshot]:
+        snapshot = self.snapshot
+        if snapshot is not None and time.time() - snapshot.taken_at <= max_age:
+            return snapshot
+        return None
+
+    async def get(self, max_age: float = INVENTORY_MAX_AGE_SECONDS) -> Snapshot:
+        """The current snapshot, listing the cluster again if it is older than max_age seconds."""
+        snapshot = self.fresh(max_age)
+        if snapshot is not None:
+            return snapshot
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Whoever held the lock may just have taken one
+            snapshot = self.fresh(max_age)
+            if snapshot is None:
+                snapshot = self.snapshot = await self._take()
+            return snapshot
+
+
+cluster = ClusterInventory()
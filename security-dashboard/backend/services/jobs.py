@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+from models import ScanRequest, ScanStatus, ScanType
+from services import executors, processes, scanner
+from services.log_buffer import LOG_RETENTION_SECONDS
+from services.scheduler import ALL_STAGES
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+REPORTS_DIR = "security-dashboard/backend/reports"
+JOBS_DB = os.getenv("JOBS_DB", os.path.join(REPORTS_DIR, "jobs.db"))
+# Scan jobs running at once; jobs that share a scanner also wait for each other
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "2"))
+# A job interrupted by a restart this many times is failed instead of resumed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+
+ACTIVE = (ScanStatus.PENDING.value, ScanStatus.RUNNING.value)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    scan_type TEXT,
+    request TEXT,
+    fingerprint TEXT,
+    status TEXT,
+    coalesced_into TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+_lock = threading.Lock()
+_ready = False
+
+
+@contextmanager
+def _connect():
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def init():
+    global _ready
+    if _ready:
+        return
+    os.makedirs(os.path.dirname(JOBS_DB) or ".", exist_ok=True)
+    with _lock, _connect() as conn:
+        if _ready:
+            return
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _ready = True
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["request"] = json.loads(job["request"] or "{}")
+    return job
+
+
+def _insert(job: Dict[str, Any]):
+    init()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, scan_type, request, fingerprint, status, coalesced_into, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job["id"], job["scan_type"], json.dumps(job["request"]), job["fingerprint"],
+             job["status"], job.get("coalesced_into"), job["created_at"]),
+        )
+
+
+def _update(job_id: str, **fields):
+    init()
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    with _connect() as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _mark_started(job_id: str):
+    init()
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                     (ScanStatus.RUNNING.value, _now(), job_id))
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    init()
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def _resumable() -> List[Dict[str, Any]]:
+    """Jobs left queued or running by the previous process, oldest first; fails those out of attempts."""
+    init()
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = 'interrupted too many times', finished_at = ? "
+            "WHERE status = ? AND attempts >= ?",
+            (ScanStatus.FAILED.value, _now(), ScanStatus.RUNNING.value, JOB_MAX_ATTEMPTS),
+        )
+        conn.execute("UPDATE jobs SET status = ? WHERE status = ?", (ScanStatus.PENDING.value, ScanStatus.RUNNING.value))
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE status = ? AND coalesced_into IS NULL ORDER BY created_at",
+            (ScanStatus.PENDING.value,),
+        ).fetchall()
+    return [_row_to_job(r) for r in rows]
+
+
+def fingerprint(request: ScanRequest) -> str:
+    # Everything but the client-chosen id decides whether two requests are the same scan
+    key = json.dumps({"scan_type": request.scan_type.value, "target": request.target,
+                      "parameters": request.parameters or {}}, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _scan_types(request: ScanRequest) -> Set[ScanType]:
+    if request.scan_type == ScanType.ALL:
+        return {s.scan_type for s in ALL_STAGES}
+    return {request.scan_type}
+
+
+class JobManager:
+    """Runs scan requests as persistent jobs on a bounded pool.
+
+    Identical requests made while one is queued or running are coalesced
+    into it, and jobs that would run the same scanner (and so write the same
+    new/ directories) never run side by side.
+    """
+
+    def __init__(self, workers: int = SCAN_WORKERS):
+        self.workers = max(1, workers)
+        self.queue: List[str] = []
+        self.requests: Dict[str, ScanRequest] = {}
+        self.running: Dict[str, asyncio.Task] = {}
+        self.in_flight: Dict[str, str] = {}  # fingerprint -> job id
+        self.stopping = False
+
+    async def start(self):
+        """Re-queues the jobs a previous process left unfinished."""
+        self.stopping = False
+        self.queue, self.requests, self.in_flight = [], {}, {}
+        for job in await executors.run_io(_resumable):
+            request = ScanRequest(**job["request"])
+            self._enqueue(job["id"], request, job["fingerprint"])
+            logger.info(f"Resuming scan job {job['id']} ({job['scan_type']})")
+        self._dispatch()
+
+    async def stop(self):
+        # Running jobs stay "running" in the store, so the next start picks them up again
+        self.stopping = True
+        for job_id, task in list(self.running.items()):
+            task.cancel()
+            await processes.terminate(processes.take(job_id))
+        if self.running:
+            await asyncio.wait(list(self.running.values()))
+
+    def _enqueue(self, job_id: str, request: ScanRequest, fp: str):
+        self.queue.append(job_id)
+        self.requests[job_id] = request
+        self.in_flight[fp] = job_id
+
+    async def submit(self, job_id: str, request: ScanRequest) -> Dict[str, Any]:
+        fp = fingerprint(request)
+        job = {
+            "id": job_id,
+            "scan_type": request.scan_type.value,
+            "request": json.loads(json.dumps(request.dict(), default=str)),
+            "fingerprint": fp,
+            "status": ScanStatus.PENDING.value,
+            "created_at": _now(),
+        }
+        target = self.in_flight.get(fp)
+        if target is not None and target != job_id:
+            job["coalesced_into"] = target
+            scanner.follow(job_id, target)
+            await executors.run_io(_insert, job)
+            logger.info(f"Coalesced scan request {job_id} into running job {target}")
+            return await self.get(job_id)
+
+        # Claimed before the first await so a concurrent identical request coalesces into this one
+        self._enqueue(job_id, request, fp)
+        try:
+            await executors.run_io(_insert, job)
+        except Exception:
+            self._forget(job_id, fp)
+            raise
+        self._dispatch()
+        return await self.get(job_id)
+
+    def _forget(self, job_id: str, fp: str):
+        if job_id in self.queue:
+            self.queue.remove(job_id)
+        self.requests.pop(job_id, None)
+        if self.in_flight.get(fp) == job_id:
+            del self.in_flight[fp]
+
+    def _dispatch(self):
+        if self.stopping:
+            return
+        busy = set()
+        for job_id in self.running:
+            busy |= _scan_types(self.requests[job_id])
+        for job_id in list(self.queue):
+            if len(self.running) >= self.workers:
+                break
+            types = _scan_types(self.requests[job_id])
+            if types & busy:
+                continue
+            busy |= types
+            self.queue.remove(job_id)
+            self.running[job_id] = asyncio.create_task(self._run(job_id))
+
+    async def _run(self, job_id: str):
+        request = self.requests[job_id]
+        status, error = ScanStatus.FAILED, None
+        processes.owner.set(job_id)
+        try:
+            await executors.run_io(_mark_started, job_id)
+            report = await scanner.run_scan_task(job_id, request)
+            failed = any(r.get("status") == ScanStatus.FAILED for r in report.get("results", []))
+            status = ScanStatus.FAILED if failed else ScanStatus.COMPLETED
+        except asyncio.CancelledError:
+            if self.stopping:
+                raise
+            status = ScanStatus.CANCELLED
+            await scanner.abort_scan(job_id, "cancelled")
+        except Exception as e:
+            logger.exception(f"Scan job {job_id} failed")
+            error = str(e)
+            await scanner.abort_scan(job_id, f"failed: {e}")
+        finally:
+            del self.running[job_id]
+            processes.take(job_id)
+            if not self.stopping:
+                self._forget(job_id, fingerprint(request))
+                asyncio.get_running_loop().call_later(LOG_RETENTION_SECONDS, scanner.drop_aliases, job_id)
+                self._dispatch()
+        await executors.run_io(_update, job_id, status=status.value, error=error, finished_at=_now())
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await executors.run_io(get_job, job_id)
+        if job is None:
+            return None
+        if job["coalesced_into"] and job["status"] == ScanStatus.PENDING.value:
+            # A coalesced request reports the state of the job it joined
+            target = await executors.run_io(get_job, job["coalesced_into"])
+            if target is not None:
+                for key in ("status", "started_at", "finished_at", "error"):
+                    job[key] = target[key]
+        if job["id"] in self.queue:
+            job["queue_position"] = self.queue.index(job["id"])
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancels a queued job, or kills a running one's process tree. Returns the job, None if unknown."""
+        job = await self.get(job_id)
+        if job is None or job["status"] not in ACTIVE:
+            return job
+        if job["coalesced_into"] or job_id in self.queue:
+            # Cancelling a coalesced request only detaches it; the job it joined keeps running
+            if job_id in self.queue:
+                self._forget(job_id, job["fingerprint"])
+                await scanner.abort_scan(job_id, "cancelled")
+            await executors.run_io(_update, job_id, status=ScanStatus.CANCELLED.value, finished_at=_now())
+        elif job_id in self.running:
+            # Taken before cancelling, so the job's cleanup cannot drop the list first
+            group = processes.take(job_id)
+            task = self.running[job_id]
+            task.cancel()
+            await processes.terminate(group)
+            await asyncio.wait([task])
+        return await self.get(job_id)
+
+
+manager = JobManager()
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from services import executors, processes
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+KUBE_BENCH_DIR = os.getenv("KUBE_BENCH_DIR", "/opt/kube-bench")
+
+STATUSES = ("PASS", "FAIL", "WARN", "INFO")
+
+Emit = Callable[[str], Awaitable[None]]
+
+
+def parse_server_version(raw: bytes) -> Optional[str]:
+    """"1.28" from `kubectl version -o json`, which is what kube-bench's --version expects."""
+    try:
+        server = json.loads(raw).get("serverVersion") or {}
+    except ValueError:
+        return None
+    m = re.match(r"v?(\d+)\.(\d+)", server.get("gitVersion") or "")
+    if m:
+        return f"{m.group(1)}.{m.group(2)}"
+    major, minor = server.get("major"), re.sub(r"\D", "", server.get("minor") or "")
+    return f"{major}.{minor}" if major and minor else None
+
+
+def controls_of(doc) -> List[dict]:
+    # kube-bench 0.6+ wraps the controls with totals; older releases print the bare list
+    if isinstance(doc, dict):
+        return doc.get("Controls") or []
+    return doc if isinstance(doc, list) else []
+
+
+def tally(results: List[dict]) -> Dict[str, int]:
+    counts = dict.fromkeys(STATUSES, 0)
+    for result in results:
+        status = result.get("status")
+        if status in counts:
+            counts[status] += 1
+    return counts
+
+
+def render_text(controls: List[dict]) -> str:
+    """The console report kube-bench prints without --json, kept as kubebench.txt."""
+    out = []
+    totals = dict.fromkeys(STATUSES, 0)
+    for control in controls:
+        out.append(f"[INFO] {control.get('id', '')} {control.get('text', '')}")
+        results = []
+        for test in control.get("tests") or []:
+            out.append(f"[INFO] {test.get('section', '')} {test.get('desc', '')}")
+            for result in test.get("results") or []:
+                out.append(f"[{result.get('status', 'INFO')}] {result.get('test_number', '')} {result.get('test_desc', '')}")
+                results.append(result)
+        out.append("")
+        out.append(f"== Remediations {control.get('node_type', '')} ==")
+        for result in results:
+            if result.get("status") in ("FAIL", "WARN"):
+                out.append(f"{result.get('test_number', '')} {result.get('remediation', '')}")
+                out.append("")
+        counts = tally(results)
+        out.append("")
+        out.append(f"== Summary {control.get('node_type', '')} ==")
+        for status in STATUSES:
+            out.append(f"{counts[status]} checks {status}")
+            totals[status] += counts[status]
+        out.append("")
+    out.append("== Summary total ==")
+    for status in STATUSES:
+        out.append(f"{totals[status]} checks {status}")
+    out.append("")
+    return "\n".join(out)
+
+
+def _write_outputs(output_dir: str, doc, text: str):
+    # kubebench.txt stays for anything still reading the console format
+    for name, content in (("kubebench.json", json.dumps(doc, indent=2)), ("kubebench.txt", text)):
+        tmp_path = os.path.join(output_dir, f"{name}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, os.path.join(output_dir, name))
+
+
+async def run_kube_bench(output_dir: str, emit: Emit, bench_dir: str = KUBE_BENCH_DIR) -> int:
+    """Runs kube-bench with --json and writes kubebench.json plus the text report."""
+    os.makedirs(output_dir, exist_ok=True)
+    binary = os.path.join(bench_dir, "kube-bench")
+    if not os.path.exists(binary):
+        await emit(f"Error: kube-bench not found at {binary}\n")
+        return 1
+
+    version = None
+    try:
+        process = await processes.spawn("kubectl", "version", "-o", "json",
+                                        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        raw, _ = await process.communicate()
+        version = parse_server_version(raw)
+    except FileNotFoundError:
+        pass
+    await emit(f"Kubernetes server version: {version or 'unknown, letting kube-bench detect it'}\n")
+
+    command = [binary, "--config-dir", os.path.join(bench_dir, "cfg"),
+               "--config", os.path.join(bench_dir, "cfg", "config.yaml"), "--json"]
+    if version:
+        command += ["--version", version]
+    await emit("Running kube-bench checks...\n")
+    started = time.monotonic()
+    process = await processes.spawn(*command, cwd=bench_dir,
+                                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+
+    async def relay_stderr():
+        # kube-bench logs what it is doing on stderr; the JSON report comes on stdout
+        async for line in process.stderr:
+            await emit(f"  {line.decode('utf-8', errors='replace')}")
+
+    raw, _ = await asyncio.gather(process.stdout.read(), relay_stderr())
+    await process.wait()
+
+    try:
+        doc = json.loads(raw)
+    except ValueError:
+        await emit(f"Error: kube-bench exited with {process.returncode} without a JSON report\n")
+        await emit(raw.decode("utf-8", errors="replace"))
+        return 1
+    controls = controls_of(doc)
+    await emit(f"kube-bench finished in {time.monotonic() - started:.1f}s\n")
+    for control in controls:
+        counts = tally([r for t in control.get("tests") or [] for r in t.get("results") or []])
+        summary = ", ".join(f"{n} {s.lower()}" for s, n in counts.items())
+        await emit(f"  • {control.get('id', '')} {control.get('text', '')}: {summary}\n")
+
+    text = render_text(controls)
+    await executors.run_io(_write_outputs, output_dir, doc, text)
+    # Same console output as the script, which the report summary counts are read from
+    await emit(text)
+    await emit(f"kube-bench report saved to: {os.path.join(output_dir, 'kubebench.json')}\n")
+    return 0
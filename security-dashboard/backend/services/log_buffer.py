@@ -0,0 +1,168 @@
+import asyncio
+import codecs
+import os
+import shutil
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+from services import executors
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+LOG_SPILL_DIR = os.getenv("LOG_SPILL_DIR", "security-dashboard/backend/logs")
+# Recent output kept in memory per buffer; everything older is read back from the spill file
+LOG_BUFFER_MAX_BYTES = int(os.getenv("LOG_BUFFER_MAX_BYTES", str(2 * 1024 * 1024)))
+# How long a finished scan's stream stays replayable
+LOG_RETENTION_SECONDS = int(os.getenv("LOG_RETENTION_SECONDS", "900"))
+REPLAY_CHUNK_BYTES = 64 * 1024
+# Appended output is written out in batches of this size on the IO executor, never on the event loop
+LOG_WRITE_BATCH_BYTES = int(os.getenv("LOG_WRITE_BATCH_BYTES", str(64 * 1024)))
+
+
+class LogBuffer:
+    """Append-only log with a bounded in-memory tail and the full history on disk.
+
+    Chunks are addressed by their byte offset in the log, which doubles as
+    the sequence number clients resume from. Writes to disk happen in
+    batches on the IO executor; a chunk stays in the tail until it is written.
+    """
+
+    def __init__(self, path: str, max_memory_bytes: int = LOG_BUFFER_MAX_BYTES):
+        self.path = path
+        self.max_memory_bytes = max_memory_bytes
+        self.tail: deque = deque()  # (offset, bytes)
+        self.tail_bytes = 0
+        self.end = 0
+        # Bytes of the log that are on disk
+        self.written = 0
+        self.closed = False
+        self.finished_at: Optional[float] = None
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._writer: Optional[asyncio.Task] = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "wb")
+
+    def append(self, text: str) -> int:
+        """Stores a chunk and returns its sequence number."""
+        data = text.encode("utf-8")
+        seq = self.end
+        self.end += len(data)
+        self.tail.append((seq, data))
+        self.tail_bytes += len(data)
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= LOG_WRITE_BATCH_BYTES:
+            self._start_writer()
+        self._trim()
+        return seq
+
+    def _trim(self):
+        # Only chunks already on disk can leave memory
+        while self.tail_bytes > self.max_memory_bytes and (len(self.tail) > 1 or not self.max_memory_bytes):
+            seq, data = self.tail[0]
+            if seq + len(data) > self.written:
+                break
+            self.tail.popleft()
+            self.tail_bytes -= len(data)
+
+    def _start_writer(self):
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_pending())
+
+    async def _write_pending(self):
+        # Chunks appended while a batch is being written go out with the next one
+        while self._pending:
+            data = b"".join(self._pending)
+            self._pending = []
+            self._pending_bytes = 0
+            await executors.run_io(self._write, data)
+            self.written += len(data)
+            self._trim()
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._file.flush()
+
+    async def flush(self):
+        """Waits until everything appended so far is on disk."""
+        if self._pending:
+            self._start_writer()
+        if self._writer is not None:
+            # A cancelled caller must not cut a write short
+            await asyncio.shield(self._writer)
+
+    async def close(self):
+        if not self.closed:
+            await self.flush()
+        if not self.closed:
+            self.closed = True
+            self.finished_at = time.monotonic()
+            self._file.close()
+
+    def _read_disk(self, start: int, end: int) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    async def iter_range(self, start: int = 0, end: Optional[int] = None) -> AsyncIterator[str]:
+        """Yields the log between two offsets, from memory when possible."""
+        end = self.end if end is None else min(end, self.end)
+        # Chunks are cut on byte offsets, so a character can straddle two of them
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while start < end:
+            # The tail can drop chunks while a disk read is awaited, so where it starts is looked up every time
+            memory_start = self.tail[0][0] if self.tail else self.end
+            if start < memory_start:
+                stop = min(start + REPLAY_CHUNK_BYTES, end, memory_start)
+                data = await executors.run_io(self._read_disk, start, stop)
+            else:
+                data = b"".join(data[max(0, start - seq):end - seq] for seq, data in list(self.tail)
+                                if seq + len(data) > start and seq < end)
+                stop = start + len(data)
+            if not data:
+                break
+            text = decoder.decode(data)
+            if text:
+                yield text
+            start = stop
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+
+class ScanLogs:
+    """Registry of the live stream buffer of each scan plus per-stage output buffers."""
+
+    def __init__(self, directory: str = LOG_SPILL_DIR, retention_seconds: int = LOG_RETENTION_SECONDS):
+        self.directory = directory
+        self.retention_seconds = retention_seconds
+        self.streams: Dict[str, LogBuffer] = {}
+
+    def _scan_dir(self, scan_id: str) -> str:
+        return os.path.join(self.directory, os.path.basename(scan_id))
+
+    def stream(self, scan_id: str) -> LogBuffer:
+        self._expire()
+        if scan_id not in self.streams or self.streams[scan_id].closed:
+            self.streams[scan_id] = LogBuffer(os.path.join(self._scan_dir(scan_id), "stream.log"))
+        return self.streams[scan_id]
+
+    def get(self, scan_id: str) -> Optional[LogBuffer]:
+        return self.streams.get(scan_id)
+
+    def stage(self, scan_id: str, stage: str) -> LogBuffer:
+        # Stage output is only copied into the report from disk, so keep nothing in memory past the write
+        return LogBuffer(os.path.join(self._scan_dir(scan_id), f"{stage}.log"), max_memory_bytes=0)
+
+    async def close(self, scan_id: str):
+        if scan_id in self.streams:
+            await self.streams[scan_id].close()
+
+    def _expire(self):
+        now = time.monotonic()
+        for scan_id, buf in list(self.streams.items()):
+            if buf.closed and now - buf.finished_at > self.retention_seconds:
+                del self.streams[scan_id]
+                shutil.rmtree(self._scan_dir(scan_id), ignore_errors=True)
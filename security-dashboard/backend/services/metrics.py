@@ -0,0 +1,388 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# How often the /proc sampler reads the CPU time and RSS of running scan subprocesses
+METRICS_SAMPLE_INTERVAL = float(os.getenv("METRICS_SAMPLE_INTERVAL", "0.5"))
+# Spans kept per scan; an image sweep starts one subprocess per image
+METRICS_MAX_SPANS = int(os.getenv("METRICS_MAX_SPANS", "20000"))
+# Enables /api/metrics/profile, which profiles the backend's own event loop on demand
+METRICS_PROFILING = os.getenv("METRICS_PROFILING", "0") == "1"
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600, 7200)
+
+# Stage the current task works for, next to processes.owner's scan id
+stage: ContextVar[Optional[str]] = ContextVar("scan_stage", default=None)
+
+LabelValues = Tuple[str, ...]
+
+
+def _number(value: float) -> str:
+    # Byte counters run past what %g prints exactly
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[LabelValues, float] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format(self, key: LabelValues, extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._format(key)} {_number(value)}" for key, value in sorted(self.values.items())]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    def set_max(self, value: float, **labels):
+        key = self._key(labels)
+        self.values[key] = max(self.values.get(key, value), value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = SECONDS_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self.counts: Dict[LabelValues, List[int]] = {}
+        self.sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts = self.counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self.sums[key] = self.sums.get(key, 0.0) + value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, counts in sorted(self.counts.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{self._format(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format(key)} {_number(self.sums[key])}")
+            lines.append(f"{self.name}_count{self._format(key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+stage_seconds = Histogram("scan_stage_duration_seconds", "Wall time of scan stages.", ("scan_type", "status"))
+subprocesses = Counter("scan_subprocesses_total", "Subprocesses started by scans, by exit outcome.", ("command", "outcome"))
+subprocess_seconds = Histogram("scan_subprocess_wall_seconds", "Wall time of subprocesses.", ("command",))
+subprocess_cpu = Counter("scan_subprocess_cpu_seconds_total",
+                         "CPU time of subprocesses and their children, sampled from /proc.", ("command",))
+subprocess_rss = Gauge("scan_subprocess_peak_rss_bytes",
+                       "Largest resident set of any one subprocess group, sampled from /proc.", ("command",))
+subprocess_output = Counter("scan_subprocess_output_bytes_total", "Bytes subprocesses wrote to their pipes.", ("command",))
+subprocesses_running = Gauge("scan_subprocesses_running", "Subprocesses currently running.")
+executor_seconds = Histogram("executor_task_seconds",
+                             "Time from submitting blocking work to its result, including queueing; "
+                             "report_store.* is the report I/O latency.", ("pool", "func"))
+loop_lag = Gauge("event_loop_lag_seconds", "Event loop wake-up lag over the recent samples.", ("stat",))
+websocket_queue = Gauge("websocket_queue_bytes", "Log bytes queued for WebSocket viewers, not yet sent.")
+websocket_subscribers = Gauge("websocket_subscribers", "Connected WebSocket viewers.")
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    subprocesses_running.set(sampler.running())
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# --- Spans ----------------------------------------------------------------
+
+# Scan id -> spans, oldest scans dropped first; a cancelled scan never takes its own
+_spans: "OrderedDict[str, List[dict]]" = OrderedDict()
+MAX_SCANS = 50
+
+
+def add_span(scan_id: Optional[str], span: Dict[str, Any]):
+    if scan_id is None:
+        return
+    spans = _spans.get(scan_id)
+    if spans is None:
+        spans = _spans[scan_id] = []
+        while len(_spans) > MAX_SCANS:
+            _spans.popitem(last=False)
+    if len(spans) < METRICS_MAX_SPANS:
+        spans.append(span)
+
+
+def take_spans(scan_id: str) -> List[dict]:
+    return sorted(_spans.pop(scan_id, []), key=lambda s: s["start"])
+
+
+@contextmanager
+def span(scan_id: Optional[str], name: str, **attrs):
+    """Records a timing span of the block against a scan; attrs set on the yielded dict are kept."""
+    record = {"name": name, "start": round(time.time(), 3), **attrs}
+    started = time.monotonic()
+    try:
+        yield record
+    finally:
+        record["seconds"] = round(time.monotonic() - started, 3)
+        add_span(scan_id, record)
+
+
+def summarize(spans: List[dict]) -> Dict[str, Dict[str, Any]]:
+    """Subprocess totals per stage: count, wall and CPU seconds, peak RSS, output bytes."""
+    stages: Dict[str, Dict[str, Any]] = {}
+    for s in spans:
+        if s["name"] != "subprocess":
+            continue
+        entry = stages.setdefault(s.get("stage") or "", {
+            "subprocesses": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_bytes": 0, "output_bytes": 0})
+        entry["subprocesses"] += 1
+        entry["wall_seconds"] = round(entry["wall_seconds"] + s["seconds"], 3)
+        entry["cpu_seconds"] = round(entry["cpu_seconds"] + (s.get("cpu_seconds") or 0), 3)
+        entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"], s.get("peak_rss_bytes") or 0)
+        entry["output_bytes"] += s.get("output_bytes") or 0
+    return stages
+
+
+# --- Subprocesses ---------------------------------------------------------
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_WRAPPERS = {"bash", "sh", "python", "python3"}
+
+
+def command_label(command: Sequence[str]) -> str:
+    # "trivy image", "kubectl get", "bash 6_run_kyverno.sh", "nmap": enough to tell stages apart, few label values
+    exe = os.path.basename(str(command[0])) if command else ""
+    if len(command) < 2 or str(command[1]).startswith("-"):
+        return exe
+    return f"{exe} {os.path.basename(str(command[1])) if exe in _WRAPPERS else command[1]}"
+
+
+def _read_groups(pgids) -> Dict[int, Tuple[float, int]]:
+    """CPU seconds and RSS bytes summed over the live members of each process group."""
+    totals = {pgid: [0.0, 0] for pgid in pgids}
+    try:
+        pids = [p for p in os.listdir("/proc") if p.isdigit()]
+    except OSError:
+        return {}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        fields = stat[stat.rfind(b")") + 2:].split()
+        pgid = int(fields[2])
+        if pgid not in totals:
+            continue
+        # utime + stime, plus cutime + cstime of the children the member already reaped
+        totals[pgid][0] += sum(int(v) for v in fields[11:15]) / _CLK_TCK
+        totals[pgid][1] += int(fields[21]) * _PAGE_SIZE
+    return {pgid: (cpu, rss) for pgid, (cpu, rss) in totals.items()}
+
+
+class _Tracked:
+    def __init__(self, command: Sequence[str], scan_id: Optional[str], stage_name: Optional[str]):
+        self.label = command_label(command)
+        self.scan_id = scan_id
+        self.stage = stage_name
+        self.start = time.time()
+        self.started = time.monotonic()
+        self.cpu = 0.0
+        self.rss = 0
+        self.output = 0
+
+
+class ProcessSampler:
+    """Follows the process group of each spawned subprocess until it exits.
+
+    asyncio's child watcher reaps the processes itself, so their rusage is
+    never seen here; a thread instead reads /proc every interval. CPU time
+    is the last reading, so up to one interval of it can be missed.
+    """
+
+    def __init__(self, interval: float = METRICS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.groups: Dict[int, _Tracked] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tasks = set()
+        self.enabled = os.path.isdir("/proc")
+
+    def running(self) -> int:
+        return len(self.groups)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                groups = dict(self.groups)
+                if not groups:
+                    self._wake.clear()
+                    continue
+            for pgid, (cpu, rss) in _read_groups(groups).items():
+                tracked = groups[pgid]
+                # A group whose members all exited reads as zero; keep what was seen
+                tracked.cpu = max(tracked.cpu, cpu)
+                tracked.rss = max(tracked.rss, rss)
+            time.sleep(self.interval)
+
+    def track(self, process: asyncio.subprocess.Process, command: Sequence[str], scan_id: Optional[str]):
+        tracked = _Tracked(command, scan_id, stage.get())
+        # Counted as the pipe delivers it, whoever reads it
+        for reader in (process.stdout, process.stderr):
+            if reader is not None:
+                feed = reader.feed_data
+
+                def counting_feed(data, feed=feed):
+                    tracked.output += len(data)
+                    feed(data)
+
+                reader.feed_data = counting_feed
+        if self.enabled:
+            with self._lock:
+                # spawn starts every subprocess in a new session, so its pid is the group id
+                self.groups[process.pid] = tracked
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+        task = asyncio.create_task(self._finish(process, tracked))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _finish(self, process: asyncio.subprocess.Process, tracked: _Tracked):
+        await process.wait()
+        with self._lock:
+            self.groups.pop(process.pid, None)
+        seconds = time.monotonic() - tracked.started
+        label = tracked.label
+        subprocesses.inc(command=label, outcome="ok" if process.returncode == 0 else "failed")
+        subprocess_seconds.observe(seconds, command=label)
+        subprocess_cpu.inc(tracked.cpu, command=label)
+        subprocess_rss.set_max(tracked.rss, command=label)
+        subprocess_output.inc(tracked.output, command=label)
+        add_span(tracked.scan_id, {
+            "name": "subprocess",
+            "command": label,
+            "stage": tracked.stage,
+            "start": round(tracked.start, 3),
+            "seconds": round(seconds, 3),
+            "exit_code": process.returncode,
+            "cpu_seconds": round(tracked.cpu, 3) if self.enabled else None,
+            "peak_rss_bytes": tracked.rss if self.enabled else None,
+            "output_bytes": tracked.output,
+        })
+
+
+sampler = ProcessSampler()
+
+
+@contextmanager
+def executor_timer(pool: str, func):
+    func = getattr(func, "func", func)  # functools.partial
+    name = f"{getattr(func, '__module__', '') or ''}.{getattr(func, '__qualname__', type(func).__name__)}"
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        executor_seconds.observe(time.monotonic() - started, pool=pool, func=name.replace("services.", "", 1).lstrip("."))
+
+
+# --- Profiling ------------------------------------------------------------
+
+_profiling = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+async def profile_loop(seconds: float, sort: str = "cumulative", limit: int = 50) -> str:
+    """cProfile of everything the event loop thread runs for the given seconds, as pstats text."""
+    if not _profiling.acquire(blocking=False):
+        raise ProfilerBusy()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        await asyncio.sleep(seconds)
+        profiler.disable()
+    finally:
+        _profiling.release()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def sample_stacks(seconds: float, interval: float = 0.01) -> str:
+    """py-spy style: the stack of every thread read every interval, in collapsed (flamegraph) form.
+
+    Blocking; run it on a worker thread.
+    """
+    if not _profiling.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks: Dict[str, int] = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                key = ";".join([names.get(ident, str(ident))] + parts[::-1])
+                stacks[key] = stacks.get(key, 0) + 1
+            time.sleep(interval)
+    finally:
+        _profiling.release()
+    return "".join(f"{stack} {n}\n" for stack, n in sorted(stacks.items(), key=lambda kv: -kv[1]))
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+from services import executors, fingerprints, inventory, processes
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+NMAP_SCAN_WORKERS = int(os.getenv("NMAP_SCAN_WORKERS", "8"))
+# Same per-host limits as scripts/nmap_scan_from_pod.sh
+NMAP_HOST_TIMEOUT = os.getenv("NMAP_HOST_TIMEOUT", "25s")
+NMAP_MAX_RETRIES = os.getenv("NMAP_MAX_RETRIES", "1")
+
+# Legacy cipher patterns, matched the way the script's jq filter did
+WEAK_CIPHER_RE = re.compile(r"cbc|rc4|3des|des|null|export|md5", re.IGNORECASE)
+
+Emit = Callable[[str], Awaitable[None]]
+
+
+class NmapError(Exception):
+    pass
+
+
+@dataclass
+class ServiceTarget:
+    namespace: str
+    fqdn: str
+    port: int
+    spec_hash: str = ""
+
+    @property
+    def key(self) -> str:
+        return f"{self.namespace}/{self.fqdn}:{self.port}"
+
+
+def select_port(ports: List[int]) -> int:
+    # 443 if exposed, else the first port, else 443
+    if 443 in ports:
+        return 443
+    return ports[0] if ports else 443
+
+
+def collect_services(services: dict) -> List[ServiceTarget]:
+    targets = []
+    for svc in services.get("items", []):
+        meta = svc.get("metadata", {})
+        ns, name = meta.get("namespace", "default"), meta.get("name")
+        ports = [p["port"] for p in svc.get("spec", {}).get("ports") or [] if "port" in p]
+        targets.append(ServiceTarget(ns, f"{name}.{ns}.svc.cluster.local", select_port(ports),
+                                     fingerprints.content_hash(svc.get("spec"))))
+    return targets
+
+
+def parse_ciphers(xml_text: str) -> List[str]:
+    """Accepted ciphers from ssl-enum-ciphers XML, in the script's text form.
+
+    Each entry reads like the nmap console line the script grepped,
+    e.g. "TLS_RSA_WITH_AES_128_CBC_SHA (rsa 2048) - A".
+    """
+    try:
+        root = ET.fromstring(xml_text)
+    except ET.ParseError:
+        return []
+    ciphers = []
+    for script in root.iter("script"):
+        if script.get("id") != "ssl-enum-ciphers":
+            continue
+        for table in script.iter("table"):
+            if table.get("key") != "ciphers":
+                continue
+            for cipher in table.findall("table"):
+                elems = {e.get("key"): (e.text or "") for e in cipher.findall("elem")}
+                name = elems.get("name", "")
+                if not name.startswith("TLS_"):
+                    continue
+                line = name
+                if elems.get("kex_info"):
+                    line += f" ({elems['kex_info']})"
+                if elems.get("strength"):
+                    line += f" - {elems['strength']}"
+                ciphers.append(line)
+    return ciphers
+
+
+def host_up(xml_text: str) -> bool:
+    """Whether nmap reached the host: a <host> with status "up" that did not hit the host timeout."""
+    try:
+        root = ET.fromstring(xml_text)
+    except ET.ParseError:
+        return False
+    for host in root.iter("host"):
+        status = host.find("status")
+        if status is not None and status.get("state") == "up" and host.get("timedout") != "true":
+            return True
+    return False
+
+
+def classify(target: ServiceTarget, ciphers: List[str]) -> dict:
+    weak = [c for c in ciphers if WEAK_CIPHER_RE.search(c)]
+    safe = [c for c in ciphers if not WEAK_CIPHER_RE.search(c)]
+    return {
+        "namespace": target.namespace,
+        "fqdn": target.fqdn,
+        "port": target.port,
+        "accepted_ciphers": ciphers,
+        "weak_ciphers": weak,
+        "safe_ciphers": safe,
+    }
+
+
+def _previous_entries(output_dir: str) -> Dict[str, dict]:
+    try:
+        with open(os.path.join(output_dir, "nmap.json")) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {f"{e.get('namespace')}/{e.get('fqdn')}:{e.get('port')}": e for e in entries if isinstance(e, dict)}
+
+
+def _write_outputs(output_dir: str, targets: List[ServiceTarget], entries: List[dict]):
+    # k8s-services.txt is kept for anyone running the shell scripts against it
+    with open(os.path.join(output_dir, "k8s-services.txt"), "w") as f:
+        for t in targets:
+            f.write(f"{t.namespace}\t{t.fqdn}\t{t.port}\n")
+    tmp_path = os.path.join(output_dir, "nmap.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, "nmap.json"))
+
+
+async def _scan_target(target: ServiceTarget, emit: Emit) -> List[str]:
+    fd, xml_path = tempfile.mkstemp(suffix=".xml")
+    os.close(fd)
+    label = f"{target.fqdn}:{target.port}"
+    command = ["nmap", "-sV", "--script", "ssl-enum-ciphers", "-p", str(target.port), target.fqdn,
+               "--host-timeout", NMAP_HOST_TIMEOUT, "--max-retries", NMAP_MAX_RETRIES, "-oX", xml_path]
+    try:
+        process = await processes.spawn(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        # Hosts run side by side, so each console line carries its target
+        async for line in process.stdout:
+            await emit(f"{label} | {line.decode('utf-8', errors='replace')}")
+        await process.wait()
+        with open(xml_path, encoding="utf-8", errors="replace") as f:
+            xml_text = f.read()
+    finally:
+        os.remove(xml_path)
+    if process.returncode != 0:
+        raise NmapError(f"nmap exited with status {process.returncode}")
+    if not host_up(xml_text):
+        raise NmapError("host is down or timed out")
+    return parse_ciphers(xml_text)
+
+
+async def run_nmap_scan(output_dir: str, emit: Emit, workers: int = NMAP_SCAN_WORKERS,
+                        store: Optional[fingerprints.FingerprintStore] = None, incremental: bool = False,
+                        snapshot: Optional[inventory.Snapshot] = None) -> int:
+    """TLS-scans every cluster service with a bounded pool of nmap processes and writes nmap.json.
+
+    Services come from the run's inventory snapshot when there is one.
+
+    With incremental set, services whose spec hash matches the one recorded
+    in the fingerprint store keep their previous entry and are not scanned.
+    Returns nonzero when every host that was scanned failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if not shutil.which("nmap"):
+        await emit("Error: nmap not found. Install nmap and retry.\n")
+        return 1
+
+    if snapshot is not None:
+        await emit(f"Using the cluster inventory taken {time.time() - snapshot.taken_at:.0f}s ago\n")
+        targets = collect_services(snapshot.as_list("services"))
+    else:
+        await emit("Discovering cluster services...\n")
+        process = await processes.spawn(
+            "kubectl", "get", "svc", "-A", "-o", "json",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        raw, _ = await process.communicate()
+        if process.returncode != 0:
+            await emit(f"Error: failed to list services\n{raw.decode('utf-8', errors='replace')}")
+            return 1
+        targets = collect_services(json.loads(raw))
+    entries: List[dict] = [None] * len(targets)
+
+    if incremental and store is not None:
+        recorded = await executors.run_io(store.load)
+        previous = await executors.run_io(_previous_entries, output_dir)
+        for i, target in enumerate(targets):
+            entry = previous.get(target.key)
+            if entry is not None and recorded.get(target.key) == target.spec_hash:
+                # Reclassified so a changed weak-cipher pattern still applies
+                entries[i] = classify(target, entry.get("accepted_ciphers") or [])
+    pending = [i for i, entry in enumerate(entries) if entry is None]
+    await emit(f"Found {len(targets)} services ({len(targets) - len(pending)} unchanged since the last scan), "
+               f"scanning {len(pending)} with up to {workers} concurrent nmap processes\n")
+
+    semaphore = asyncio.Semaphore(max(1, workers))
+    failed = set()
+
+    async def scan(i: int, target: ServiceTarget):
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                ciphers = await _scan_target(target, emit)
+            # A nonzero exit or no reachable host counts as failed, not as a host without TLS
+            except Exception as e:
+                # Unreachable hosts end up with an empty list, as in the script
+                entries[i] = classify(target, [])
+                failed.add(target.key)
+                await emit(f"   ✘ {target.fqdn}:{target.port} scanning failed: {e}\n")
+            else:
+                entries[i] = classify(target, ciphers)
+                weak = len(entries[i]["weak_ciphers"])
+                await emit(f"   ✔ Finished: {target.fqdn}:{target.port} in {time.monotonic() - started:.1f}s "
+                           f"({len(ciphers)} ciphers, {weak} weak)\n")
+
+    await asyncio.gather(*(scan(i, targets[i]) for i in pending))
+    await executors.run_io(_write_outputs, output_dir, targets, entries)
+    if store is not None:
+        # Failed hosts are left out so the next incremental run tries them again
+        await executors.run_io(store.save, {t.key: t.spec_hash for t in targets if t.key not in failed})
+    await emit(f"Nmap report saved to: {os.path.join(output_dir, 'nmap.json')}\n")
+    if pending and len(failed) == len(pending):
+        # Not one host answered: nmap itself is most likely broken, not the services
+        await emit(f"Error: all {len(pending)} nmap scans failed\n")
+        return 1
+    return 0
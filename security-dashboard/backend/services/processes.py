@@ -0,0 +1,63 @@
+import asyncio
+import os
+import signal
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from services import metrics
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+# Seconds a cancelled scan's processes get between SIGTERM and SIGKILL
+KILL_GRACE_SECONDS = float(os.getenv("KILL_GRACE_SECONDS", "5"))
+
+# Scan the current task works for; tasks started from it (stages, per-image workers) inherit it
+owner: ContextVar[Optional[str]] = ContextVar("scan_owner", default=None)
+
+_groups: Dict[str, List[asyncio.subprocess.Process]] = {}
+
+
+async def spawn(*command: str, **kwargs) -> asyncio.subprocess.Process:
+    """create_subprocess_exec in a new process group, recorded against the current scan.
+
+    The group is what lets a cancelled scan take down everything its shell
+    scripts started, not just the bash at the top.
+    """
+    process = await asyncio.create_subprocess_exec(*command, start_new_session=True, **kwargs)
+    scan_id = owner.get()
+    # Wall and CPU time, peak RSS and output bytes, as metrics and as a span of the scan
+    metrics.sampler.track(process, command, scan_id)
+    if scan_id is not None:
+        group = _groups.setdefault(scan_id, [])
+        group[:] = [p for p in group if p.returncode is None]
+        group.append(process)
+    return process
+
+
+def take(scan_id: str) -> List[asyncio.subprocess.Process]:
+    """Forgets and returns the processes started for a scan."""
+    return _groups.pop(scan_id, [])
+
+
+def _signal(process: asyncio.subprocess.Process, sig: int):
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def terminate(group: List[asyncio.subprocess.Process], grace: float = KILL_GRACE_SECONDS):
+    """SIGTERMs each process group, then SIGKILLs whatever is still around after the grace period."""
+    alive = [p for p in group if p.returncode is None]
+    for process in alive:
+        _signal(process, signal.SIGTERM)
+    if not alive:
+        return
+    _, pending = await asyncio.wait([asyncio.create_task(p.wait()) for p in alive], timeout=grace)
+    for task in pending:
+        task.cancel()
+    for process in alive:
+        # The leader may be gone while its children still run, so signal the group regardless
+        _signal(process, signal.SIGKILL)
+    if pending:
+        logger.warning(f"Killed {len(pending)} process group(s) that ignored SIGTERM")
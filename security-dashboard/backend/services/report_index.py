@@ -0,0 +1,287 @@
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from services import report_store
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+REPORTS_DIR = "security-dashboard/backend/reports"
+INDEX_DB = os.getenv("REPORT_INDEX_DB", os.path.join(REPORTS_DIR, "index.db"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    scan_type TEXT,
+    status TEXT,
+    timestamp TEXT,
+    wall_seconds REAL,
+    stages TEXT,
+    findings TEXT
+);
+CREATE INDEX IF NOT EXISTS reports_ts ON reports (timestamp DESC);
+CREATE INDEX IF NOT EXISTS reports_type_ts ON reports (scan_type, timestamp DESC);
+CREATE INDEX IF NOT EXISTS reports_status_ts ON reports (status, timestamp DESC);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS aggregates (
+    report_id TEXT,
+    source TEXT,
+    dimension TEXT,
+    key TEXT,
+    n INTEGER,
+    PRIMARY KEY (report_id, source, dimension, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS aggregates_key ON aggregates (source, dimension, key);
+CREATE TABLE IF NOT EXISTS finding_sets (
+    report_id TEXT,
+    source TEXT,
+    items BLOB,
+    PRIMARY KEY (report_id, source)
+);
+"""
+
+# Summary lines printed by kyverno_yaml_to_json_dedup.py and kube-bench
+_SUMMARY_RES = {
+    "kyverno": re.compile(r"\s*(?P<status>PASS|FAIL|WARN|ERROR|SKIP):\s+(?P<n>\d+)\s*$"),
+    "kube-bench": re.compile(r"(?P<n>\d+) checks (?P<status>PASS|FAIL|WARN|INFO)\s*$"),
+}
+
+_lock = threading.Lock()
+_ready = False
+
+
+@contextmanager
+def _connect():
+    conn = sqlite3.connect(INDEX_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def count_findings(scan_type: str, lines: Iterable[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    pattern = _SUMMARY_RES.get(scan_type)
+    if pattern is None:
+        return counts
+    # kube-bench prints a summary per section and a "total" one last, so later lines win
+    for line in lines:
+        match = pattern.match(line)
+        if match:
+            counts[match["status"].lower()] = int(match["n"])
+    return counts
+
+
+def _output_lines(result: dict) -> Iterator[str]:
+    # Reports being saved point at their stage log file instead of holding it
+    if result.get("output_path"):
+        with open(result["output_path"], encoding="utf-8", errors="replace") as f:
+            yield from f
+    else:
+        yield from (result.get("output") or "").splitlines()
+
+
+def _plain(value):
+    # Live reports still hold ScanType/ScanStatus members, reports loaded from disk hold strings
+    return getattr(value, "value", value)
+
+
+def summarize(report: dict) -> Dict[str, Any]:
+    results = report.get("results") or []
+    stages = {}
+    findings = {}
+    for res in results:
+        scan_type = _plain(res.get("scan_type", ""))
+        stages[scan_type] = {"status": _plain(res.get("status")), "wall_seconds": res.get("wall_seconds")}
+        counts = res.get("findings") or count_findings(scan_type, _output_lines(res))
+        if counts:
+            findings[scan_type] = counts
+    failed = any(s["status"] == "failed" for s in stages.values())
+    return {
+        "id": report.get("id"),
+        "scan_type": _plain((report.get("request") or {}).get("scan_type")),
+        "status": "failed" if failed else "completed",
+        "timestamp": report.get("timestamp"),
+        "wall_seconds": (report.get("timing") or {}).get("wall_seconds"),
+        "stages": stages,
+        "findings": findings,
+    }
+
+
+def _row_to_summary(row: sqlite3.Row) -> Dict[str, Any]:
+    summary = dict(row)
+    summary["stages"] = json.loads(summary["stages"] or "{}")
+    summary["findings"] = json.loads(summary["findings"] or "{}")
+    return summary
+
+
+def _insert(conn: sqlite3.Connection, summary: Dict[str, Any]):
+    conn.execute(
+        "INSERT OR REPLACE INTO reports (id, scan_type, status, timestamp, wall_seconds, stages, findings) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (summary["id"], summary["scan_type"], summary["status"], summary["timestamp"],
+         summary["wall_seconds"], json.dumps(summary["stages"]), json.dumps(summary["findings"])),
+    )
+
+
+def init():
+    """Creates the index and brings it in line with the report files on disk.
+
+    Runs at startup, so reports whose add_report failed, or that were copied
+    into REPORTS_DIR by hand, show up after the next restart, and reports
+    deleted by hand drop out of it along with their aggregates.
+    """
+    global _ready
+    if _ready:
+        return
+    os.makedirs(os.path.dirname(INDEX_DB) or ".", exist_ok=True)
+    with _lock, _connect() as conn:
+        if _ready:
+            return
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _ready = True
+        on_disk = dict(report_store.iter_reports(REPORTS_DIR))
+        indexed = {row[0] for row in conn.execute("SELECT id FROM reports")}
+        stale = {row[0] for row in conn.execute(
+            "SELECT id FROM reports UNION SELECT report_id FROM aggregates UNION SELECT report_id FROM finding_sets"
+        )} - set(on_disk)
+        for table, column in (("reports", "id"), ("aggregates", "report_id"), ("finding_sets", "report_id")):
+            conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(report_id,) for report_id in stale])
+        added = 0
+        for report_id, path in on_disk.items():
+            if report_id in indexed:
+                continue
+            try:
+                summary = summarize(report_store.load(path))
+                # Listed reports are fetched by file name
+                summary["id"] = report_id
+                _insert(conn, summary)
+                indexed.add(report_id)
+                added += 1
+            except Exception as e:
+                logger.warning(f"Skipping unreadable report {report_id}: {e}")
+        if added or stale:
+            logger.info(f"Report index: added {added} reports found on disk, removed {len(stale)} deleted ones")
+
+
+def add_report(report: dict) -> Dict[str, Any]:
+    init()
+    summary = summarize(report)
+    with _connect() as conn:
+        _insert(conn, summary)
+    return summary
+
+
+def list_reports(limit: int = 100, offset: int = 0, scan_type: Optional[str] = None,
+                 status: Optional[str] = None, since: Optional[str] = None,
+                 until: Optional[str] = None) -> List[Dict[str, Any]]:
+    init()
+    clauses, args = [], []
+    if scan_type:
+        clauses.append("scan_type = ?")
+        args.append(scan_type)
+    if status:
+        clauses.append("status = ?")
+        args.append(status)
+    if since:
+        clauses.append("timestamp >= ?")
+        args.append(since)
+    if until:
+        clauses.append("timestamp <= ?")
+        args.append(until)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with _connect() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM reports {where} ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+            (*args, limit, offset),
+        ).fetchall()
+    return [_row_to_summary(r) for r in rows]
+
+
+def get_summary(report_id: str) -> Optional[Dict[str, Any]]:
+    init()
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+    return _row_to_summary(row) if row else None
+
+
+def add_aggregates(report_id: str, counts: Dict[str, Dict[str, Dict[str, int]]],
+                   items: Dict[str, Dict[str, list]]):
+    """Stores a report's counts ({source: {dimension: {key: n}}}) and finding sets ({source: {hash: row}})."""
+    init()
+    rows = [(report_id, source, dimension, key, n)
+            for source, dimensions in counts.items()
+            for dimension, keys in dimensions.items()
+            for key, n in keys.items()]
+    # Finding sets are only read whole, for item-level diffs
+    blobs = [(report_id, source, gzip.compress(report_store.dumps(found), compresslevel=3))
+             for source, found in items.items()]
+    with _connect() as conn:
+        conn.execute("DELETE FROM aggregates WHERE report_id = ?", (report_id,))
+        conn.execute("DELETE FROM finding_sets WHERE report_id = ?", (report_id,))
+        conn.executemany("INSERT INTO aggregates VALUES (?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO finding_sets VALUES (?, ?, ?)", blobs)
+
+
+def get_aggregates(report_id: str) -> Dict[str, Dict[str, Dict[str, int]]]:
+    init()
+    counts: Dict[str, Dict[str, Dict[str, int]]] = {}
+    with _connect() as conn:
+        for r in conn.execute("SELECT source, dimension, key, n FROM aggregates WHERE report_id = ?", (report_id,)):
+            counts.setdefault(r["source"], {}).setdefault(r["dimension"], {})[r["key"]] = r["n"]
+    return counts
+
+
+def get_finding_set(report_id: str, source: str) -> Optional[Dict[str, list]]:
+    init()
+    with _connect() as conn:
+        row = conn.execute("SELECT items FROM finding_sets WHERE report_id = ? AND source = ?",
+                           (report_id, source)).fetchone()
+    return report_store.loads(gzip.decompress(row["items"])) if row else None
+
+
+def aggregate_series(source: Optional[str], dimension: str, keys: Optional[List[str]] = None,
+                     since: Optional[str] = None, until: Optional[str] = None,
+                     limit: int = 100) -> List[Dict[str, Any]]:
+    """One dimension's counts for the latest `limit` reports that have aggregates, oldest first."""
+    init()
+    clauses, args = ["a.dimension = ?"], [dimension]
+    if source:
+        clauses.append("a.source = ?")
+        args.append(source)
+    if keys:
+        clauses.append(f"a.key IN ({','.join('?' * len(keys))})")
+        args.extend(keys)
+    if since:
+        clauses.append("r.timestamp >= ?")
+        args.append(since)
+    if until:
+        clauses.append("r.timestamp <= ?")
+        args.append(until)
+    where = " AND ".join(clauses)
+    with _connect() as conn:
+        ids = [r[0] for r in conn.execute(
+            f"SELECT DISTINCT r.id, r.timestamp FROM aggregates a JOIN reports r ON r.id = a.report_id "
+            f"WHERE {where} ORDER BY r.timestamp DESC LIMIT ?", (*args, limit))]
+        if not ids:
+            return []
+        rows = conn.execute(
+            f"SELECT a.report_id, r.timestamp, a.source, a.key, a.n FROM aggregates a "
+            f"JOIN reports r ON r.id = a.report_id "
+            f"WHERE {where} AND a.report_id IN ({','.join('?' * len(ids))}) ORDER BY r.timestamp, a.source",
+            (*args, *ids),
+        ).fetchall()
+    points: Dict[tuple, Dict[str, Any]] = {}
+    for r in rows:
+        point = points.setdefault((r["report_id"], r["source"]), {
+            "report_id": r["report_id"], "timestamp": r["timestamp"], "source": r["source"], "counts": {}})
+        point["counts"][r["key"]] = r["n"]
+    return list(points.values())
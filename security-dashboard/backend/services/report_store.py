@@ -0,0 +1,457 @@
+import gzip
+import json
+import os
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# "compact" writes sectioned, compressed .rpt files; "json" keeps the old indented .json reports
+REPORT_FORMAT = os.getenv("REPORT_FORMAT", "compact")
+REPORT_COMPRESSION = os.getenv("REPORT_COMPRESSION", "zstd" if zstandard else "gzip")
+REPORT_COMPRESSION_LEVEL = os.getenv("REPORT_COMPRESSION_LEVEL")
+# Logs are compressed in frames of this many characters (bytes for logs copied from a file), so a page
+# of output decompresses one or two
+REPORT_LOG_FRAME_CHARS = int(os.getenv("REPORT_LOG_FRAME_CHARS", str(1024 * 1024)))
+# Stage logs of old JSON reports kept decoded while they are paged through
+LEGACY_OUTPUT_CACHE_BYTES = int(os.getenv("LEGACY_OUTPUT_CACHE_BYTES", str(128 * 1024 * 1024)))
+
+COMPACT_EXT = ".rpt"
+JSON_EXT = ".json"
+MAGIC = b"SDRPT1\n"
+_HEADER_LEN = struct.Struct(">I")
+
+# A compact report is MAGIC, a length-prefixed JSON header, then one compressed
+# blob per section: "meta" (everything but results), "results" (results without
+# their output) and "log/<n>" (the raw output of result n). The header lists
+# each section's offset so any one of them can be read without the others.
+# Log sections are a run of independently compressed frames cut on UTF-8
+# character boundaries; their header entry lists [length, raw_length] of each.
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        level = int(REPORT_COMPRESSION_LEVEL or 3)
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if codec == "gzip":
+        level = int(REPORT_COMPRESSION_LEVEL or 3)
+        return gzip.compress(data, compresslevel=level)
+    raise ValueError(f"Unknown report compression: {codec}")
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Report is zstd compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    raise ValueError(f"Unknown report compression: {codec}")
+
+
+def _char_boundary(data: bytes, i: int) -> int:
+    # Steps back over UTF-8 continuation bytes to the start of a character
+    while 0 < i < len(data) and data[i] & 0xC0 == 0x80:
+        i -= 1
+    return i
+
+
+def _complete_length(data: bytes) -> int:
+    # Length of data without a character cut off at its end
+    if not data:
+        return 0
+    i = _char_boundary(data, len(data) - 1)
+    lead = data[i]
+    size = 1 if lead < 0xC0 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+    return len(data) if len(data) - i >= size else i
+
+
+def _file_frames(path: str) -> Iterator[bytes]:
+    # A log file read a frame at a time, each ending on a whole character
+    carry = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(REPORT_LOG_FRAME_CHARS)
+            if not chunk:
+                break
+            data = carry + chunk
+            cut = _complete_length(data)
+            carry = data[cut:]
+            if cut:
+                yield data[:cut]
+    if carry:
+        yield carry
+
+
+def _log_frames(result: Dict[str, Any]) -> Iterator[bytes]:
+    """Raw frames of a result's log, from its "output_path" file or its "output" string."""
+    if result.get("output_path"):
+        yield from _file_frames(result["output_path"])
+        return
+    # Cut from the string and encoded a frame at a time, so no single step holds the GIL for a whole log
+    output = result.get("output") or ""
+    for start in range(0, len(output), REPORT_LOG_FRAME_CHARS):
+        yield output[start:start + REPORT_LOG_FRAME_CHARS].encode()
+
+
+def _with_output(result: Dict[str, Any]) -> Dict[str, Any]:
+    # The plain JSON format holds each log inline
+    if not result.get("output_path"):
+        return result
+    output = b"".join(_file_frames(result["output_path"])).decode("utf-8", errors="replace")
+    return {**{k: v for k, v in result.items() if k != "output_path"}, "output": output}
+
+
+def report_file(reports_dir: str, report_id: str) -> str:
+    """Where a new report is written, following REPORT_FORMAT."""
+    ext = JSON_EXT if REPORT_FORMAT == "json" else COMPACT_EXT
+    return os.path.join(reports_dir, f"{report_id}{ext}")
+
+
+def find(reports_dir: str, report_id: str) -> Optional[str]:
+    """Path of an existing report in either format."""
+    for ext in (COMPACT_EXT, JSON_EXT):
+        path = os.path.join(reports_dir, f"{report_id}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def iter_reports(reports_dir: str) -> Iterator[Tuple[str, str]]:
+    """Yields (report_id, path) for every report file in the directory."""
+    if not os.path.isdir(reports_dir):
+        return
+    for filename in os.listdir(reports_dir):
+        for ext in (COMPACT_EXT, JSON_EXT):
+            if filename.endswith(ext):
+                yield filename[:-len(ext)], os.path.join(reports_dir, filename)
+                break
+
+
+def save(path: str, report: Dict[str, Any], codec: Optional[str] = None):
+    """Writes a report; .json paths get the old plain format, anything else the compact one."""
+    tmp_path = f"{path}.tmp"
+    if path.endswith(JSON_EXT):
+        report = {**report, "results": [_with_output(r) for r in report.get("results") or []]}
+        with open(tmp_path, "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+        return
+
+    codec = codec or REPORT_COMPRESSION
+    results = report.get("results") or []
+    sections: List[Tuple[str, bytes]] = [
+        ("meta", dumps({k: v for k, v in report.items() if k != "results"})),
+        ("results", dumps([{k: v for k, v in r.items() if k not in ("output", "output_path")} for r in results])),
+    ]
+
+    entries, blobs, offset = [], [], 0
+    for name, raw in sections:
+        blob = _compress(raw, codec)
+        entries.append({"name": name, "offset": offset, "length": len(blob), "raw_length": len(raw)})
+        blobs.append(blob)
+        offset += len(blob)
+    for i, result in enumerate(results):
+        # Frames end on whole characters, and only one of them is held uncompressed at a time
+        frames = [(_compress(raw, codec), len(raw)) for raw in _log_frames(result)]
+        blob = b"".join(frame for frame, _ in frames)
+        entries.append({"name": f"log/{i}", "offset": offset, "length": len(blob),
+                        "raw_length": sum(n for _, n in frames),
+                        "frames": [[len(frame), n] for frame, n in frames]})
+        blobs.append(blob)
+        offset += len(blob)
+    header = json.dumps({
+        "codec": codec,
+        # Lets the output endpoint find a stage's log without decoding the results
+        "stages": [getattr(r.get("scan_type"), "value", r.get("scan_type")) for r in results],
+        "sections": entries,
+    }).encode()
+
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LEN.pack(len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+class _CompactReader:
+    def __init__(self, f):
+        self.f = f
+        (length,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+        self.header = json.loads(f.read(length))
+        self.base = len(MAGIC) + _HEADER_LEN.size + length
+        self.sections = {s["name"]: s for s in self.header["sections"]}
+
+    def _frames(self, section: Dict[str, Any]) -> List[List[int]]:
+        # Sections without a frame list (metadata, and logs of early compact reports) are one frame
+        if "frames" in section:
+            return section["frames"]
+        return [[section["length"], section["raw_length"]]]
+
+    def iter_raw(self, name: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+        """(raw offset, bytes) of each decompressed frame of a section that overlaps [start, stop)."""
+        section = self.sections[name]
+        offset, raw_offset = section["offset"], 0
+        for length, raw_length in self._frames(section):
+            if stop is not None and raw_offset >= stop:
+                return
+            if raw_offset + raw_length > start:
+                self.f.seek(self.base + offset)
+                yield raw_offset, _decompress(self.f.read(length), self.header["codec"])
+            offset += length
+            raw_offset += raw_length
+
+    def raw(self, name: str) -> bytes:
+        return b"".join(data for _, data in self.iter_raw(name))
+
+    def read_range(self, name: str, start: int, stop: int) -> bytes:
+        return b"".join(data[max(0, start - at):stop - at] for at, data in self.iter_raw(name, start, stop))
+
+    def read(self, results: bool = True, logs: bool = True) -> Dict[str, Any]:
+        report = loads(self.raw("meta"))
+        if results:
+            report["results"] = loads(self.raw("results"))
+            if logs:
+                for i, result in enumerate(report["results"]):
+                    result["output"] = self.raw(f"log/{i}").decode()
+        return report
+
+
+def _is_compact(f) -> bool:
+    magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        return True
+    f.seek(0)
+    return False
+
+
+def load(path: str, results: bool = True, logs: bool = True) -> Dict[str, Any]:
+    """Loads a report in either format.
+
+    With results=False only the metadata section of a compact report is
+    decoded, and logs=False skips every stage's raw output. Old JSON reports
+    are always parsed whole.
+    """
+    with open(path, "rb") as f:
+        if _is_compact(f):
+            return _CompactReader(f).read(results, logs)
+        report = loads(f.read())
+    if not results:
+        report.pop("results", None)
+    elif not logs:
+        for result in report.get("results") or []:
+            result.pop("output", None)
+    return report
+
+
+def _escaped(text: str) -> bytes:
+    # The inside of a JSON string literal; pieces of a string escape independently
+    return dumps(text)[1:-1]
+
+
+def _file_chunks(f, size: int) -> Iterator[bytes]:
+    with f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _json_body(reader: "_CompactReader", chunk_chars: int) -> Iterator[bytes]:
+    with reader.f:
+        meta = reader.raw("meta")
+        yield meta[:-1] + (b"," if meta != b"{}" else b"") + b'"results":['
+        # The results section holds no output, so it is small to decode
+        for i, result in enumerate(loads(reader.raw("results"))):
+            head = dumps(result)[:-1]
+            yield (b"," if i else b"") + head + (b"," if head != b"{" else b"") + b'"output":"'
+            # Frames end on character boundaries, so each decodes on its own
+            for _, frame in reader.iter_raw(f"log/{i}"):
+                output = frame.decode()
+                for start in range(0, len(output), chunk_chars):
+                    yield _escaped(output[start:start + chunk_chars])
+            yield b'"}'
+        yield b"]}"
+
+
+def iter_json(path: str, chunk_chars: int = 64 * 1024) -> Iterator[bytes]:
+    """The whole report as JSON bytes, a piece at a time.
+
+    Compact reports are spliced together from their sections, so the stored
+    logs are only escaped, never decoded into a report dict. Opening the file
+    and reading the header happen here, before the first piece is asked for.
+    """
+    f = open(path, "rb")
+    try:
+        if not _is_compact(f):
+            return _file_chunks(f, chunk_chars)
+        return _json_body(_CompactReader(f), chunk_chars)
+    except Exception:
+        f.close()
+        raise
+
+
+def _project(data: Any, path: List[str]) -> Any:
+    # Lists are mapped over, so "results.status" yields the status of every result
+    if not path:
+        return data
+    if isinstance(data, list):
+        return [_project(item, path) for item in data]
+    if isinstance(data, dict) and path[0] in data:
+        return {path[0]: _project(data[path[0]], path[1:])}
+    return None
+
+
+def _merge(target: Any, part: Any) -> Any:
+    if isinstance(target, dict) and isinstance(part, dict):
+        for key, value in part.items():
+            target[key] = _merge(target[key], value) if key in target else value
+        return target
+    if isinstance(target, list) and isinstance(part, list):
+        return [_merge(a, b) for a, b in zip(target, part)]
+    return part
+
+
+def sections_for(paths: List[List[str]]) -> Tuple[bool, bool]:
+    """(results, logs): whether the dotted field paths touch the results and the stage logs."""
+    touched = [p for p in paths if p and p[0] == "results"]
+    return bool(touched), any(len(p) == 1 or p[1] == "output" for p in touched)
+
+
+def load_fields(path: str, paths: List[List[str]], out_path: Optional[str] = None) -> Optional[bytes]:
+    """The given dotted field paths of a report as JSON bytes, decoding only the sections they touch.
+
+    With out_path the JSON is written to that file instead and None returned.
+    """
+    data = load(path, *sections_for(paths))
+    projected: Any = {}
+    for field in paths:
+        part = _project(data, field)
+        if part is not None:
+            projected = _merge(projected, part)
+    if out_path is None:
+        return dumps(projected)
+    with open(out_path, "wb") as f:
+        f.write(dumps(projected))
+    return None
+
+
+@dataclass
+class OutputPage:
+    data: bytes
+    start: int
+    end: int
+    total: int
+
+
+_legacy_logs: "OrderedDict[Tuple[str, int], Dict[Optional[str], bytes]]" = OrderedDict()
+_legacy_bytes = 0
+_legacy_lock = threading.Lock()
+
+
+def _parse_legacy_logs(path: str) -> Dict[Optional[str], bytes]:
+    with open(path, "rb") as f:
+        report = loads(f.read())
+    logs: Dict[Optional[str], bytes] = {}
+    for result in report.get("results") or []:
+        logs.setdefault(result.get("scan_type"), (result.get("output") or "").encode())
+    return logs
+
+
+def _legacy_stage_logs(path: str) -> Dict[Optional[str], bytes]:
+    # Parsing an old JSON report is the expensive part of paging it, so its logs are
+    # kept (least recently used first out) while the report is being read
+    global _legacy_bytes
+    key = (path, os.stat(path).st_mtime_ns)
+    with _legacy_lock:
+        logs = _legacy_logs.get(key)
+        if logs is not None:
+            _legacy_logs.move_to_end(key)
+            return logs
+    logs = _parse_legacy_logs(path)
+    size = sum(len(log) for log in logs.values())
+    if size <= LEGACY_OUTPUT_CACHE_BYTES:
+        with _legacy_lock:
+            if key not in _legacy_logs:
+                _legacy_logs[key] = logs
+                _legacy_bytes += size
+            while _legacy_bytes > LEGACY_OUTPUT_CACHE_BYTES:
+                _, evicted = _legacy_logs.popitem(last=False)
+                _legacy_bytes -= sum(len(log) for log in evicted.values())
+    return logs
+
+
+def _page(data: bytes, offset: int, limit: int, total: int) -> OutputPage:
+    # data starts at offset; the page is trimmed to whole UTF-8 characters at both ends
+    skip = 0
+    while skip < min(3, len(data)) and data[skip] & 0xC0 == 0x80:
+        skip += 1
+    end = _char_boundary(data, min(skip + limit, len(data)))
+    if end <= skip:
+        end = min(len(data), skip + 4)
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end += 1
+    return OutputPage(data[skip:end], offset + skip, offset + end, total)
+
+
+def load_output(path: str, stage: Optional[str] = None, offset: int = 0, limit: Optional[int] = None) -> Optional[OutputPage]:
+    """A page of one stage's raw output (the first stage when stage is None), by UTF-8 byte offset.
+
+    Compact reports decompress only the log frames the page covers; old JSON
+    reports are parsed once and their logs cached. None if the report has no
+    such stage.
+    """
+    # A few bytes past the page let it be widened to a whole character
+    stop = None if limit is None else offset + limit + 4
+    with open(path, "rb") as f:
+        if _is_compact(f):
+            reader = _CompactReader(f)
+            stages = reader.header.get("stages") or []
+            index = next((i for i, s in enumerate(stages) if stage is None or s == stage), None)
+            if index is None:
+                return None
+            name = f"log/{index}"
+            total = reader.sections[name]["raw_length"]
+            data = reader.read_range(name, offset, total if stop is None else stop)
+            return _page(data, offset, total if limit is None else limit, total)
+    logs = _legacy_stage_logs(path)
+    if not logs:
+        return None
+    output = next(iter(logs.values())) if stage is None else logs.get(stage)
+    if output is None:
+        return None
+    return _page(output[offset:stop], offset, len(output) if limit is None else limit, len(output))
+
+
+def decoded_size(path: str) -> int:
+    """Approximate size of the report once decoded, from the header alone."""
+    with open(path, "rb") as f:
+        if _is_compact(f):
+            return sum(s["raw_length"] for s in _CompactReader(f).header["sections"])
+    return os.path.getsize(path)
@@ -1,9 +1,15 @@
 import asyncio
-import json
 import os
+import time
+from contextlib import nullcontext
 from datetime import datetime
+from typing import Dict, Iterable, Optional, Set
 from fastapi import WebSocket
 from models import ScanRequest, ScanType, ScanStatus, ScanResult
+from services.scheduler import ALL_STAGES, ScanScheduler, Stage
+from services import aggregates, dir_index, executors, fingerprints, image_scanner, ingest, inventory, kube_bench, metrics, nmap_scanner, processes, report_index, report_store, trivy_server
+from services.broadcast import ConnectionManager
+from services.log_buffer import ScanLogs
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -12,38 +18,56 @@ logger = logging.getLogger("uvicorn")
 REPORTS_DIR = "security-dashboard/backend/reports"
 os.makedirs(REPORTS_DIR, exist_ok=True)
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[str, list[WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, scan_id: str):
-        await websocket.accept()
-        logger.info(f"WS Connected: {scan_id}")
-        if scan_id not in self.active_connections:
-            self.active_connections[scan_id] = []
-        self.active_connections[scan_id].append(websocket)
-
-    def disconnect(self, websocket: WebSocket, scan_id: str):
-        logger.info(f"WS Disconnected: {scan_id}")
-        if scan_id in self.active_connections:
-            if websocket in self.active_connections[scan_id]:
-                self.active_connections[scan_id].remove(websocket)
-            if not self.active_connections[scan_id]:
-                del self.active_connections[scan_id]
-
-    async def broadcast(self, message: str, scan_id: str):
-        if scan_id in self.active_connections:
-            for connection in self.active_connections[scan_id]:
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    logger.error(f"Error broadcasting to {scan_id}: {e}")
-
 manager = ConnectionManager()
+logs = ScanLogs()
+# Requests coalesced into another job keep their own id as an alias of that job's stream
+aliases: Dict[str, str] = {}
+# Aggregates being recorded after their scan finished
+_aggregate_tasks: Set[asyncio.Task] = set()
+
+def resolve(scan_id: str) -> str:
+    return aliases.get(scan_id, scan_id)
+
+def follow(scan_id: str, target_id: str):
+    """Points scan_id at target_id's stream, moving viewers that already connected under scan_id."""
+    aliases[scan_id] = target_id
+    for subscriber in manager.active_connections.pop(scan_id, []):
+        subscriber.close()
+        manager.subscribe(subscriber.websocket, target_id, _replay_from(target_id, 0))
+
+def drop_aliases(target_id: str):
+    for alias in [a for a, t in aliases.items() if t == target_id]:
+        del aliases[alias]
+
+async def abort_scan(scan_id: str, reason: str):
+    """Ends the stream of a scan that stopped without a report."""
+    await publish(f"--- Scan {reason} ---\n", scan_id)
+    await logs.close(scan_id)
+    await manager.broadcast("__EOF__", scan_id)
 
-async def handle_websocket(websocket: WebSocket, scan_id: str):
+def _replay_from(scan_id: str, offset: int):
+    buf = logs.get(scan_id)
+    if buf is None:
+        return None
+    # Snapshot now; everything after this point arrives through the live queue
+    end, closed = buf.end, buf.closed
+
+    async def frames():
+        async for text in buf.iter_range(offset, end):
+            yield text
+        if closed:
+            yield "__EOF__"
+
+    return frames()
+
+async def publish(text: str, scan_id: str):
+    logs.stream(scan_id).append(text)
+    await manager.broadcast(text, scan_id)
+
+async def handle_websocket(websocket: WebSocket, scan_id: str, offset: int = 0):
     logger.info(f"Handling WS connection for {scan_id}")
-    await manager.connect(websocket, scan_id)
+    target_id = resolve(scan_id)
+    await manager.connect(websocket, target_id, replay=lambda: _replay_from(target_id, offset))
     try:
         while True:
             data = await websocket.receive_text()
@@ -52,15 +76,33 @@ async def handle_websocket(websocket: WebSocket, scan_id: str):
         logger.error(f"WS Error {scan_id}: {e}")
     finally:
         manager.disconnect(websocket, scan_id)
+        # The viewer may have been moved onto a coalesced job's stream
+        manager.disconnect(websocket, resolve(scan_id))
+
+class _LineLabeler:
+    """Prefixes every output line with the scanner name so parallel streams stay readable."""
 
-async def _run_command(command: list, scan_id: str, accum_output: list, cwd: str = None):
+    def __init__(self, label: str = None):
+        self.prefix = f"[{label}] " if label else ""
+        self.at_line_start = True
+
+    def __call__(self, text: str) -> str:
+        if not self.prefix or not text:
+            return text
+        out = self.prefix + text if self.at_line_start else text
+        self.at_line_start = out.endswith("\n")
+        body = out[:-1] if self.at_line_start else out
+        return body.replace("\n", "\n" + self.prefix) + ("\n" if self.at_line_start else "")
+
+async def _run_command(command: list, emit, cwd: str = None, env: dict = None):
     cmd_str = " ".join(command)
-    # await manager.broadcast(f"\n$ {cmd_str}\n", scan_id)
+    # await emit(f"\n$ {cmd_str}\n")
     
     try:
-        process = await asyncio.create_subprocess_exec(
+        process = await processes.spawn(
             *command,
             cwd=cwd,
+            env=env,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT
         )
@@ -70,24 +112,65 @@ async def _run_command(command: list, scan_id: str, accum_output: list, cwd: str
             data = await process.stdout.read(4096)
             if not data:
                 break
-            text = data.decode('utf-8', errors='replace')
-            await manager.broadcast(text, scan_id)
-            accum_output.append(text)
+            await emit(data.decode('utf-8', errors='replace'))
 
         await process.wait()
         return process.returncode
     except FileNotFoundError:
-        err = f"Error: Command not found: {command[0]}\n"
-        await manager.broadcast(err, scan_id)
-        accum_output.append(err)
+        await emit(f"Error: Command not found: {command[0]}\n")
+        return 1
+    except Exception as e:
+        await emit(f"Error executing command: {str(e)}\n")
         return 1
+
+async def _run_engine(scan_type: ScanType, cwd: str, emit, incremental: bool = False,
+                      snapshot: Optional[inventory.Snapshot] = None, timing: Optional[dict] = None) -> int:
+    new_dir = os.getenv("NEW_DIR", os.path.join(cwd, "new"))
+    # Full scans record fingerprints too, so the next incremental run has a baseline
+    store = fingerprints.FingerprintStore(new_dir, scan_type.value)
+    try:
+        if scan_type == ScanType.TRIVY_IMAGE:
+            return await image_scanner.run_image_scan(os.path.join(new_dir, "trivy-reports"), emit,
+                                                      store=store, incremental=incremental, snapshot=snapshot,
+                                                      timing=timing)
+        if scan_type == ScanType.NMAP:
+            return await nmap_scanner.run_nmap_scan(os.path.join(new_dir, "nmap"), emit,
+                                                    store=store, incremental=incremental, snapshot=snapshot)
+        if scan_type == ScanType.KUBE_BENCH:
+            return await kube_bench.run_kube_bench(os.path.join(new_dir, "kube-bench"), emit)
     except Exception as e:
-        err = f"Error executing command: {str(e)}\n"
-        await manager.broadcast(err, scan_id)
-        accum_output.append(err)
+        logger.exception(f"{scan_type.value} engine failed")
+        await emit(f"Error executing {scan_type.value} scan: {str(e)}\n")
         return 1
+    await emit(f"Error: no runner configured for {scan_type.value}\n")
+    return 1
+
+# Script stages whose trivy scans can run as clients of the managed trivy server (TRIVY_SERVER_URL)
+TRIVY_CLIENT_STAGES = {ScanType.TRIVY_IMAGE, ScanType.TRIVY_SBOM}
+
+# Stages that discover the cluster; one inventory snapshot per run serves all of them
+INVENTORY_STAGES = {ScanType.KYVERNO, ScanType.TRIVY_IMAGE, ScanType.NMAP}
+
+async def _take_inventory(scan_types: Iterable[ScanType], scan_id: str) -> Optional[inventory.Snapshot]:
+    if not INVENTORY_STAGES.intersection(scan_types):
+        return None
+    stage_token = metrics.stage.set("inventory")
+    try:
+        with metrics.span(scan_id, "inventory"):
+            snapshot = await inventory.cluster.get()
+    except Exception as e:
+        # Each stage falls back to listing what it needs itself
+        await publish(f"Cluster inventory unavailable: {e}\n", scan_id)
+        return None
+    finally:
+        metrics.stage.reset(stage_token)
+    counts = snapshot.summary()["counts"]
+    await publish(f"Cluster inventory: {counts['namespaces']} namespaces, {counts['pods']} pods, "
+                  f"{counts['services']} services\n", scan_id)
+    return snapshot
 
-async def run_single_scan(scan_type: ScanType, scan_id: str, request: ScanRequest) -> dict:
+async def run_single_scan(scan_type: ScanType, scan_id: str, request: ScanRequest, label: str = None,
+                          snapshot: Optional[inventory.Snapshot] = None) -> dict:
     command = []
     # Mocking commands for demonstration if tools aren't installed, 
     # but implementing as if they are.
@@ -95,13 +178,17 @@ async def run_single_scan(scan_type: ScanType, scan_id: str, request: ScanReques
     cwd = os.getenv("APP_HOME", "/app") 
     
     if scan_type == ScanType.KUBE_BENCH:
-        command = ["bash", f"{cwd}/4_run_kube_bench.sh"]
+        # KUBE_BENCH_ENGINE=script falls back to the polling shell wrapper and its text output
+        if os.getenv("KUBE_BENCH_ENGINE", "python") == "script":
+            command = ["bash", f"{cwd}/4_run_kube_bench.sh"]
 
     elif scan_type == ScanType.KYVERNO:
         command = ["bash", f"{cwd}/6_run_kyverno.sh"]
     
     elif scan_type == ScanType.TRIVY_IMAGE:
-        command = ["bash", f"{cwd}/2_run_trivy_image.sh"]
+        # TRIVY_IMAGE_ENGINE=script falls back to the per-namespace shell loop
+        if os.getenv("TRIVY_IMAGE_ENGINE", "python") == "script":
+            command = ["bash", f"{cwd}/2_run_trivy_image.sh"]
 
     elif scan_type == ScanType.TRIVY_SBOM:
         command = ["bash", f"{cwd}/1_run_trivy_sbom.sh"]
@@ -110,46 +197,162 @@ async def run_single_scan(scan_type: ScanType, scan_id: str, request: ScanReques
         command = ["bash", f"{cwd}/5_run_trivy_cluster.sh"]
 
     elif scan_type == ScanType.NMAP:
-        command = ["bash", f"{cwd}/3_run_nmap.sh"]
+        # NMAP_ENGINE=script falls back to scanning one service at a time
+        if os.getenv("NMAP_ENGINE", "python") == "script":
+            command = ["bash", f"{cwd}/3_run_nmap.sh"]
+
+    # parameters.incremental only re-evaluates objects changed since the last scan (kyverno, trivy-image, nmap)
+    incremental = bool((request.parameters or {}).get("incremental"))
+
+    stage_log = logs.stage(scan_id, scan_type.value)
+    labeler = _LineLabeler(label)
+    started_at = datetime.now()
 
-    accum_output = []
+    async def emit(text: str):
+        stage_log.append(text)
+        await publish(labeler(text), scan_id)
     
-    await manager.broadcast(f"--- Starting {scan_type.value} scan ---\n", scan_id)
-    ret_code = await _run_command(command, scan_id, accum_output, cwd=cwd)
+    await publish(f"--- Starting {scan_type.value} scan ---\n", scan_id)
+    # Subprocesses started from here on are accounted to this stage
+    stage_token = metrics.stage.set(scan_type.value)
+    stage_started = time.monotonic()
+    timing = {}
+    try:
+        if command:
+            env = {}
+            if incremental:
+                env["SCAN_INCREMENTAL"] = "1"
+            if snapshot is not None and snapshot.directory:
+                # The scripts read <kind>.json from here instead of listing the cluster
+                env["INVENTORY_DIR"] = snapshot.directory
+            # Only client stages hold a lease, since a lease holds off the server's DB refresh
+            with trivy_server.server.lease() if scan_type in TRIVY_CLIENT_STAGES else nullcontext() as server_url:
+                if server_url:
+                    env["TRIVY_SERVER_URL"] = server_url
+                ret_code = await _run_command(command, emit, cwd=cwd, env={**os.environ, **env} if env else None)
+        else:
+            ret_code = await _run_engine(scan_type, cwd, emit, incremental=incremental, snapshot=snapshot,
+                                         timing=timing)
+    finally:
+        metrics.stage.reset(stage_token)
     
     status = ScanStatus.COMPLETED if ret_code == 0 else ScanStatus.FAILED
-    await manager.broadcast(f"--- {scan_type.value} scan finished with status: {status.value} ---\n", scan_id)
+    stage_seconds = time.monotonic() - stage_started
+    metrics.stage_seconds.observe(stage_seconds, scan_type=scan_type.value, status=status.value)
+    metrics.add_span(scan_id, {"name": "stage", "stage": scan_type.value, "start": round(started_at.timestamp(), 3),
+                               "seconds": round(stage_seconds, 3), "status": status.value})
+    await publish(f"--- {scan_type.value} scan finished with status: {status.value} ---\n", scan_id)
+    # Failed stages may still leave partial artifacts worth indexing
+    ingest.on_scan_complete(scan_type)
+    dir_index.index.refresh()
+
+    # The report copies the log from disk; run_scan_task removes the file once it is saved
+    await stage_log.close()
     
     return {
         "scan_type": scan_type,
         "status": status,
-        "output": "".join(accum_output),
+        "output_path": stage_log.path,
+        "incremental": incremental,
+        # Per-image seconds by trivy mode, for the stages that scan images
+        "timing": timing or None,
+        "started_at": started_at.isoformat(),
         "timestamp": datetime.now().isoformat()
     }
 
-async def run_scan_task(scan_id: str, request: ScanRequest):
+async def _run_stages_serial(stages: list, scan_id: str, request: ScanRequest,
+                             snapshot: Optional[inventory.Snapshot] = None) -> list:
     results = []
-    
-    if request.scan_type == ScanType.ALL:
+    for stage in stages:
+        started = time.monotonic()
+        res = await run_single_scan(stage.scan_type, scan_id, request, snapshot=snapshot)
+        res["wall_seconds"] = round(time.monotonic() - started, 3)
+        results.append(res)
+    return results
+
+async def _record_aggregates(scan_id: str, results: list):
+    # Counted from the findings store once it holds what the successful stages wrote
+    sources = [source for r in results if r["status"] == ScanStatus.COMPLETED
+               for source in ingest.SCAN_SOURCES.get(r["scan_type"], ())]
+    if not sources:
+        return
+    try:
+        await ingest.ingest(sources)
+        await executors.run_io(aggregates.record, scan_id, sources)
+    except Exception as e:
+        logger.error(f"Failed to record aggregates of report {scan_id}: {e}")
+
+def _remove_stage_logs(results: list):
+    for result in results:
+        path = result.pop("output_path", None)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
-        scans_to_run = [ScanType.TRIVY_SBOM, ScanType.KYVERNO, ScanType.KUBE_BENCH, ScanType.TRIVY_IMAGE, ScanType.NMAP, ScanType.TRIVY_CLUSTER]
-        for s_type in scans_to_run:
-            res = await run_single_scan(s_type, scan_id, request)
-            results.append(res)
+async def run_scan_task(scan_id: str, request: ScanRequest):
+    params = request.parameters or {}
+    started = time.monotonic()
+
+    if request.scan_type == ScanType.ALL:
+        snapshot = await _take_inventory((stage.scan_type for stage in ALL_STAGES), scan_id)
+        # parameters.mode == "serial" keeps the old one-after-another path for comparison
+        mode = "serial" if params.get("mode") == "serial" else "parallel"
+        if mode == "serial":
+            results = await _run_stages_serial(ALL_STAGES, scan_id, request, snapshot)
+        else:
+            async def runner(stage: Stage) -> dict:
+                return await run_single_scan(stage.scan_type, scan_id, request, label=stage.scan_type.value,
+                                             snapshot=snapshot)
+            results = await ScanScheduler().run(ALL_STAGES, runner)
     else:
-        res = await run_single_scan(request.scan_type, scan_id, request)
-        results.append(res)
+        mode = "single"
+        snapshot = await _take_inventory([request.scan_type], scan_id)
+        results = await _run_stages_serial([Stage(request.scan_type, tool=request.scan_type.value)], scan_id,
+                                           request, snapshot)
+
+    wall_seconds = round(time.monotonic() - started, 3)
+    timing = {
+        "mode": mode,
+        "wall_seconds": wall_seconds,
+        # Discovery cost of the run: list calls and time of the snapshot the stages shared
+        "inventory": {"list_calls": snapshot.calls, "seconds": round(snapshot.duration, 3),
+                      "taken_at": snapshot.taken_at} if snapshot is not None else None,
+        # Sum of stage times approximates what the serial path would have taken
+        "stage_seconds_total": round(sum(r.get("wall_seconds", 0) for r in results), 3),
+        "stages": {r["scan_type"].value: r.get("wall_seconds") for r in results},
+        "per_image": {r["scan_type"].value: r["timing"] for r in results if r.get("timing")},
+    }
+    spans = metrics.take_spans(scan_id)
+    # Subprocess count, wall and CPU seconds, peak RSS and output bytes per stage
+    timing["resources"] = metrics.summarize(spans)
 
     # Save Report
-    report_file = os.path.join(REPORTS_DIR, f"{scan_id}.json")
+    report_file = report_store.report_file(REPORTS_DIR, scan_id)
     final_report = {
         "id": scan_id,
         "request": request.dict(),
         "timestamp": datetime.now().isoformat(),
+        "timing": timing,
+        # Stages, inventory and every subprocess, in start order
+        "spans": spans,
         "results": results
     }
     
-    with open(report_file, "w") as f:
-        json.dump(final_report, f, indent=2)
+    # On a thread: save encodes the small sections and copies each stage log from its file a frame
+    # at a time, so there is nothing large to ship to a worker process
+    await executors.run_io(report_store.save, report_file, final_report)
+    try:
+        await executors.run_io(report_index.add_report, final_report)
+    except Exception as e:
+        logger.error(f"Failed to index report {scan_id}: {e}")
+    await executors.run_io(_remove_stage_logs, results)
     
+    await logs.close(scan_id)
     await manager.broadcast("__EOF__", scan_id)
+    # The ingest behind the aggregates can take a while; viewers are not kept waiting for it
+    task = asyncio.create_task(_record_aggregates(scan_id, results))
+    _aggregate_tasks.add(task)
+    task.add_done_callback(_aggregate_tasks.discard)
+    return final_report
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from models import ScanType
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+
+@dataclass(frozen=True)
+class Stage:
+    scan_type: ScanType
+    tool: str
+    deps: Tuple[ScanType, ...] = ()
+    cpu: float = 1.0
+    memory_mb: int = 512
+
+
+# Dependency graph for the "all" scan. trivy-sbom runs first so the vulnerability
+# DB is downloaded once before the other trivy stages start.
+ALL_STAGES: List[Stage] = [
+    Stage(ScanType.TRIVY_SBOM, tool="trivy", cpu=1.0, memory_mb=1024),
+    Stage(ScanType.KYVERNO, tool="kyverno", cpu=1.0, memory_mb=1024),
+    Stage(ScanType.KUBE_BENCH, tool="kube-bench", cpu=0.5, memory_mb=256),
+    Stage(ScanType.TRIVY_IMAGE, tool="trivy", deps=(ScanType.TRIVY_SBOM,), cpu=2.0, memory_mb=1024),
+    Stage(ScanType.NMAP, tool="nmap", cpu=1.0, memory_mb=256),
+    Stage(ScanType.TRIVY_CLUSTER, tool="trivy", deps=(ScanType.TRIVY_SBOM,), cpu=1.0, memory_mb=2048),
+]
+
+# trivy instances share one cache dir and lock it, so only one may run at a time
+DEFAULT_TOOL_LIMITS = {"trivy": 1}
+
+
+def _parse_tool_limits(value: str) -> Dict[str, int]:
+    # Format: "trivy=1,nmap=2"
+    limits = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        tool, limit = item.split("=", 1)
+        try:
+            limits[tool.strip()] = max(1, int(limit))
+        except ValueError:
+            logger.warning(f"Ignoring invalid tool limit: {item}")
+    return limits
+
+
+def _default_memory_budget_mb() -> int:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return 4096
+
+
+class ResourceBudget:
+    def __init__(self, cpu: float, memory_mb: int):
+        self.cpu = cpu
+        self.memory_mb = memory_mb
+        self.used_cpu = 0.0
+        self.used_memory_mb = 0
+        self._cond = asyncio.Condition()
+
+    def _fits(self, cpu: float, memory_mb: int) -> bool:
+        # A stage larger than the whole budget still runs, but only on its own
+        if self.used_cpu == 0 and self.used_memory_mb == 0:
+            return True
+        return self.used_cpu + cpu <= self.cpu and self.used_memory_mb + memory_mb <= self.memory_mb
+
+    async def acquire(self, cpu: float, memory_mb: int):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._fits(cpu, memory_mb))
+            self.used_cpu += cpu
+            self.used_memory_mb += memory_mb
+
+    async def release(self, cpu: float, memory_mb: int):
+        async with self._cond:
+            self.used_cpu -= cpu
+            self.used_memory_mb -= memory_mb
+            self._cond.notify_all()
+
+
+class ScanScheduler:
+    def __init__(self, tool_limits: Optional[Dict[str, int]] = None,
+                 cpu_budget: Optional[float] = None, memory_budget_mb: Optional[int] = None):
+        limits = dict(DEFAULT_TOOL_LIMITS)
+        limits.update(_parse_tool_limits(os.getenv("SCAN_TOOL_LIMITS", "")))
+        limits.update(tool_limits or {})
+        self.tool_limits = limits
+        # Scanners mostly wait on the API server and registries, so oversubscribe the cores
+        self.cpu_budget = cpu_budget or float(os.getenv("SCAN_CPU_BUDGET", 2 * (os.cpu_count() or 1)))
+        self.memory_budget_mb = memory_budget_mb or int(os.getenv("SCAN_MEMORY_BUDGET_MB", _default_memory_budget_mb()))
+
+    async def run(self, stages: List[Stage], runner: Callable[[Stage], Awaitable[dict]]) -> List[dict]:
+        """Runs stages concurrently once their dependencies finish.
+
+        Returns the runner results in the order the stages were given, each
+        annotated with its queue and run wall times.
+        """
+        known = {s.scan_type for s in stages}
+        budget = ResourceBudget(self.cpu_budget, self.memory_budget_mb)
+        semaphores = {s.tool: asyncio.Semaphore(self.tool_limits.get(s.tool, 1)) for s in stages}
+        done = {s.scan_type: asyncio.Event() for s in stages}
+        scheduled_at = time.monotonic()
+
+        async def run_stage(stage: Stage) -> dict:
+            try:
+                for dep in stage.deps:
+                    if dep in known:
+                        await done[dep].wait()
+                async with semaphores[stage.tool]:
+                    await budget.acquire(stage.cpu, stage.memory_mb)
+                    started = time.monotonic()
+                    try:
+                        result = await runner(stage)
+                    finally:
+                        await budget.release(stage.cpu, stage.memory_mb)
+                result["queued_seconds"] = round(started - scheduled_at, 3)
+                result["wall_seconds"] = round(time.monotonic() - started, 3)
+                return result
+            finally:
+                done[stage.scan_type].set()
+
+        return list(await asyncio.gather(*(run_stage(s) for s in stages)))
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from services import executors, processes
+import logging
+
+logger = logging.getLogger("uvicorn")
+
+# "managed" keeps a local `trivy server` running for the scans to use as thin clients; "off" runs trivy standalone
+TRIVY_SERVER_MODE = os.getenv("TRIVY_SERVER_MODE", "managed")
+TRIVY_SERVER_LISTEN = os.getenv("TRIVY_SERVER_LISTEN", "127.0.0.1:4954")
+# Vulnerability DB and layer cache of the server, shared by every client
+TRIVY_SERVER_CACHE_DIR = os.getenv("TRIVY_SERVER_CACHE_DIR", "security-dashboard/backend/cache/trivy-server")
+# The server is restarted, which downloads a fresh DB, once this old and no scan is using it
+TRIVY_DB_REFRESH_HOURS = float(os.getenv("TRIVY_DB_REFRESH_HOURS", "12"))
+# The first start includes the DB download
+TRIVY_SERVER_START_TIMEOUT = float(os.getenv("TRIVY_SERVER_START_TIMEOUT", "600"))
+RESTART_DELAY_SECONDS = 30
+
+
+def healthy(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(f"{url}/healthz", timeout=2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+class ScanTimings:
+    """Running mean of the seconds one `trivy image` takes, per mode (server client or standalone).
+
+    Kept on disk so a run can be compared with the other mode's earlier runs.
+    """
+
+    # Older runs fade out once this many images have been counted
+    WINDOW = 1000
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, "timings.json")
+
+    def load(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, durations: Dict[str, list]) -> Dict[str, Any]:
+        """Adds a run's per-image seconds by mode; returns the run's report against the standalone mean."""
+        timings = self.load()
+        report: Dict[str, Any] = {
+            mode: {"images": len(seconds), "per_image_seconds": round(sum(seconds) / len(seconds), 2)}
+            for mode, seconds in durations.items() if seconds
+        }
+        # Standalone images of this run, or the earlier runs when there were none
+        baseline = (report.get("standalone") or timings.get("standalone") or {}).get("per_image_seconds")
+        if "server" in report and baseline:
+            report["standalone_per_image_seconds"] = round(baseline, 2)
+            report["saved_per_image_seconds"] = round(baseline - report["server"]["per_image_seconds"], 2)
+        for mode, seconds in durations.items():
+            if not seconds:
+                continue
+            entry = timings.get(mode) or {"images": 0, "per_image_seconds": 0.0}
+            n = min(entry["images"], self.WINDOW)
+            entry["per_image_seconds"] = (entry["per_image_seconds"] * n + sum(seconds)) / (n + len(seconds))
+            entry["images"] = n + len(seconds)
+            timings[mode] = entry
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(timings, f)
+        os.replace(f"{self.path}.tmp", self.path)
+        return report
+
+
+class TrivyServer:
+    """A long-lived `trivy server` whose warm DB and cache every trivy client shares.
+
+    Scans lease the server for their duration; the scheduled DB refresh
+    restarts it only once no lease is held, and clients that find it down
+    fall back to standalone trivy.
+    """
+
+    def __init__(self, listen: str = TRIVY_SERVER_LISTEN, cache_dir: str = TRIVY_SERVER_CACHE_DIR):
+        self.url = f"http://{listen}"
+        self.listen = listen
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.timings = ScanTimings(self.cache_dir)
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.leases = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return TRIVY_SERVER_MODE == "managed" and shutil.which("trivy") is not None
+
+    def start(self):
+        if TRIVY_SERVER_MODE != "managed":
+            return
+        if not self.enabled:
+            logger.warning("trivy not found, trivy scans run standalone")
+            return
+        # In the background: the first start downloads the DB
+        self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._terminate()
+
+    async def _terminate(self):
+        self.ready = False
+        if self.process is not None:
+            await processes.terminate([self.process])
+            self.process = None
+
+    async def _launch(self) -> bool:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        log = open(os.path.join(self.cache_dir, "server.log"), "ab")
+        try:
+            self.process = await processes.spawn(
+                "trivy", "server", "--listen", self.listen, "--cache-dir", self.cache_dir,
+                stdout=log, stderr=asyncio.subprocess.STDOUT
+            )
+        finally:
+            log.close()
+        deadline = time.monotonic() + TRIVY_SERVER_START_TIMEOUT
+        while time.monotonic() < deadline and self.process.returncode is None:
+            if await executors.run_io(healthy, self.url):
+                self.ready = True
+                self.started_at = time.time()
+                logger.info(f"trivy server ready at {self.url} (pid {self.process.pid})")
+                return True
+            await asyncio.sleep(1)
+        logger.error(f"trivy server did not become ready, see {os.path.join(self.cache_dir, 'server.log')}")
+        await self._terminate()
+        return False
+
+    async def _refresh_due(self):
+        # Returns once the DB is due for a refresh and nothing is scanning against the server
+        await asyncio.sleep(TRIVY_DB_REFRESH_HOURS * 3600)
+        while self.leases:
+            await asyncio.sleep(5)
+        # No new lease from here on
+        self.ready = False
+
+    async def _supervise(self):
+        while True:
+            if not await self._launch():
+                await asyncio.sleep(RESTART_DELAY_SECONDS)
+                continue
+            exited = asyncio.create_task(self.process.wait())
+            refresh = asyncio.create_task(self._refresh_due())
+            try:
+                await asyncio.wait([exited, refresh], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                exited.cancel()
+                refresh.cancel()
+            if self.process is not None and self.process.returncode is not None:
+                logger.error(f"trivy server exited with status {self.process.returncode}, restarting")
+                self.ready = False
+                self.process = None
+                await asyncio.sleep(RESTART_DELAY_SECONDS)
+            else:
+                logger.info("Restarting the trivy server to refresh its vulnerability DB")
+                await self._terminate()
+
+    @contextmanager
+    def lease(self):
+        """Yields the server URL, or None when scans should run trivy standalone."""
+        if not self.ready or self.process is None or self.process.returncode is not None:
+            yield None
+            return
+        self.leases += 1
+        try:
+            yield self.url
+        finally:
+            self.leases -= 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": TRIVY_SERVER_MODE if self.enabled else "off",
+            "url": self.url,
+            "ready": self.ready,
+            "pid": self.process.pid if self.process is not None else None,
+            # The DB is fetched when the server starts
+            "db_refreshed_at": self.started_at,
+            "leases": self.leases,
+            "timings": self.timings.load(),
+        }
+
+
+server = TrivyServer()
@@ -1,18 +1,39 @@
 import React, { useState, useEffect } from 'react';
-import JSZip from 'jszip';
 import { Shield, FileJson, AlertTriangle, CheckCircle, XCircle, Info, Hash, Clock, Download, ChevronRight, ChevronDown, Package, Layers, Image as ImageIcon, Globe, ClipboardList, Server } from 'lucide-react';
 
+// Rows per request to /api/findings
+const FINDINGS_PAGE_SIZE = 500;
+
+const findingsQuery = (params) =>
+  new URLSearchParams(Object.entries(params).filter(([, v]) => v !== undefined && v !== null && v !== '')).toString();
+
+// Small reports (SBOM, SSL, CIS, one image) are shown whole, fetched page by page
+const fetchAllFindings = async (source, params = {}) => {
+  let rows = [];
+  let counts = {};
+  let offset = 0;
+  while (offset != null) {
+    const res = await fetch(`/api/findings/${source}?${findingsQuery({ ...params, limit: 1000, offset })}`);
+    if (!res.ok) throw new Error(`Failed to load ${source} findings: ${res.status}`);
+    const page = await res.json();
+    rows = rows.concat(page.rows);
+    counts = page.counts;
+    offset = page.next_offset;
+  }
+  return { rows, counts };
+};
+
 export default function PolicyReports() {
   const [activeView, setActiveView] = useState('kyverno'); // kyverno | sbom | image | nmap | cis | cluster
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
   // Data States
-  const [kyvernoData, setKyvernoData] = useState({ rows: [], counts: {} });
+  const [kyvernoData, setKyvernoData] = useState({ rows: [], counts: {}, namespaces: [], nextOffset: null });
   const [sbomData, setSbomData] = useState({ list: [], counts: {} });
   const [nmapData, setNmapData] = useState([]);
-  const [cisData, setCisData] = useState({ list: [], counts: {} });
-  const [clusterData, setClusterData] = useState({ list: [], counts: {} });
+  const [cisData, setCisData] = useState({ list: [], counts: {}, sections: [] });
+  const [clusterData, setClusterData] = useState({ list: [], counts: {}, nextOffset: null });
 
   // Image Report State
   const [imageFiles, setImageFiles] = useState([]);
@@ -27,6 +48,7 @@ export default function PolicyReports() {
   const [sbomSeverityFilters, setSbomSeverityFilters] = useState({
     CRITICAL: true, HIGH: true, MEDIUM: true, LOW: true, UNKNOWN: true
   });
+  const [cisSection, setCisSection] = useState('');
   const [cisStatusFilters, setCisStatusFilters] = useState({
     PASS: true, FAIL: true, WARN: true, INFO: true
   });
@@ -43,21 +65,28 @@ export default function PolicyReports() {
   // Fetch logic
   useEffect(() => {
     setError(null);
-    if (activeView === 'kyverno') {
-      loadKyverno();
-    } else if (activeView === 'sbom') {
+    if (activeView === 'sbom') {
       loadSbom();
     } else if (activeView === 'nmap') {
       loadNmap();
     } else if (activeView === 'image') {
       fetchImageFiles();
-    } else if (activeView === 'cis') {
-      loadCis();
-    } else if (activeView === 'cluster') {
-      loadCluster();
     }
   }, [activeView]);
 
+  // Kyverno and cluster findings are filtered and paged by the backend
+  useEffect(() => {
+    if (activeView === 'kyverno') loadKyverno();
+  }, [activeView, kyvernoNs, kyvernoStatusFilters]);
+
+  useEffect(() => {
+    if (activeView === 'cluster') loadCluster();
+  }, [activeView, clusterSeverityFilters]);
+
+  useEffect(() => {
+    if (activeView === 'cis') loadCis();
+  }, [activeView, cisSection, cisStatusFilters]);
+
   // Load Image Data when file selected
   useEffect(() => {
     if (activeView === 'image' && selectedImageFile) {
@@ -66,34 +95,29 @@ export default function PolicyReports() {
   }, [selectedImageFile]);
 
 
-  const loadKyverno = async () => {
-    if (kyvernoData.rows.length > 0) return;
-    setLoading(true);
+  const loadKyverno = async (offset = 0) => {
+    if (offset === 0) setLoading(true);
+    setError(null);
     try {
-      const res = await fetch('/new/kyverno-report/kyverno.zip');
-      if (res.status === 404) {
-        // Graceful handling for missing report
-        setKyvernoData({ rows: [], counts: {} });
-        return;
-      }
+      const statuses = Object.keys(kyvernoStatusFilters).filter(s => kyvernoStatusFilters[s]);
+      // Until a namespace is picked only the counts and namespace list are needed
+      const limit = kyvernoNs === '' || statuses.length === 0 ? 0 : FINDINGS_PAGE_SIZE;
+      const query = findingsQuery({
+        namespace: kyvernoNs === 'ALL' ? '' : kyvernoNs,
+        status: statuses.join(','),
+        limit,
+        offset
+      });
+      const res = await fetch(`/api/findings/kyverno?${query}`);
       if (!res.ok) throw new Error(`Failed to load Kyverno report: ${res.status}`);
-      const blob = await res.blob();
-
-      const zip = await JSZip.loadAsync(blob);
-      let file = zip.file(/kyverno\.json$/i)[0];
-      if (!file) {
-        const jsonFiles = zip.filter((relPath) => /\.json$/i.test(relPath));
-        file = jsonFiles[0];
-      }
-      if (!file) throw new Error('No JSON file found in Kyverno ZIP');
-
-      const text = await file.async('string');
-      const rows = parseKyverno(JSON.parse(text));
-
-      const counts = { FAIL: 0, WARN: 0, ERROR: 0, SKIP: 0, PASS: 0 };
-      rows.forEach(r => { counts[r.status] = (counts[r.status] || 0) + 1; });
-
-      setKyvernoData({ rows, counts });
+      const page = await res.json();
+
+      setKyvernoData(prev => ({
+        rows: offset === 0 ? page.rows : [...prev.rows, ...page.rows],
+        counts: page.counts.status,
+        namespaces: Object.keys(page.counts.namespace).sort(),
+        nextOffset: limit ? page.next_offset : null
+      }));
     } catch (err) {
       console.error(err);
       setError(err.message);
@@ -106,15 +130,8 @@ export default function PolicyReports() {
     if (sbomData.list.length > 0) return;
     setLoading(true);
     try {
-      const res = await fetch('/new/trivy-sbom/sbom.json');
-      if (res.status === 404) {
-        setSbomData({ list: [], counts: {} });
-        return;
-      }
-      if (!res.ok) throw new Error(`Failed to load SBOM report: ${res.status}`);
-      const json = await res.json();
-      const parsed = parseSbom(json);
-      setSbomData(parsed);
+      const { rows, counts } = await fetchAllFindings('sbom');
+      setSbomData({ list: rows, counts: { CRITICAL: 0, HIGH: 0, MEDIUM: 0, LOW: 0, UNKNOWN: 0, ...counts.severity } });
     } catch (err) {
       console.error(err);
       setError(err.message);
@@ -127,14 +144,7 @@ export default function PolicyReports() {
     if (nmapData.length > 0) return;
     setLoading(true);
     try {
-      const res = await fetch('/new/nmap/nmap.json');
-      if (res.status === 404) {
-        setNmapData([]);
-        return;
-      }
-      if (!res.ok) throw new Error(`Failed to load Nmap report: ${res.status}`);
-      const json = await res.json();
-      const rows = parseSSL(json); // Reuse SSL parser logic for Nmap report as per requirement
+      const { rows } = await fetchAllFindings('nmap');
       setNmapData(rows);
     } catch (err) {
       console.error(err);
@@ -145,18 +155,16 @@ export default function PolicyReports() {
   };
 
   const loadCis = async () => {
-    if (cisData.list.length > 0) return;
     setLoading(true);
     try {
-      const res = await fetch('/new/kube-bench/kubebench.txt');
-      if (res.status === 404) {
-        setCisData({ list: [], counts: {} });
-        return;
-      }
-      if (!res.ok) throw new Error(`Failed to load CIS report: ${res.status}`);
-      const text = await res.text();
-      const parsed = parseCisText(text);
-      setCisData(parsed);
+      // Status counts cover the chosen section whatever statuses are ticked; sections come from the same page
+      const statuses = Object.keys(cisStatusFilters).filter(s => cisStatusFilters[s]);
+      const { rows, counts } = await fetchAllFindings('cis', { section: cisSection, status: statuses.join(',') || 'NONE' });
+      setCisData({
+        list: rows,
+        counts: { PASS: 0, FAIL: 0, WARN: 0, INFO: 0, ...counts.status },
+        sections: Object.keys(counts.namespace || {}).sort(),
+      });
     } catch (err) {
       console.error(err);
       setError(err.message);
@@ -165,28 +173,22 @@ export default function PolicyReports() {
     }
   };
 
-  const loadCluster = async () => {
-    if (clusterData.list.length > 0) return;
-    setLoading(true);
+  const loadCluster = async (offset = 0) => {
+    if (offset === 0) setLoading(true);
+    setError(null);
     try {
-      const res = await fetch('/new/trivy-cluster-report/cluster.zip');
-      if (res.status === 404) {
-        setClusterData({ list: [], counts: {} });
-        return;
-      }
+      const severities = Object.keys(clusterSeverityFilters).filter(s => clusterSeverityFilters[s]);
+      const limit = severities.length === 0 ? 0 : FINDINGS_PAGE_SIZE;
+      const query = findingsQuery({ severity: severities.join(','), limit, offset });
+      const res = await fetch(`/api/findings/cluster?${query}`);
       if (!res.ok) throw new Error(`Failed to load Cluster report: ${res.status}`);
-      const blob = await res.blob();
-      const zip = await JSZip.loadAsync(blob);
-      let file = zip.file(/cluster\.json$/i)[0];
-      if (!file) {
-        const jsonFiles = zip.filter((relPath) => /\.json$/i.test(relPath));
-        file = jsonFiles[0];
-      }
-      if (!file) throw new Error('No JSON file found in Cluster ZIP');
+      const page = await res.json();
 
-      const text = await file.async('string');
-      const parsed = parseCluster(JSON.parse(text));
-      setClusterData(parsed);
+      setClusterData(prev => ({
+        list: offset === 0 ? page.rows : [...prev.list, ...page.rows],
+        counts: page.counts.severity,
+        nextOffset: limit ? page.next_offset : null
+      }));
     } catch (err) {
       console.error(err);
       setError(err.message);
@@ -216,11 +218,8 @@ export default function PolicyReports() {
   const loadImageReport = async (filename) => {
     setLoading(true);
     try {
-      const res = await fetch(`/new/trivy-reports/${filename}`);
-      if (!res.ok) throw new Error(`Failed to load report ${filename}: ${res.status}`);
-      const json = await res.json();
-      const parsed = parseImage(json);
-      setImageData(parsed);
+      const { rows, counts } = await fetchAllFindings('image', { file: filename });
+      setImageData({ list: rows, counts: { CRITICAL: 0, HIGH: 0, MEDIUM: 0, LOW: 0, UNKNOWN: 0, ...counts.severity } });
     } catch (err) {
       console.error(err);
       setError(err.message);
@@ -230,260 +229,6 @@ export default function PolicyReports() {
   }
 
 
-  // --- Parsers ---
-
-  function parseKyverno(json) {
-    const items = Array.isArray(json?.items) ? json.items : [json];
-    const rows = [];
-    items.forEach(item => {
-      if (!item || !item.results) return;
-      const metaNs = (item.metadata && item.metadata.namespace) || '';
-      const scope = item.scope || {};
-      const scopeNs = scope.namespace || metaNs;
-      const scopeKind = scope.kind || '';
-      const scopeName = scope.name || '';
-      item.results.forEach(res => {
-        const status = String(res.result || '').toUpperCase();
-        const sev = String(res.severity || 'UNKNOWN').toUpperCase();
-        const base = { status, severity: sev, policy: res.policy || '', message: res.message || '', type: scopeKind, name: scopeName, namespace: scopeNs };
-        const rlist = Array.isArray(res.resources) ? res.resources : [];
-        if (rlist.length > 0) {
-          rlist.forEach(r => {
-            rows.push({
-              ...base,
-              type: String(r.kind || scopeKind || ''),
-              name: String(r.name || scopeName || ''),
-              namespace: String(r.namespace || scopeNs || '')
-            });
-          });
-        } else {
-          rows.push(base);
-        }
-      });
-    });
-    return rows;
-  }
-
-  function parseSbom(json) {
-    const rows = [];
-    if (!json || !Array.isArray(json.Results)) return { list: rows, counts: { CRITICAL: 0, HIGH: 0, MEDIUM: 0, LOW: 0, UNKNOWN: 0 } };
-    for (const res of json.Results) {
-      const vulns = res.Vulnerabilities || [];
-      const pkgsById = new Map();
-      const pkgs = res.Packages || [];
-      for (const p of pkgs) { const id = p.ID || p.Identifier?.BOMRef || p.Identifier?.PURL || p.Name; pkgsById.set(id, p); }
-      for (const v of vulns) {
-        const pkgId = String(v.PkgID || v.PkgName || '');
-        const pkgName = String(v.PkgName || pkgsById.get(pkgId)?.Name || pkgId);
-        rows.push({
-          id: String(v.VulnerabilityID || ''),
-          library: pkgName,
-          installed: String(v.InstalledVersion || pkgsById.get(pkgId)?.Version || ''),
-          fixed: String(v.FixedVersion || ''),
-          status: String(v.Status || ''),
-          severity: String(v.Severity || '').toUpperCase(),
-          title: String(v.Title || ''),
-          ref: Array.isArray(v.References) && v.References.length ? v.References[0] : (v.PrimaryURL || '')
-        });
-      }
-    }
-    const counts = { CRITICAL: 0, HIGH: 0, MEDIUM: 0, LOW: 0, UNKNOWN: 0 };
-    for (const r of rows) { const s = (r.severity || 'UNKNOWN').toUpperCase(); counts[s] = (counts[s] || 0) + 1; }
-    return { list: rows, counts };
-  }
-
-  function parseSSL(data) {
-    const rows = [];
-    if (!data) return rows;
-    const arr = Array.isArray(data) ? data : [];
-    for (const item of arr) {
-      rows.push({
-        namespace: String(item.namespace || ''),
-        fqdn: String(item.fqdn || ''),
-        port: item.port != null ? item.port : '',
-        accepted: Array.isArray(item.accepted_ciphers) ? item.accepted_ciphers : [],
-        weak: Array.isArray(item.weak_ciphers) ? item.weak_ciphers : [],
-        safe: Array.isArray(item.safe_ciphers) ? item.safe_ciphers : []
-      });
-    }
-    return rows;
-  }
-
-  function parseImage(json) {
-    if (!json) return { list: [], counts: {} };
-    const results = json.Results || json.results || [];
-    const list = [];
-    results.forEach(r => {
-      const vuls = r.Vulnerabilities || r.vulnerabilities || [];
-      vuls.forEach(v => {
-        list.push({
-          severity: (v.Severity || v.severity || "UNKNOWN").toUpperCase(),
-          id: v.VulnerabilityID || v.vulnerabilityID || v.CVE || "",
-          pkg: v.PkgName || v.pkgName || "",
-          installed: v.InstalledVersion || v.installedVersion || "",
-          fixed: v.FixedVersion || v.fixedVersion || "",
-          title: v.Title || v.title || "",
-          target: r.Target || r.target || json.ArtifactName || json.artifactName || "",
-          refs: v.References || v.references || []
-        });
-      });
-    });
-    const counts = { CRITICAL: 0, HIGH: 0, MEDIUM: 0, LOW: 0, UNKNOWN: 0 };
-    list.forEach(item => { counts[item.severity] = (counts[item.severity] || 0) + 1; });
-    return { list, counts };
-  }
-
-  function parseCisText(text) {
-    if (!text) return { list: [], counts: {} };
-    const lines = String(text).split(/\r?\n/);
-
-    // Build section map from INFO headers (e.g., "1.2 API Server")
-    const sectionMap = {};
-    for (const line of lines) {
-      const sm = line.match(/^\[INFO\]\s+([0-9]+(?:\.[0-9]+)?)\s+(.*)$/);
-      if (sm) { sectionMap[sm[1]] = sm[2].trim(); }
-    }
-    const findSectionName = (id) => {
-      let bestPrefix = '';
-      let name = '';
-      for (const prefix in sectionMap) {
-        if (id === prefix || id.startsWith(prefix + '.')) {
-          if (prefix.length > bestPrefix.length) { bestPrefix = prefix; name = sectionMap[prefix]; }
-        }
-      }
-      if (name) return name;
-      const major = id.split('.')[0];
-      const majorMap = { '1': 'Control Plane', '2': 'Etcd', '3': 'Control Plane Config', '4': 'Worker Node', '5': 'Policies' };
-      return majorMap[major] || `Group ${major}`;
-    };
-
-    // Build remediation map from "== Remediations ... ==" blocks
-    const remMap = {};
-    let inRem = false; let currentId = null;
-    for (let i = 0; i < lines.length; i++) {
-      const line = lines[i];
-      if (/^==\s*Remediations/.test(line)) { inRem = true; currentId = null; continue; }
-      if (inRem && (/^==\s*Summary/.test(line) || /^\[INFO\]/.test(line) || /^\[(FAIL|WARN|PASS|INFO)\]/.test(line))) { inRem = false; currentId = null; continue; }
-      if (!inRem) continue;
-
-      const idm = line.match(/^([0-9]+(?:\.[0-9]+)+)\b(.*)$/);
-      if (idm) {
-        currentId = idm[1];
-        const first = idm[2].trim();
-        remMap[currentId] = first ? first : '';
-        continue;
-      }
-      if (currentId) {
-        if (/^==/.test(line)) { inRem = false; currentId = null; continue; }
-        const t = line.trim();
-        remMap[currentId] += (remMap[currentId] ? '\n' : '') + t;
-      }
-    }
-
-    // Parse checks and attach section + remediation
-    const list = [];
-    const counts = { PASS: 0, FAIL: 0, WARN: 0, INFO: 0 };
-
-    for (const line of lines) {
-      const m = line.match(/^\[(FAIL|WARN|PASS|INFO)\]\s+([0-9]+(?:\.[0-9]+)+)\s+(.*)$/);
-      if (m) {
-        const status = m[1];
-        const id = m[2];
-        let title = m[3].trim();
-        const typeMatch = title.match(/\((Manual|Automated)\)\s*$/);
-        if (typeMatch) { title = title.replace(/\s*\((Manual|Automated)\)\s*$/, ''); }
-        const section = findSectionName(id);
-        const remediation = remMap[id] || '';
-
-        list.push({ status, id, desc: title, section, remediation });
-        counts[status] = (counts[status] || 0) + 1;
-      }
-    }
-
-    return { list, counts };
-  }
-
-  function parseCluster(json) {
-    if (!json) return { list: [], counts: {} };
-    let results = [];
-    // Support top-level Results/results
-    if (Array.isArray(json.Results)) {
-      results = json.Results;
-    } else if (Array.isArray(json.results)) {
-      results = json.results;
-    }
-    // Support Trivy Cluster schema: Findings (with Namespace/Kind/Name)
-    if (Array.isArray(json.Findings)) {
-      json.Findings.forEach(f => {
-        const rlist = f.Results || f.results || [];
-        rlist.forEach(r => {
-          results.push({ ...r, _ctx: { Namespace: f.Namespace, Kind: f.Kind, Name: f.Name } });
-        });
-      });
-    } else if (Array.isArray(json.findings)) {
-      json.findings.forEach(f => {
-        const rlist = f.Results || f.results || [];
-        rlist.forEach(r => {
-          results.push({ ...r, _ctx: { Namespace: f.Namespace, Kind: f.Kind, Name: f.Name } });
-        });
-      });
-    }
-    // Support alternative Trivy Cluster schema: Resources (Kind/Name)
-    if (Array.isArray(json.Resources)) {
-      json.Resources.forEach(res => {
-        const rlist = res.Results || res.results || [];
-        rlist.forEach(r => {
-          results.push({ ...r, _ctx: { Namespace: res.Namespace, Kind: res.Kind, Name: res.Name } });
-        });
-      });
-    } else if (Array.isArray(json.resources)) {
-      json.resources.forEach(res => {
-        const rlist = res.Results || res.results || [];
-        rlist.forEach(r => {
-          results.push({ ...r, _ctx: { Namespace: res.Namespace, Kind: res.Kind, Name: res.Name } });
-        });
-      });
-    }
-
-    const list = [];
-    results.forEach(r => {
-      const mis = r.Misconfigurations || r.misconfigurations || [];
-      const ctx = r._ctx || {};
-      mis.forEach(m => {
-        const composedTarget = r.Target || r.target || [ctx.Namespace, (ctx.Kind && ctx.Name) ? `${ctx.Kind}/${ctx.Name}` : (ctx.Kind || ctx.Name)].filter(Boolean).join(' ');
-        list.push({
-          severity: (m.Severity || m.severity || "UNKNOWN").toUpperCase(),
-          id: m.ID || m.id || "",
-          title: m.Title || m.title || "",
-          msg: m.Message || m.message || m.Description || m.description || "",
-          status: (m.Status || m.status || 'FAIL').toUpperCase(),
-          target: composedTarget || "Kubernetes",
-          type: 'Misconfig',
-          link: m.PrimaryURL || m.primaryURL || (m.References && m.References[0]) || ""
-        });
-      });
-      // Handle Vulnerabilities (if any in cluster scan)
-      const vuls = r.Vulnerabilities || r.vulnerabilities || [];
-      vuls.forEach(v => {
-        list.push({
-          severity: (v.Severity || v.severity || 'UNKNOWN').toUpperCase(),
-          id: v.VulnerabilityID || v.vulnerabilityID || '',
-          title: v.Title || v.title || '',
-          msg: `Pkg: ${v.PkgName} ${v.InstalledVersion}`,
-          status: 'FAIL',
-          target: r.Target || r.target || '',
-          type: 'Vuln',
-          link: v.PrimaryURL || v.primaryURL || (v.References && v.References[0]) || ""
-        });
-      });
-    });
-
-    const counts = { CRITICAL: 0, HIGH: 0, MEDIUM: 0, LOW: 0, UNKNOWN: 0 };
-    list.forEach(item => { counts[item.severity] = (counts[item.severity] || 0) + 1; });
-    return { list, counts };
-  }
-
-
   // --- Helpers ---
   const getStatusColor = (status) => {
     const map = {
@@ -507,16 +252,6 @@ export default function PolicyReports() {
     </div>
   );
 
-  // Calculate display counts dynamically based on namespace filter
-  const kyvernoDisplayCounts = React.useMemo(() => {
-    const c = { FAIL: 0, WARN: 0, ERROR: 0, SKIP: 0, PASS: 0 };
-    kyvernoData.rows.forEach(r => {
-      if (kyvernoNs && kyvernoNs !== 'ALL' && r.namespace !== kyvernoNs) return;
-      c[r.status] = (c[r.status] || 0) + 1;
-    });
-    return c;
-  }, [kyvernoData.rows, kyvernoNs]);
-
   return (
     <div className="h-full flex flex-col bg-[#0e1116] text-[#c9d1d9] font-sans">
       {/* Header Tabs */}
@@ -583,12 +318,12 @@ export default function PolicyReports() {
           <div className="space-y-6">
             <div className="grid grid-cols-2 md:grid-cols-6 gap-4">
               {['FAIL', 'WARN', 'ERROR', 'SKIP', 'PASS'].map(s => (
-                <StatusCard key={s} label={s} value={kyvernoDisplayCounts[s] || 0} />
+                <StatusCard key={s} label={s} value={kyvernoData.counts[s] || 0} />
               ))}
               <div className="p-4 rounded-lg border border-gray-700 bg-[#1e1e1e] flex flex-col items-center justify-center">
                 <span className="text-xs font-semibold opacity-70 mb-1">TOTAL</span>
                 <span className="text-2xl font-bold text-gray-200">
-                  {Object.values(kyvernoDisplayCounts).reduce((a, b) => a + b, 0)}
+                  {Object.values(kyvernoData.counts).reduce((a, b) => a + b, 0)}
                 </span>
               </div>
             </div>
@@ -603,13 +338,13 @@ export default function PolicyReports() {
                 >
                   <option value="">None</option>
                   <option value="ALL">All Namespaces</option>
-                  {Array.from(new Set(kyvernoData.rows.map(r => r.namespace).filter(Boolean))).sort().map(ns => (
+                  {kyvernoData.namespaces.map(ns => (
                     <option key={ns} value={ns}>{ns}</option>
                   ))}
                 </select>
               </div>
 
-              <div className="md:col-span-8 bg-[#161b22] p-4 rounded-lg border border-[#30363d] flex items-center">
+              <div className="md:col-span-8 bg-[#161b22] p-4 rounded-lg border border-[#30363d] flex items-center justify-between gap-4">
                 <div className="flex flex-wrap gap-4 items-center">
                   <span className="text-xs text-gray-400 font-mono uppercase">Filter Status:</span>
                   {['FAIL', 'WARN', 'ERROR', 'SKIP', 'PASS'].map(status => (
@@ -630,6 +365,18 @@ export default function PolicyReports() {
                     </label>
                   ))}
                 </div>
+                {/* Full report export, built on the server */}
+                <div className="flex gap-2 shrink-0">
+                  {[['xlsx', 'Excel'], ['csv', 'CSV']].map(([format, label]) => (
+                    <a
+                      key={format}
+                      href={`/api/findings/kyverno/export?format=${format}`}
+                      className="px-3 py-1 bg-blue-600 hover:bg-blue-500 text-white text-xs font-bold rounded flex items-center gap-2 transition-colors"
+                    >
+                      <Download className="w-3 h-3" /> {label}
+                    </a>
+                  ))}
+                </div>
               </div>
             </div>
 
@@ -647,11 +394,6 @@ export default function PolicyReports() {
                 </thead>
                 <tbody className="divide-y divide-[#30363d]">
                   {kyvernoData.rows
-                    .filter(r => {
-                      if (kyvernoNs === "") return false; // None selected
-                      if (kyvernoNs === "ALL") return kyvernoStatusFilters[r.status]; // All selected
-                      return r.namespace === kyvernoNs && kyvernoStatusFilters[r.status]; // Specific namespace
-                    })
                     .map((row, idx) => (
                       <tr key={idx} className="hover:bg-[#161b22]/50 transition-colors">
                         <td className="p-3">
@@ -675,6 +417,13 @@ export default function PolicyReports() {
                       {!kyvernoNs ? "Select a namespace to view report" : "No data available"}
                     </td></tr>
                   )}
+                  {kyvernoNs && kyvernoData.nextOffset != null && (
+                    <tr><td colSpan="6" className="p-3 text-center">
+                      <button onClick={() => loadKyverno(kyvernoData.nextOffset)} className="text-blue-400 hover:underline text-sm">
+                        Load more
+                      </button>
+                    </td></tr>
+                  )}
                 </tbody>
               </table>
             </div>
@@ -697,6 +446,17 @@ export default function PolicyReports() {
             </div>
 
             <div className="flex flex-wrap gap-4 items-center bg-[#161b22] p-3 rounded-lg border border-[#30363d]">
+              <span className="text-xs text-gray-400 font-mono uppercase">Section:</span>
+              <select
+                value={cisSection}
+                onChange={(e) => setCisSection(e.target.value)}
+                className="bg-[#0e1116] border border-[#30363d] rounded px-3 py-1 text-sm text-gray-200 focus:outline-none focus:border-blue-500"
+              >
+                <option value="">All Sections</option>
+                {cisData.sections.map(section => (
+                  <option key={section} value={section}>{section}</option>
+                ))}
+              </select>
               <span className="text-xs text-gray-400 font-mono uppercase">Filter Status:</span>
               {['FAIL', 'WARN', 'INFO', 'PASS'].map(status => (
                 <label key={status} className="flex items-center gap-2 cursor-pointer select-none">
@@ -730,7 +490,6 @@ export default function PolicyReports() {
                 </thead>
                 <tbody className="divide-y divide-[#30363d]">
                   {cisData.list
-                    .filter(r => cisStatusFilters[r.status])
                     .map((row, idx) => (
                       <tr key={idx} className="hover:bg-[#161b22]/50 transition-colors">
                         <td className="p-3 text-center">
@@ -744,7 +503,7 @@ export default function PolicyReports() {
                         <td className="p-3 text-gray-200 text-xs font-mono break-all max-w-sm">{row.remediation}</td>
                       </tr>
                     ))}
-                  {cisData.list.filter(r => cisStatusFilters[r.status]).length === 0 && (
+                  {cisData.list.length === 0 && (
                     <tr><td colSpan="5" className="p-8 text-center text-gray-500">No benchmarks found matching filters</td></tr>
                   )}
                 </tbody>
@@ -807,7 +566,6 @@ export default function PolicyReports() {
                 </thead>
                 <tbody className="divide-y divide-[#30363d]">
                   {clusterData.list
-                    .filter(row => clusterSeverityFilters[row.severity])
                     .map((row, idx) => (
                       <tr key={idx} className="hover:bg-[#161b22]/50 transition-colors">
                         <td className="p-3">
@@ -826,9 +584,16 @@ export default function PolicyReports() {
                         <td className="p-3 text-gray-200">{row.target}</td>
                       </tr>
                     ))}
-                  {clusterData.list.filter(row => clusterSeverityFilters[row.severity]).length === 0 && (
+                  {clusterData.list.length === 0 && (
                     <tr><td colSpan="6" className="p-8 text-center text-gray-400">No issues found matching filters</td></tr>
                   )}
+                  {clusterData.nextOffset != null && (
+                    <tr><td colSpan="6" className="p-3 text-center">
+                      <button onClick={() => loadCluster(clusterData.nextOffset)} className="text-blue-400 hover:underline text-sm">
+                        Load more
+                      </button>
+                    </td></tr>
+                  )}
                 </tbody>
               </table>
             </div>